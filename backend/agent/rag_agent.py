@@ -1,117 +1,387 @@
-from pymilvus import connections, Collection
-import requests
-import os
-import sys
-import logging
-
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from shared.utils import  load_config
-from core.exceptions import EmbeddingServiceError, MilvusConnectionError
-
-logger = logging.getLogger("sql_agent")
-logger.setLevel(logging.INFO)
-
-# Evita agregar múltiples handlers si se llama varias veces
-if not logger.hasHandlers():
-    console_handler = logging.StreamHandler()
-    formatter = logging.Formatter("%(levelname)s: %(message)s")
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
-
-CONFIG_JSON = load_config()
-
-MILVUS_ENDPOINT = CONFIG_JSON["milvus_endpoint"]
-MILVUS_HOST = MILVUS_ENDPOINT["host"]
-MILVUS_PORT = MILVUS_ENDPOINT["port"]
-EMBEDDING_ENDPOINT = CONFIG_JSON["embedding_endpoint"]
-COLLECTIONS_NAME = MILVUS_ENDPOINT["collections"]
-SIMILARITY_THRESHOLD = MILVUS_ENDPOINT["similarity_thresholds"]
-
-def generate_embedding(text: str) -> list:
-    
-    payload = {
-        "input": [text],
-        "model": "nvidia/nv-embedqa-e5-v5",
-        "input_type": "query",
-        "encoding_format": "float"
-    }
-
-    try:
-        response = requests.post(EMBEDDING_ENDPOINT, json=payload)
-        response.raise_for_status()
-        return response.json()["data"][0]["embedding"]
-
-    except requests.exceptions.RequestException as req_error:
-        logger.error(f"❌ Error de conexión con el servicio de embeddings: {req_error}")
-        raise EmbeddingServiceError("Falló al conectar con el servicio de embeddings.")
-    
-    except (KeyError, IndexError) as parse_error:
-        logger.error(f"❌ Respuesta mal formulada del servicio de embeddings: {req_error}")
-        raise EmbeddingServiceError("Respuesta inválida del servicio de embedings.")
-    
-
-
-def save_collection(collection_name: str, fields: list) -> dict:
-
-    try:
-        connections.connect(alias="default", host=MILVUS_HOST, port=MILVUS_PORT)
-        collection = Collection(collection_name)
-
-        collection.load()
-        insert_result = collection.insert(fields)
-        collection.flush()
-        return {
-            "status": "OK", 
-            "message": "Datos inyectados correctamente", 
-            "insert_count": {insert_result.insert_count}
-            }            
-    except Exception as e:
-        logger.error(f"❌ Error al insertar en la colección '{collection_name}': {e}")
-        raise MilvusConnectionError(f"No se pudo insertar en la colección: {collection_name}. Detalle: {e}")
-
-
-def search_collection(collection_name: str, query_embedding: list, fields: list, top_k: int, full_search: bool=False):
-    from rich import print 
-    try:
-        collection = Collection(collection_name)
-        collection.load()
-        
-        results = collection.search(
-            data=[query_embedding],
-            anns_field="embedding",
-            param={"metric_type": "COSINE", "params": {"nprobe": 10}},
-            limit=top_k,
-            output_fields=fields
-        )
-
-        if not results or not results[0]:
-            return []
-
-        hit_data = [
-            {**hit.to_dict()['entity'], "score": hit.distance, "id": hit.id} 
-            for hit in results[0]
-            if hit.distance >= SIMILARITY_THRESHOLD[collection_name]
-            ]
-
-        if hit_data:
-            logger.info(f"🕵🏻 Resultados de la búsqueda en la colección: '{collection_name}'")
-            for i, hit in enumerate(hit_data):        
-                print(f"\t🔹 {i+1} - Distancia: {float(hit['score']):.2f} | Pregunta: {hit['question'][:80]}")
-        else:
-            return []
-        
-        return hit_data
-
-    except Exception as e:
-        logger.error(f"❌ Error al buscar en la colección '{collection_name}': {e}")
-        raise MilvusConnectionError(f"No se pudo realizar la búsqueda en la colección: {collection_name}. Detalle: {e}")
-
-
-def get_context_by_type(question: str, top_k: int = 3) -> dict:    
-    embedding = generate_embedding(question)
-
-    context = {"sql": [], "ddl": [], "docs": []}    
-    context["sql"] = search_collection(COLLECTIONS_NAME["questions"], embedding, ["question", "sql"], top_k)    
-    context["docs"] = search_collection(COLLECTIONS_NAME["docs"], embedding, ["question", "texto"], top_k)
-    
-    return context
+import httpx
+import asyncio
+import os
+import sys
+import logging
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.utils import  load_config
+from shared.app_config import on_config_reload
+from core.exceptions import EmbeddingServiceError, MilvusConnectionError, InvalidTrainingDataError
+from core.http_client import get_client, get_async_client, get_timeout
+from core.concurrency import run_blocking
+from core.metrics import observe_stage
+from core.embedding_cache import embedding_cache
+from core.embedding_batcher import EmbeddingBatcher
+from core.vector_write_buffer import VectorWriteBuffer
+from core.milvus_registry import milvus_registry
+from core.init_collections import COLLECTION_FIELDS
+
+logger = logging.getLogger("sql_agent")
+logger.setLevel(logging.INFO)
+
+# Evita agregar múltiples handlers si se llama varias veces
+if not logger.hasHandlers():
+    console_handler = logging.StreamHandler()
+    formatter = logging.Formatter("%(levelname)s: %(message)s")
+    console_handler.setFormatter(formatter)
+    logger.addHandler(console_handler)
+
+CONFIG_JSON = load_config()
+
+MILVUS_ENDPOINT = CONFIG_JSON["milvus_endpoint"]
+MILVUS_HOST = MILVUS_ENDPOINT["host"]
+MILVUS_PORT = MILVUS_ENDPOINT["port"]
+EMBEDDING_ENDPOINT = CONFIG_JSON["embedding_endpoint"]
+COLLECTIONS_NAME = MILVUS_ENDPOINT["collections"]
+SIMILARITY_THRESHOLD = MILVUS_ENDPOINT["similarity_thresholds"]
+EMBEDDING_MODEL = "nvidia/nv-embedqa-e5-v5"
+EMBEDDING_INPUT_TYPE = "query"
+EMBEDDING_BATCHING = CONFIG_JSON.get("embedding_batching", {})
+WRITE_BUFFER = CONFIG_JSON.get("vector_write_buffer", {})
+
+RETRIEVAL = CONFIG_JSON["retrieval"]
+
+
+@on_config_reload
+def _refresh_retrieval_settings(config):
+    # Parámetros de búsqueda por colección ajustables en caliente con /config/reload
+    global RETRIEVAL
+    RETRIEVAL = config.data["retrieval"]
+
+# Llave de contexto que llena cada colección en `get_context_by_type`
+CONTEXT_KEYS = {"questions": "sql", "ddl": "ddl", "docs": "docs"}
+
+# Campo de contenido de cada colección (ver core/init_collections.py)
+CONTENT_FIELDS = {
+    COLLECTIONS_NAME["questions"]: "sql",
+    COLLECTIONS_NAME["ddl"]: "ddl",
+    COLLECTIONS_NAME["docs"]: "texto"
+}
+
+def _embedding_payload(texts: list) -> dict:
+    return {
+        "input": texts,
+        "model": EMBEDDING_MODEL,
+        "input_type": EMBEDDING_INPUT_TYPE,
+        "encoding_format": "float"
+    }
+
+def _parse_embeddings(data: dict, expected: int) -> list:
+    # El servicio puede devolver los vectores fuera de orden; se reordenan por "index"
+    items = sorted(data["data"], key=lambda item: item.get("index", 0))
+    if len(items) != expected:
+        raise IndexError(f"Se esperaban {expected} embeddings y se recibieron {len(items)}.")
+    return [item["embedding"] for item in items]
+
+def generate_embedding(text: str) -> list:
+    
+    cached = embedding_cache.get(EMBEDDING_MODEL, EMBEDDING_INPUT_TYPE, text)
+    if cached is not None:
+        return cached
+
+    payload = _embedding_payload([text])
+
+    try:
+        response = get_client(EMBEDDING_ENDPOINT).post(EMBEDDING_ENDPOINT, json=payload, timeout=get_timeout("embedding"))
+        response.raise_for_status()
+        embedding = response.json()["data"][0]["embedding"]
+        embedding_cache.put(EMBEDDING_MODEL, EMBEDDING_INPUT_TYPE, text, embedding)
+        return embedding
+
+    except httpx.HTTPError as req_error:
+        logger.error(f"❌ Error de conexión con el servicio de embeddings: {req_error}")
+        raise EmbeddingServiceError("Falló al conectar con el servicio de embeddings.")
+    
+    except (KeyError, IndexError) as parse_error:
+        logger.error(f"❌ Respuesta mal formulada del servicio de embeddings: {parse_error}")
+        raise EmbeddingServiceError("Respuesta inválida del servicio de embedings.")
+    
+
+async def _request_embeddings_async(texts: list) -> list:
+    payload = _embedding_payload(texts)
+
+    try:
+        response = await get_async_client(EMBEDDING_ENDPOINT).post(EMBEDDING_ENDPOINT, json=payload, timeout=get_timeout("embedding"))
+        response.raise_for_status()
+        return _parse_embeddings(response.json(), len(texts))
+
+    except httpx.HTTPError as req_error:
+        logger.error(f"❌ Error de conexión con el servicio de embeddings: {req_error}")
+        raise EmbeddingServiceError("Falló al conectar con el servicio de embeddings.")
+
+    except (KeyError, IndexError) as parse_error:
+        logger.error(f"❌ Respuesta mal formulada del servicio de embeddings: {parse_error}")
+        raise EmbeddingServiceError("Respuesta inválida del servicio de embedings.")
+
+
+embedding_batcher = EmbeddingBatcher(
+    _request_embeddings_async,
+    max_batch_size=EMBEDDING_BATCHING.get("max_batch_size", 32),
+    max_wait_ms=EMBEDDING_BATCHING.get("max_wait_ms", 5)
+)
+
+
+async def generate_embedding_async(text: str) -> list:
+    """
+    Versión asíncrona de `generate_embedding`. Las peticiones concurrentes se agrupan
+    en una sola llamada multi-input mediante `embedding_batcher`.
+    """
+    with observe_stage("embedding", EMBEDDING_MODEL) as observation:
+        cached = await embedding_cache.get_async(EMBEDDING_MODEL, EMBEDDING_INPUT_TYPE, text)
+        if cached is not None:
+            observation.outcome = "cache_hit"
+            return cached
+
+        if EMBEDDING_BATCHING.get("enabled", True):
+            embedding = await embedding_batcher.embed(text)
+        else:
+            embedding = (await _request_embeddings_async([text]))[0]
+
+    embedding_cache.put(EMBEDDING_MODEL, EMBEDDING_INPUT_TYPE, text, embedding)
+    return embedding
+
+
+async def generate_embeddings_async(texts: list, batch_size: int = 32) -> list:
+    """
+    Genera embeddings para muchos textos enviando lotes multi-input al servicio.
+    Los textos ya presentes en el caché no se vuelven a enviar.
+
+    Returns:
+        list: Vectores en el mismo orden que `texts`.
+    """
+    embeddings = await embedding_cache.get_many_async(EMBEDDING_MODEL, EMBEDDING_INPUT_TYPE, texts)
+    missing = list(dict.fromkeys(text for text, vector in zip(texts, embeddings) if vector is None))
+
+    computed = {}
+    for start in range(0, len(missing), batch_size):
+        batch = missing[start:start + batch_size]
+        vectors = await _request_embeddings_async(batch)
+        for text, vector in zip(batch, vectors):
+            embedding_cache.put(EMBEDDING_MODEL, EMBEDDING_INPUT_TYPE, text, vector)
+            computed[text] = vector
+
+    return [vector if vector is not None else computed[text] for text, vector in zip(texts, embeddings)]
+
+
+def validate_training_row(collection_name: str, question: str, content: str, embedding: list = None):
+    """
+    Verifica una fila contra el esquema de la colección (`COLLECTION_FIELDS`) antes de
+    insertarla: Milvus rechaza el lote completo si un VARCHAR excede `max_length` (en bytes)
+    o si el vector no tiene la dimensión esperada.
+
+    Raises:
+        InvalidTrainingDataError: Si algún campo no cumple el esquema.
+    """
+    schema = {field.name: field.params for field in COLLECTION_FIELDS.get(collection_name, [])}
+    values = {"question": question, CONTENT_FIELDS.get(collection_name): content}
+    for name, value in values.items():
+        max_length = schema.get(name, {}).get("max_length")
+        if max_length is None:
+            continue
+        if not isinstance(value, str):
+            raise InvalidTrainingDataError(f"El campo '{name}' debe ser texto.")
+        size = len(value.encode("utf-8"))
+        if size > max_length:
+            raise InvalidTrainingDataError(
+                f"El campo '{name}' excede el máximo de la colección '{collection_name}' ({size} > {max_length} bytes)."
+            )
+
+    dim = schema.get("embedding", {}).get("dim")
+    if embedding is not None and dim is not None and len(embedding) != dim:
+        raise InvalidTrainingDataError(f"El embedding tiene dimensión {len(embedding)}; la colección '{collection_name}' espera {dim}.")
+
+
+def save_collection(collection_name: str, fields: list) -> dict:
+
+    # Una fila inválida haría fallar el lote completo (y en diferido, después de confirmarla)
+    for question, content, embedding in zip(*fields):
+        validate_training_row(collection_name, question, content, embedding)
+
+    if WRITE_BUFFER.get("enabled", True):
+        # Escritura diferida: se confirma al encolar, el flush ocurre en segundo plano
+        content_field = CONTENT_FIELDS.get(collection_name)
+        if content_field is None:
+            raise MilvusConnectionError(f"Colección desconocida para escritura diferida: {collection_name}")
+        rows = [
+            {"question": question, content_field: content, "embedding": embedding}
+            for question, content, embedding in zip(*fields)
+        ]
+        pending = vector_write_buffer.enqueue(collection_name, rows)
+        return {
+            "status": "OK",
+            "message": "Datos encolados para inyección",
+            "insert_count": len(rows),
+            "pending": pending
+            }
+
+    try:
+        insert_result = milvus_registry.run(collection_name, lambda collection: collection.insert(fields), load=False)
+        milvus_registry.run(collection_name, lambda collection: collection.flush(), load=False)
+        return {
+            "status": "OK", 
+            "message": "Datos inyectados correctamente", 
+            "insert_count": {insert_result.insert_count}
+            }            
+    except Exception as e:
+        logger.error(f"❌ Error al insertar en la colección '{collection_name}': {e}")
+        raise MilvusConnectionError(f"No se pudo insertar en la colección: {collection_name}. Detalle: {e}")
+
+
+def save_collection_bulk(collection_name: str, fields: list, chunk_size: int = 1000) -> dict:
+    """
+    Inserta muchas filas en bloques y hace un único `flush` al final.
+
+    Args:
+        collection_name (str): Colección destino.
+        fields (list): Columnas a insertar (mismo formato que `save_collection`).
+        chunk_size (int): Filas por llamada a `insert`.
+
+    Returns:
+        dict: Estado y total de filas insertadas.
+    """
+    try:
+        insert_count = 0
+        total_rows = len(fields[0])
+        for start in range(0, total_rows, chunk_size):
+            chunk = [column[start:start + chunk_size] for column in fields]
+            insert_result = milvus_registry.run(collection_name, lambda collection: collection.insert(chunk), load=False)
+            insert_count += insert_result.insert_count
+
+        milvus_registry.run(collection_name, lambda collection: collection.flush(), load=False)
+        return {
+            "status": "OK",
+            "message": "Datos inyectados correctamente",
+            "insert_count": insert_count
+            }
+    except Exception as e:
+        logger.error(f"❌ Error al insertar en bloque en la colección '{collection_name}': {e}")
+        raise MilvusConnectionError(f"No se pudo insertar en la colección: {collection_name}. Detalle: {e}")
+
+
+DEAD_LETTER_PATH = WRITE_BUFFER.get("dead_letter_path", "outputs/dead_letter/vector_writes.jsonl")
+if not os.path.isabs(DEAD_LETTER_PATH):
+    DEAD_LETTER_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', DEAD_LETTER_PATH))
+
+vector_write_buffer = VectorWriteBuffer(
+    save_collection_bulk,
+    max_rows=WRITE_BUFFER.get("max_rows", 500),
+    max_delay_s=WRITE_BUFFER.get("max_delay_s", 2.0),
+    grace_period_s=WRITE_BUFFER.get("grace_period_s", 10.0),
+    max_retries=WRITE_BUFFER.get("max_retries", 5),
+    retry_backoff_s=WRITE_BUFFER.get("retry_backoff_s", 1.0),
+    dead_letter_path=DEAD_LETTER_PATH
+)
+
+
+def _merge_hits(hits: list, pending_hits: list, fields: list, top_k: int) -> list:
+    # Une los hits de Milvus con los del buffer sin duplicar filas ya visibles en Milvus
+    seen = {tuple(hit.get(field) for field in fields) for hit in hits}
+    merged = hits + [hit for hit in pending_hits if tuple(hit.get(field) for field in fields) not in seen]
+    merged.sort(key=lambda hit: hit["score"], reverse=True)
+    return merged[:top_k]
+
+
+def search_collection(collection_name: str, query_embedding: list, fields: list, top_k: int, full_search: bool=False, threshold: float=None):
+    from rich import print 
+    if threshold is None:
+        threshold = SIMILARITY_THRESHOLD[collection_name]
+    try:
+        results = milvus_registry.run(collection_name, lambda collection: collection.search(
+            data=[query_embedding],
+            anns_field="embedding",
+            param={"metric_type": "COSINE", "params": {"nprobe": 10}},
+            limit=top_k,
+            output_fields=fields
+        ))
+
+        if not results or not results[0]:
+            return []
+
+        hit_data = [
+            {**hit.to_dict()['entity'], "score": hit.distance, "id": hit.id} 
+            for hit in results[0]
+            if hit.distance >= threshold
+            ]
+
+        if WRITE_BUFFER.get("enabled", True) and WRITE_BUFFER.get("read_your_writes", True):
+            hit_data = _merge_hits(
+                hit_data,
+                vector_write_buffer.search(collection_name, query_embedding, fields, top_k, threshold),
+                fields,
+                top_k
+            )
+
+        if hit_data:
+            logger.info(f"🕵🏻 Resultados de la búsqueda en la colección: '{collection_name}'")
+            for i, hit in enumerate(hit_data):        
+                print(f"\t🔹 {i+1} - Distancia: {float(hit['score']):.2f} | Pregunta: {hit['question'][:80]}")
+        else:
+            return []
+        
+        return hit_data
+
+    except Exception as e:
+        logger.error(f"❌ Error al buscar en la colección '{collection_name}': {e}")
+        raise MilvusConnectionError(f"No se pudo realizar la búsqueda en la colección: {collection_name}. Detalle: {e}")
+
+
+def _retrieval_plan(top_k: int = None) -> list:
+    """
+    Arma la lista de búsquedas a partir de la configuración `retrieval`.
+
+    Args:
+        top_k (int): Si se indica, reemplaza el top_k configurado de cada colección.
+
+    Returns:
+        list: Tuplas (llave de contexto, colección, campos de salida, top_k, umbral).
+    """
+    plan = []
+    for collection_key, context_key in CONTEXT_KEYS.items():
+        spec = RETRIEVAL.get(collection_key)
+        if not spec or not spec.get("enabled", True):
+            continue
+        collection_name = COLLECTIONS_NAME[collection_key]
+        plan.append((
+            context_key,
+            collection_name,
+            spec["output_fields"],
+            top_k or spec.get("top_k", 3),
+            spec.get("threshold", SIMILARITY_THRESHOLD[collection_name])
+        ))
+    return plan
+
+
+def get_context_by_type(question: str, top_k: int = None) -> dict:    
+    embedding = generate_embedding(question)
+
+    context = {"sql": [], "ddl": [], "docs": []}    
+    for context_key, collection_name, fields, k, threshold in _retrieval_plan(top_k):
+        context[context_key] = search_collection(collection_name, embedding, fields, k, threshold=threshold)
+    
+    return context
+
+
+async def search_collection_async(collection_name: str, query_embedding: list, fields: list, top_k: int, threshold: float = None):
+    """Ejecuta `search_collection` en el pool de Milvus sin bloquear el event loop."""
+    with observe_stage("milvus_search", collection_name):
+        return await run_blocking("milvus", search_collection, collection_name, query_embedding, fields, top_k, threshold=threshold)
+
+
+async def get_context_by_type_async(question: str, top_k: int = None) -> dict:
+    """
+    Recupera contexto de todas las colecciones configuradas en `retrieval`.
+    Las búsquedas se lanzan en paralelo, por lo que la latencia es la de la más lenta.
+    """
+    embedding = await generate_embedding_async(question)
+
+    context = {"sql": [], "ddl": [], "docs": []}
+    plan = _retrieval_plan(top_k)
+    results = await asyncio.gather(*[
+        search_collection_async(collection_name, embedding, fields, k, threshold=threshold)
+        for _, collection_name, fields, k, threshold in plan
+    ])
+    for (context_key, *_), hits in zip(plan, results):
+        context[context_key] = hits
+
+    return context
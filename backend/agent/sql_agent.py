@@ -1,14 +1,18 @@
 import sys
 import os
 import json
+import re
+import time
+import asyncio
 import logging
-from datetime import datetime
-from shared.utils import load_prompt_template, safe_extract_sql, log_event
-from core.llm import call_model
+from shared.utils import load_prompt_template, safe_extract_sql, load_config
+from shared.app_config import on_config_reload
+from core.llm import call_model_async, call_model_stream_async
 from core.query_validator import validate_sql_query
-from core.query_executor import execute_sql
+from core.query_executor import execute_sql_async
+from core.metrics import observe_stage, current_domain
 from core.exceptions import ReformulationError, RagContextError, SQLAgentPipelineError, FlowGenerationError
-from agent.rag_agent import get_context_by_type 
+from agent.rag_agent import get_context_by_type_async
 
 
 logger = logging.getLogger("sql_agent")
@@ -21,190 +25,412 @@ if not logger.hasHandlers():
     console_handler.setFormatter(formatter)
     logger.addHandler(console_handler)
 
-def handle_user_question(question: str, domain: str):
-    """
-    Agente SQL generalizado para múltiples dominios (ej. tickets, ventas, inventario).
+CONFIG_JSON = load_config()
+SEMANTIC_FAST_PATH = CONFIG_JSON.get("semantic_fast_path", {})
+COST_GUARD = CONFIG_JSON.get("cost_guard", {})
+PIPELINE = CONFIG_JSON.get("pipeline", {})
+REFORMULATION_POLICY = CONFIG_JSON.get("reformulation_policy", {})
 
-    Args:
-        question (str): Pregunta del usuario en lenguaje natural.
-        domain (str): Dominio de datos. Define el contexto y prompt.
+
+@on_config_reload
+def _refresh_pipeline_settings(config):
+    # Políticas del pipeline que se pueden ajustar en caliente con /config/reload
+    global SEMANTIC_FAST_PATH, COST_GUARD, PIPELINE, REFORMULATION_POLICY
+    SEMANTIC_FAST_PATH = config.section("semantic_fast_path")
+    COST_GUARD = config.section("cost_guard")
+    PIPELINE = config.section("pipeline")
+    REFORMULATION_POLICY = config.section("reformulation_policy")
+
+COST_RETRY_HINT = (
+    "\n\nIMPORTANTE: una versión anterior de esta consulta fue rechazada por ser demasiado costosa "
+    "(costo estimado {total_cost:.0f}, filas estimadas {plan_rows:.0f}). Genera una consulta más selectiva: "
+    "filtra por rango de fechas, evita SELECT *, evita productos cartesianos y agrega LIMIT si aplica."
+)
+
+async def _emit(emit, event: dict):
+    if emit is not None:
+        await emit(event)
+
+
+async def _generate(model: str, prompt: str, step: str, emit=None):
+    """
+    Llama al modelo; si hay un `emit`, transmite los fragmentos como eventos "token" de la etapa `step`.
 
     Returns:
-        tuple: SQL generado, modelo usado, resultado de ejecución
+        tuple: Texto generado, duración en segundos y respuesta completa (None al transmitir).
     """
-    total_time = 0
-    flow_text = ''
-    # Cargar prompt adecuado al dominio
-    try:
-        sql_prompt_template = load_prompt_template(domain, "system_context_rag.txt")
-    except FileNotFoundError:
-        raise ValueError(f"❌ No se encontró prompt para el dominio: {domain}")
+    if emit is None:
+        return await call_model_async(model, prompt)
 
-    # Paso 1: Reformulación (opcionalmente usar otro modelo por dominio)
+    start_time = time.time()
+    chunks = []
+    async for chunk in call_model_stream_async(model, prompt):
+        chunks.append(chunk)
+        await emit({"stage": "token", "step": step, "content": chunk})
+    return "".join(chunks), round(time.time() - start_time, 2), None
+
+
+async def _timed(timings: dict, stage: str, awaitable, model: str = "", observe: bool = True):
+    """
+    Espera `awaitable` y registra su duración (segundos de reloj) en `timings[stage]`.
+    Con `observe=True` también la publica en el histograma por etapa de `/metrics`.
+    """
+    start_time = time.time()
+    if observe:
+        with observe_stage(stage, model):
+            result = await awaitable
+    else:
+        result = await awaitable
+    timings[stage] = round(time.time() - start_time, 3)
+    return result
+
+
+def _validate(sql: str):
+    with observe_stage("validation", "sqlglot") as observation:
+        is_valid, sql, msg = validate_sql_query(sql)
+        if not is_valid:
+            observation.outcome = "invalid"
+    return is_valid, sql, msg
+
+
+async def _reformulate(question: str, domain: str, emit=None):
     try:
         logger.info("💭 Generando reformulación")
+        await _emit(emit, {"stage": "message", "message": "Reformulando pregunta..."})
         enhancer_prompt = load_prompt_template(domain, "question_enhancer.txt")
         formatted_enhancer_prompt = enhancer_prompt.format(question=question.strip())
-        enhanced_question, duration, _ = call_model("gemma", formatted_enhancer_prompt)
-        total_time += duration
+        enhanced_question, duration, _ = await _generate("gemma", formatted_enhancer_prompt, "reformulation", emit)
+        await _emit(emit, {"stage": "reformulation", "content": enhanced_question})
         logger.info(f"💭 Reformulación completa ( {duration:.2f} seg. )")
+        return enhanced_question, duration
     except Exception as e:
         logger.error(f"❌ Error al reformular la pregunta. Detalle: {str(e)}")
         raise ReformulationError (f"Error al reformular la pregunta: {str(e)}")
-    
-    # Paso 2: Búsqueda de contexto relacionada a la pregunta reformulada del usuario
+
+
+async def _retrieve(text: str, emit=None):
     try:
         logger.info("📚 Buscando contexto en Milvus...")
-        rag_data = get_context_by_type(enhanced_question, top_k=3)        
-    except Exception as e:        
-        rag_data = {"sql": [], "ddl": [], "docs": []}
+        await _emit(emit, {"stage": "message", "message": "Buscando contexto..."})
+        return await get_context_by_type_async(text)
+    except Exception as e:
         logger.error(f"⚠️ Fallo en búsqueda en Milvus: {str(e)}")
         raise RagContextError(f"Fallo al recuperar contexto: {str(e)}")
 
-    if not rag_data['sql']:        
-        logger.warning("⚠️ No se encontró contexto útil, se incluirá un flujo técnico.")          
+
+async def _generate_flow(enhanced_question: str, domain: str, emit=None):
+    try:
+        logger.info("🔀 Generando flujo técnico...")
+        await _emit(emit, {"stage": "message", "message": "Generando flujo técnico..."})
+        flow_prompt_template = load_prompt_template(domain, "flow_generator_rag.txt")
+        formatted_flow_prompt = flow_prompt_template.format(question=enhanced_question.strip())
+        flow_text, duration, _ = await _generate("mistral", formatted_flow_prompt, "flow", emit)
+        logger.info(f"🔀 Flujo técnico completo ( {duration:.2f} seg. )")
+        return flow_text, duration
+    except FileNotFoundError:
+        logger.warning("🔀 No se encontró prompt para flujo técnico.")
+        return "", 0
+    except Exception as e:
+        raise FlowGenerationError(f"Fallo al generar flujo técnico: {str(e)}")
+
+
+def _semantic_sql(rag_data: dict, domain: str):
+    """
+    Camino semántico rápido: si una pregunta almacenada es casi idéntica, su SQL validado
+    se reutiliza y se omiten el flujo técnico y la generación con IA.
+
+    Returns:
+        tuple: Hit semántico (o None) y su SQL validado (o None si no aplica).
+    """
+    semantic_hit = find_semantic_hit(rag_data["sql"], domain)
+    if not semantic_hit:
+        return None, None
+
+    logger.info(f"🎯 Pregunta casi idéntica encontrada (similitud {semantic_hit['score']:.3f}), se reutiliza su SQL.")
+    try:
+        is_valid, sql, msg = _validate(semantic_hit["sql"])
+    except Exception as e:
+        is_valid, msg = False, str(e)
+    if not is_valid:
+        logger.warning(f"🎯 El SQL almacenado no pasó la validación ({msg}), se generará uno nuevo.")
+        return semantic_hit, None
+    return semantic_hit, sql
+
+
+async def _context_and_flow(enhanced_question: str, rag_data: dict, domain: str, emit, timings: dict, model_time: float):
+    """Camino semántico y flujo técnico (solo si no hay SQL de referencia) a partir del contexto recuperado."""
+    semantic_hit, semantic_sql = _semantic_sql(rag_data, domain)
+
+    flow_text = ""
+    if not semantic_sql and not rag_data["sql"]:
+        logger.warning("⚠️ No se encontró contexto útil, se incluirá un flujo técnico.")
+        flow_text, duration = await _timed(timings, "flow", _generate_flow(enhanced_question, domain, emit), "mistral")
+        model_time += duration
+        await _emit(emit, {"stage": "flow", "content": flow_text})
+
+    return enhanced_question, rag_data, semantic_hit, semantic_sql, flow_text, model_time
+
+
+async def _front_serial(question: str, domain: str, emit, timings: dict):
+    """Reformulación → búsqueda de contexto → flujo técnico (si no hay SQL de referencia), en serie."""
+    enhanced_question, model_time = await _timed(timings, "reformulation", _reformulate(question, domain, emit), "gemma")
+    rag_data = await _timed(timings, "retrieval", _retrieve(enhanced_question, emit))
+    return await _context_and_flow(enhanced_question, rag_data, domain, emit, timings, model_time)
+
+
+async def _front_speculative(question: str, domain: str, emit, timings: dict, speculation: dict, raw_rag_data: dict = None):
+    """
+    Igual que `_front_serial`, pero traslapando etapas independientes:
+    - la búsqueda con la pregunta original corre mientras se reformula; si encuentra un SQL
+      validado casi idéntico, se cancela la reformulación y se toma el camino semántico;
+    - el flujo técnico se genera en paralelo a la búsqueda con la pregunta reformulada y se
+      cancela si la búsqueda encuentra SQL de referencia.
+    Si ya se tiene la búsqueda con la pregunta original (`raw_rag_data`), no se repite.
+    """
+    reformulation_task = asyncio.create_task(_timed(timings, "reformulation", _reformulate(question, domain, emit), "gemma"))
+
+    if raw_rag_data is None:
+        try:
+            raw_rag_data = await _timed(timings, "retrieval_raw", _retrieve(question))
+        except RagContextError:
+            raw_rag_data = None
+
+    if raw_rag_data is not None:
+        semantic_hit, semantic_sql = _semantic_sql(raw_rag_data, domain)
+        if semantic_sql:
+            speculation["semantic_from_raw"] = True
+            if reformulation_task.done() and not reformulation_task.exception():
+                enhanced_question, model_time = reformulation_task.result()
+            else:
+                reformulation_task.cancel()
+                enhanced_question, model_time = question.strip(), 0
+            return enhanced_question, raw_rag_data, semantic_hit, semantic_sql, "", model_time
+
+    enhanced_question, model_time = await reformulation_task
+
+    retrieval_task = asyncio.create_task(_timed(timings, "retrieval", _retrieve(enhanced_question, emit)))
+    flow_task = asyncio.create_task(_timed(timings, "flow", _generate_flow(enhanced_question, domain), "mistral"))
+    speculation["flow"] = "started"
+
+    try:
+        rag_data = await retrieval_task
+    except Exception:
+        flow_task.cancel()
+        raise
+
+    semantic_hit, semantic_sql = _semantic_sql(rag_data, domain)
+    flow_text = ""
+    if semantic_sql or rag_data["sql"]:
+        flow_task.cancel()
+        speculation["flow"] = "cancelled"
+    else:
+        logger.warning("⚠️ No se encontró contexto útil, se incluirá un flujo técnico.")
+        flow_text, duration = await flow_task
+        model_time += duration
+        speculation["flow"] = "used"
+        await _emit(emit, {"stage": "flow", "content": flow_text})
+
+    return enhanced_question, rag_data, semantic_hit, semantic_sql, flow_text, model_time
+
+
+async def handle_user_question_async(question: str, domain: str, emit=None, mode: str = None):
+    """
+    Agente SQL generalizado para múltiples dominios (ej. tickets, ventas, inventario).
+    Todas las etapas son asíncronas para no bloquear el event loop del servidor.
+
+    Args:
+        question (str): Pregunta del usuario en lenguaje natural.
+        domain (str): Dominio de datos. Define el contexto y prompt.
+        emit (callable): Corrutina opcional que recibe eventos de etapa y tokens (modo streaming).
+        mode (str): "serial" o "speculative"; por defecto `pipeline.mode` de la configuración.
+
+    Returns:
+        tuple: SQL, resultado de ejecución, flujo, reformulación, tiempo total,
+        tipo de resultado, contexto RAG y metadatos (camino tomado, modo y tiempos por etapa).
+    """
+    pipeline_start = time.time()
+    mode = mode or PIPELINE.get("mode", "serial")
+    timings, speculation = {}, {}
+    # Las etapas que no reciben el dominio (embedding, Milvus) lo toman de aquí para sus métricas
+    current_domain.set(domain)
+    # Cargar prompt adecuado al dominio
+    try:
+        sql_prompt_template = load_prompt_template(domain, "system_context_rag.txt")
+    except FileNotFoundError:
+        raise ValueError(f"❌ No se encontró prompt para el dominio: {domain}")
+
+    # Paso 0: con la política adaptativa, la reformulación solo se paga si la búsqueda
+    # con la pregunta original es débil y la pregunta no pasa la revisión local de calidad.
+    front_result, raw_rag_data = None, None
+    reformulation = {"decision": "reformulated", "reason": "policy_always"}
+    if REFORMULATION_POLICY.get("mode", "always") == "adaptive":
+        raw_rag_data = await _timed(timings, "retrieval_raw", _retrieve(question, emit))
+        reformulation = decide_reformulation(question, domain, raw_rag_data)
+        logger.info(f"💭 Política de reformulación: {reformulation}")
+        if reformulation["decision"] == "skipped":
+            await _emit(emit, {"stage": "reformulation", "content": question.strip(), "skipped": True})
+            front_result = await _context_and_flow(question.strip(), raw_rag_data, domain, emit, timings, 0)
+
+    # Pasos 1-3: reformulación, búsqueda de contexto, camino semántico y flujo técnico
+    if front_result is None and mode == "speculative":
+        front_result = await _front_speculative(question, domain, emit, timings, speculation, raw_rag_data)
+    elif front_result is None:
+        front_result = await _front_serial(question, domain, emit, timings)
+    enhanced_question, rag_data, semantic_hit, semantic_sql, flow_text, total_time = front_result
+
+    path = "generated"
+    cost_retry = False
+    sql, is_valid, msg = "", False, ""
+    rag_context = build_rag_context(rag_data)
+
+    if semantic_sql:
+        path = "semantic"
+        sql, is_valid = semantic_sql, True
+        await _emit(emit, {"stage": "message", "message": "Se reutiliza el SQL validado de una pregunta casi idéntica."})
+
+    if path == "generated":
+        logger.info("📝 Generando prompt para SQL")
+        logger.info(f"RAG CONTEXT:\n{rag_context}")
+
+        formatted_sql_prompt = sql_prompt_template.format(
+            question=question.strip(),
+            flow=flow_text.strip(),
+            context=rag_context.strip(),
+        )
+        
         try:
-            logger.info("🔀 Generando flujo técnico...")
-            flow_prompt_template = load_prompt_template(domain, "flow_generator_rag.txt")
-            formatted_flow_prompt = flow_prompt_template.format(question=enhanced_question.strip())
-            flow_text, duration, _ = call_model("mistral", formatted_flow_prompt)
+            logger.info("💡 Generando SQL con IA...")
+            await _emit(emit, {"stage": "message", "message": "Generando SQL..."})
+            raw_sql, duration, _ = await _timed(timings, "sql_generation", _generate("mistral", formatted_sql_prompt, "sql", emit), "mistral")
             total_time += duration
-            logger.info(f"🔀 Flujo técnico completo ( {duration:.2f} seg. )")
-        except FileNotFoundError:
-            logger.warning("🔀 No se encontró prompt para flujo técnico.")
+            logger.info(f"💡 SQL generado ( {duration:.2f} seg. )")
+
+            cleaned_sql = safe_extract_sql(raw_sql)    
+            is_valid, sql, msg = _validate(cleaned_sql)
         except Exception as e:
-            raise FlowGenerationError(f"Fallo al generar flujo técnico: {str(e)}")
-    
-    logger.info("📝 Generando prompt para SQL")
-    rag_parts = []    
-    if rag_data["sql"]:
-        rag_parts.append("### ✅ SQL previamente validado como respuesta a preguntas similares:\n\n" + "\n".join(
-            [f"• {item['question']}\n```sql\n{item['sql']}\n```" for item in rag_data["sql"]]
-        ))
+            raise SQLAgentPipelineError(f"Fallo al generar SQL: {str(e)}")
 
-    if rag_data["docs"]:
-        rag_parts.append("\n\n### 📚 Documentación útil o explicaciones relacionadas:\n\n" + "\n".join(
-            [f"{item['texto']}\n" for item in rag_data["docs"]]
-        ))
-   
-    rag_context = "".join(rag_parts)
-    logger.info(f"RAG CONTEXT:\n{rag_context}")
-
-    formatted_sql_prompt = sql_prompt_template.format(
-        question=question.strip(),
-        flow=flow_text.strip(),
-        context=rag_context.strip(),
-    )
-    
     try:
-        logger.info("💡 Generando SQL con IA...")
-        raw_sql, duration, _ = call_model("mistral", formatted_sql_prompt)
-        total_time += duration
-        logger.info(f"💡 SQL generado ( {duration:.2f} seg. )")
-
-        cleaned_sql = safe_extract_sql(raw_sql)    
-        is_valid, sql, msg = validate_sql_query(cleaned_sql)
         if is_valid:        
             # Paso 4: Ejecutar
             logger.info("⚡ Ejecutando SQL...")
-            result, duration = execute_sql(sql, domain=domain)     
-            return_type = "success" if "error" not in result  else "fails"
+            await _emit(emit, {"stage": "sql", "content": sql})
+            await _emit(emit, {"stage": "message", "message": "Ejecutando consulta..."})
+            result, duration = await _timed(timings, "execution", execute_sql_async(sql, domain=domain), observe=False)
             total_time += duration
             logger.info(f"⚡ SQL ejecutado ( {duration:.2f} seg. )")
+
+            # Si el plan excede los límites del dominio, se pide al modelo una versión más selectiva (una vez)
+            if result.get("too_expensive") and path == "generated" and COST_GUARD.get("retry_with_hint", False):
+                logger.warning(f"💸 SQL demasiado costoso {result['estimate']}, se reintenta con una pista.")
+                cost_retry = True
+                retry_prompt = formatted_sql_prompt + COST_RETRY_HINT.format(**result["estimate"])
+                await _emit(emit, {"stage": "message", "message": "La consulta es demasiado costosa, se genera una más selectiva..."})
+                raw_sql, duration, _ = await _timed(timings, "cost_retry", _generate("mistral", retry_prompt, "sql", emit), "mistral")
+                total_time += duration
+                retry_valid, retry_sql, retry_msg = _validate(safe_extract_sql(raw_sql))
+                if retry_valid:
+                    sql = retry_sql
+                    await _emit(emit, {"stage": "sql", "content": sql})
+                    # `execute_sql_async` ya publica su histograma "execution"; aquí solo falta el desglose
+                    result, duration = await _timed(timings, "cost_retry_execution", execute_sql_async(sql, domain=domain), observe=False)
+                    total_time += duration
+                else:
+                    logger.error(f"💸 El SQL reintentado es inválido: {retry_msg}")
+
+            return_type = "success" if "error" not in result  else "fails"
         else:
             logger.error(f"⚡ SQL inválido: {msg}")
+            result, return_type = {"error": f"SQL inválido: {msg}"}, "fails"
     except Exception as e:
-        raise SQLAgentPipelineError(f"Fallo al generar SQL: {str(e)}")
+        raise SQLAgentPipelineError(f"Fallo al ejecutar SQL: {str(e)}")
 
-    logger.info(f"🧠 Tiempo total IA: {total_time:.2f} seg.")    
-    return sql, result, flow_text, enhanced_question, total_time, return_type, rag_context
+    timings["total"] = round(time.time() - pipeline_start, 3)
+    meta = {
+        "path": path,
+        "semantic_score": semantic_hit["score"] if semantic_hit else None,
+        "cost_retry": cost_retry,
+        "pipeline_mode": mode,
+        "reformulation": reformulation,
+        "timings": timings,
+        "speculation": speculation
+    }
 
+    logger.info(f"🧠 Tiempo total IA: {total_time:.2f} seg. | Camino: {path} | Modo: {mode} | Etapas: {timings}")    
+    return sql, result, flow_text, enhanced_question, total_time, return_type, rag_context, meta
 
-# Nuevo: funciones separadas por etapa
-def generate_reformulation(question: str, domain: str):
-    enhancer_prompt = load_prompt_template(domain, "question_enhancer.txt")
-    prompt = enhancer_prompt.format(question=question.strip())
-    return call_model("gemma", prompt)
 
-def generate_flow(enhanced_question: str, domain: str):
-    try:
-        flow_prompt = load_prompt_template(domain, "flow_generator_prompt.txt")
-        prompt = flow_prompt.format(question=enhanced_question.strip())
-        return call_model("mistral", prompt)
-    except FileNotFoundError:
-        return "", 0, {}
+def passes_quality_check(question: str, domain: str) -> bool:
+    """
+    Revisión local (sin modelo) de si la pregunta ya es suficientemente precisa:
+    longitud razonable y al menos un término propio del dominio.
+    """
+    check = REFORMULATION_POLICY.get("quality_check", {})
+    if not check.get("enabled", False):
+        return False
 
-def generate_sql(question: str, flow: str, domain: str):
-    sql_prompt = load_prompt_template(domain, "system_context.txt")
-    prompt = sql_prompt.format(question=question.strip(), flujo=flow.strip())
-    return call_model("mistral", prompt)
+    words = re.findall(r"\w+", question.lower())
+    if not check.get("min_words", 6) <= len(words) <= check.get("max_words", 40):
+        return False
 
-def run_sql_validation_and_execute(raw_sql: str, domain: str):
-    cleaned_sql = safe_extract_sql(raw_sql)
-    is_valid, final_sql = validate_sql_query(cleaned_sql)
-    if not is_valid:
-        raise ValueError("❌ El SQL generado no pasó la validación sintáctica.")
-    result = execute_sql(final_sql, domain)
-    return final_sql, result
+    domain_terms = check.get("domain_terms", {}).get(domain, [])
+    return any(term in words for term in domain_terms)
 
-def handle_user_question_stream(question: str, domain: str, request_id: str, client_ip: str):
-    total_time = 0
-    model_used = "gemma + mistral"
 
-    # Acumuladores para logging
-    enhanced, flow, sql_cleaned, result, error_msg = "", "", "", {}, ""
-    start_time = datetime.now()
+def decide_reformulation(question: str, domain: str, raw_rag_data: dict) -> dict:
+    """
+    Decide si se omite la reformulación a partir de la búsqueda con la pregunta original.
 
-    try:
-        yield json.dumps({"stage": "start", "message": "Reformulando pregunta..."})
-        enhanced, duration, _ = generate_reformulation(question, domain)
-        total_time += duration
-        yield json.dumps({"stage": "reformulation", "content": enhanced})
-
-        yield json.dumps({"stage": "message", "message": "Generando flujo técnico..."})
-        flow, duration, _ = generate_flow(enhanced, domain)
-        total_time += duration
-        yield json.dumps({"stage": "flow", "content": flow})
-
-        yield json.dumps({"stage": "message", "message": "Generando SQL..."})
-        raw_sql, duration, _ = generate_sql(question, flow, domain)
-        total_time += duration
-        sql_cleaned = safe_extract_sql(raw_sql)
-        yield json.dumps({"stage": "sql", "content": sql_cleaned})
-
-        yield json.dumps({"stage": "message", "message": "Ejecutando consulta..."})
-        final_sql, result = run_sql_validation_and_execute(raw_sql, domain)
-        yield json.dumps({"stage": "result", "content": result})
-        log_event(
-            request_id=request_id,
-            client_ip=client_ip,
-            user_question=question,
-            reformulation=enhanced,
-            flow=flow,
-            generated_sql=sql_cleaned,
-            result=result,
-            success=True,
-            model=model_used,
-            domain=domain,
-            duration=total_time
-        )
-        yield json.dumps({"stage": "done", "total_time": total_time})
+    Returns:
+        dict: Decisión ("skipped" o "reformulated"), motivo y mejor similitud encontrada.
+    """
+    best_score = max((hit["score"] for hit in raw_rag_data["sql"]), default=0.0)
+    if best_score >= REFORMULATION_POLICY.get("min_hit_score", 0.85):
+        return {"decision": "skipped", "reason": "high_confidence_hit", "best_score": best_score}
+    if passes_quality_check(question, domain):
+        return {"decision": "skipped", "reason": "quality_check", "best_score": best_score}
+    return {"decision": "reformulated", "reason": "weak_retrieval", "best_score": best_score}
 
-    except Exception as e:
-        error_msg = str(e)
-        log_event(
-            request_id=request_id,
-            client_ip=client_ip,
-            user_question=question,
-            reformulation=enhanced,
-            flow=flow,
-            generated_sql=sql_cleaned,
-            result={"error": error_msg},
-            success=False,
-            model=model_used,
-            domain=domain,
-            duration=(datetime.now() - start_time).total_seconds()
-        )
 
-        yield json.dumps({"stage": "error", "message": error_msg})
+def find_semantic_hit(sql_hits: list, domain: str):
+    """
+    Devuelve el hit de `sql_agent_questions` que habilita el camino semántico rápido.
+
+    Args:
+        sql_hits (list): Hits de la colección de preguntas, ordenados por similitud.
+        domain (str): Dominio de la pregunta; define el umbral.
+
+    Returns:
+        dict | None: Mejor hit si supera el umbral del dominio.
+    """
+    if not SEMANTIC_FAST_PATH.get("enabled", False) or not sql_hits:
+        return None
+
+    threshold = SEMANTIC_FAST_PATH.get("thresholds", {}).get(domain, SEMANTIC_FAST_PATH.get("default_threshold", 0.97))
+    best_hit = max(sql_hits, key=lambda hit: hit["score"])
+    return best_hit if best_hit["score"] >= threshold else None
 
+
+def build_rag_context(rag_data: dict) -> str:
+    rag_parts = []    
+    if rag_data["sql"]:
+        rag_parts.append("### ✅ SQL previamente validado como respuesta a preguntas similares:\n\n" + "\n".join(
+            [f"• {item['question']}\n```sql\n{item['sql']}\n```" for item in rag_data["sql"]]
+        ))
+
+    if rag_data["ddl"]:
+        rag_parts.append("\n\n### 🧱 Estructura de tablas (DDL) relacionada:\n\n" + "\n".join(
+            [f"```sql\n{item['ddl']}\n```" for item in rag_data["ddl"]]
+        ))
+
+    if rag_data["docs"]:
+        rag_parts.append("\n\n### 📚 Documentación útil o explicaciones relacionadas:\n\n" + "\n".join(
+            [f"{item['texto']}\n" for item in rag_data["docs"]]
+        ))
+   
+    return "".join(rag_parts)
+
+
+def handle_user_question(question: str, domain: str):
+    """Envoltura síncrona de `handle_user_question_async` para scripts y pruebas locales."""
+    return asyncio.run(handle_user_question_async(question, domain))
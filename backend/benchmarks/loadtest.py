@@ -0,0 +1,360 @@
+# backend/benchmarks/loadtest.py
+
+"""
+Prueba de carga del backend: levanta `uvicorn benchmarks.stand_in_app:app` con los servicios
+sustitutos de `stand_ins.py`, envía `/generate_sql`, `/execute_sql` y `/training` con la mezcla,
+concurrencia o tasa de llegada indicadas y reporta curvas de latencia vs. throughput y tasa de
+errores por cada combinación de workers de uvicorn y modo de pipeline.
+
+- Carga cerrada (`--concurrency`): N clientes que envían una petición tras otra.
+- Carga abierta (`--rate`): llegadas de Poisson a λ req/s; la latencia se mide desde la llegada
+  programada para que la cola del cliente no oculte la saturación del servidor.
+
+La capacidad de cada configuración es el mayor throughput cuyo p95 queda bajo `--slo-p95` con
+errores bajo `--max-error-rate`; sirve para dimensionar `agente_sql_backend` en
+docker-compose-agentes.yaml (workers por contenedor y número de réplicas).
+
+Uso (desde backend/):
+    python benchmarks/loadtest.py --concurrency 1 2 4 8 16 --duration 20
+    python benchmarks/loadtest.py --rate 1 2 4 8 --workers 1 2 4 --modes serial speculative
+    python benchmarks/loadtest.py --mix generate_sql=8 execute_sql=3 training=1 --csv curvas.csv
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import random
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+import httpx
+
+BACKEND_PATH = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND_PATH))
+from benchmarks.stand_ins import StandInServer, ReplayResponder, benchmark_env, load_cases
+from benchmarks.replay import parse_latency, summarize
+
+ENDPOINTS = ("generate_sql", "execute_sql", "training")
+DEFAULT_MIX = {"generate_sql": 8, "execute_sql": 3, "training": 1}
+
+
+def parse_mix(specs: list) -> dict:
+    """`["generate_sql=8", "training=1"]` → pesos por endpoint (los no indicados quedan en 0)."""
+    if not specs:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for spec in specs:
+        key, _, value = spec.partition("=")
+        if key not in ENDPOINTS:
+            raise SystemExit(f"❌ Endpoint desconocido: {key} (opciones: {', '.join(ENDPOINTS)})")
+        mix[key] = float(value or 1)
+    return mix
+
+
+class RequestSampler:
+    """Elige endpoint según la mezcla y arma el cuerpo a partir de los casos registrados."""
+
+    def __init__(self, cases: list, mix: dict, pipeline_mode: str, seed: int = 0):
+        self.rng = random.Random(seed)
+        self.pipeline_mode = pipeline_mode
+        self.questions = [case for case in cases if case.get("original_question")]
+        # Solo SQL que se ejecutó bien: un fallo registrado no dice nada de la capacidad
+        self.executable = [
+            case for case in cases
+            if case.get("generated_sql") and case.get("status") == "success"
+            and not (case.get("result") or {}).get("error")
+        ]
+        available = {"generate_sql": self.questions, "execute_sql": self.executable, "training": self.executable}
+        self.mix = {endpoint: weight for endpoint, weight in mix.items() if weight > 0 and available[endpoint]}
+        if not self.mix:
+            raise SystemExit("❌ No hay casos para los endpoints de la mezcla.")
+
+    def next(self) -> tuple:
+        endpoint = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        if endpoint == "generate_sql":
+            case = self.rng.choice(self.questions)
+            body = {"question": case["original_question"], "domain": case.get("domain") or "tickets"}
+            if self.pipeline_mode:
+                body["pipeline_mode"] = self.pipeline_mode
+        elif endpoint == "execute_sql":
+            case = self.rng.choice(self.executable)
+            body = {"sql": case["generated_sql"], "domain": case.get("domain") or "tickets", "use_cache": False}
+        else:
+            case = self.rng.choice(self.executable)
+            body = {"question": case["original_question"], "type": "sql", "content": case["generated_sql"]}
+        return endpoint, body
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Backend:
+    """Proceso de uvicorn con `stand_in_app` y `workers` procesos."""
+
+    def __init__(self, workers: int, env: dict, log_path: str):
+        self.workers = workers
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._log = open(log_path, "a", encoding="utf-8")
+        self._process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "benchmarks.stand_in_app:app",
+             "--host", "127.0.0.1", "--port", str(self.port),
+             "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+            cwd=BACKEND_PATH, env=env, stdout=self._log, stderr=subprocess.STDOUT
+        )
+
+    def wait_ready(self, timeout_s: float = 120):
+        deadline = time.time() + timeout_s
+        while time.time() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"uvicorn terminó con código {self._process.returncode} (ver {self._log.name})")
+            try:
+                if httpx.get(f"{self.url}/health", timeout=1).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.5)
+        raise RuntimeError(f"El backend no respondió /health en {timeout_s} seg.")
+
+    def stop(self):
+        self._process.terminate()
+        try:
+            self._process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+        self._log.close()
+
+
+async def send(client: httpx.AsyncClient, endpoint: str, body: dict) -> tuple:
+    """Devuelve (status, tipo de error); status 0 si la petición no obtuvo respuesta."""
+    try:
+        response = await client.post(f"/{endpoint}", json=body)
+        return response.status_code, "http_5xx" if response.status_code >= 500 else None
+    except httpx.TimeoutException:
+        return 0, "timeout"
+    except httpx.HTTPError as e:
+        return 0, type(e).__name__
+
+
+async def run_level(base_url: str, sampler: RequestSampler, duration_s: float, warmup_s: float,
+                    concurrency: int = None, rate: float = None, max_in_flight: int = 1000,
+                    timeout_s: float = 60) -> list:
+    """
+    Genera carga cerrada (`concurrency`) o abierta (`rate`) durante `warmup_s + duration_s`.
+
+    Returns:
+        list: Muestras (endpoint, inicio relativo, latencia ms, status, error) tomadas después del calentamiento.
+    """
+    limits = httpx.Limits(max_connections=concurrency or max_in_flight, max_keepalive_connections=concurrency or max_in_flight)
+    samples = []
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout_s, limits=limits) as client:
+        start = time.perf_counter()
+        measure_from, deadline = start + warmup_s, start + warmup_s + duration_s
+
+        async def request(scheduled: float):
+            endpoint, body = sampler.next()
+            status, error = await send(client, endpoint, body)
+            if scheduled >= measure_from:
+                samples.append((endpoint, scheduled - measure_from, (time.perf_counter() - scheduled) * 1000, status, error))
+
+        if concurrency:
+            async def user():
+                while time.perf_counter() < deadline:
+                    await request(time.perf_counter())
+            await asyncio.gather(*(user() for _ in range(concurrency)))
+            return samples
+
+        pending, next_arrival = set(), start
+        while next_arrival < deadline:
+            await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+            if len(pending) >= max_in_flight:
+                # El cliente ya no puede sostener la tasa: se cuenta como error en vez de esperar
+                if next_arrival >= measure_from:
+                    samples.append(("dropped", next_arrival - measure_from, 0.0, 0, "dropped"))
+            else:
+                task = asyncio.create_task(request(next_arrival))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            next_arrival += sampler.rng.expovariate(rate)
+        if pending:
+            await asyncio.gather(*pending)
+    return samples
+
+
+def summarize_level(samples: list, duration_s: float) -> dict:
+    """Throughput, percentiles y errores por endpoint y en total."""
+    groups = {"all": samples}
+    for sample in samples:
+        groups.setdefault(sample[0], []).append(sample)
+    summary = {}
+    for name, group in groups.items():
+        ok = [latency for _, _, latency, _, error in group if error is None]
+        # Throughput = respuestas exitosas que terminaron dentro de la ventana medida
+        completed = sum(1 for _, started, latency, _, error in group if error is None and started + latency / 1000 <= duration_s)
+        errors = {}
+        for *_, error in group:
+            if error:
+                errors[error] = errors.get(error, 0) + 1
+        statuses = {}
+        for _, _, _, status, _ in group:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        summary[name] = {
+            "requests": len(group),
+            "throughput_rps": round(completed / duration_s, 3),
+            "error_rate": round(sum(errors.values()) / len(group), 4) if group else 0.0,
+            "errors": errors,
+            "status_codes": statuses,
+            "latency_ms": summarize(ok)
+        }
+    return summary
+
+
+def capacity(levels: list, slo_p95_ms: float, max_error_rate: float) -> dict:
+    """Mayor throughput medido que cumple el SLO de p95 y la tasa de errores."""
+    within = [
+        level for level in levels
+        if level["summary"]["all"]["latency_ms"]["p95"] <= slo_p95_ms
+        and level["summary"]["all"]["error_rate"] <= max_error_rate
+    ]
+    if not within:
+        return {"throughput_rps": 0.0, "load": None}
+    best = max(within, key=lambda level: level["summary"]["all"]["throughput_rps"])
+    return {"throughput_rps": best["summary"]["all"]["throughput_rps"], "load": best["load"]}
+
+
+def print_curve(config: dict):
+    print(f"\n📈 workers={config['workers']} | modo={config['pipeline_mode']} | capacidad "
+          f"{config['capacity']['throughput_rps']:.2f} req/s (carga {config['capacity']['load']})")
+    header = f"{'carga':>10}{'req/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'errores':>10}   por endpoint (p95 ms / errores)"
+    print(header + "\n" + "-" * len(header))
+    for level in config["levels"]:
+        total = level["summary"]["all"]
+        latency = total["latency_ms"]
+        detail = "  ".join(
+            f"{name}={stats['latency_ms']['p95']:.0f}/{stats['error_rate']:.0%}"
+            for name, stats in level["summary"].items() if name != "all"
+        )
+        print(f"{level['load']:>10}{total['throughput_rps']:>10.2f}{latency['p50']:>10.1f}{latency['p95']:>10.1f}"
+              f"{latency['p99']:>10.1f}{total['error_rate']:>10.1%}   {detail}")
+
+
+def write_csv(path: str, configs: list):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["workers", "pipeline_mode", "load", "endpoint", "requests", "throughput_rps",
+                         "error_rate", "p50_ms", "p95_ms", "p99_ms", "mean_ms"])
+        for config in configs:
+            for level in config["levels"]:
+                for endpoint, stats in level["summary"].items():
+                    latency = stats["latency_ms"]
+                    writer.writerow([config["workers"], config["pipeline_mode"], level["load"], endpoint,
+                                     stats["requests"], stats["throughput_rps"], stats["error_rate"],
+                                     latency["p50"], latency["p95"], latency["p99"], latency["mean"]])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del backend contra servicios sustitutos.")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int, nargs="+", help="Niveles de clientes concurrentes (carga cerrada)")
+    load.add_argument("--rate", type=float, nargs="+", help="Niveles de llegadas por segundo (carga abierta)")
+    parser.add_argument("--duration", type=float, default=20, help="Segundos medidos por nivel")
+    parser.add_argument("--warmup", type=float, default=3, help="Segundos por nivel que no se miden")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1], help="Workers de uvicorn a comparar")
+    parser.add_argument("--modes", nargs="+", choices=["serial", "speculative"], default=[None],
+                        help="Modos de pipeline a comparar (por defecto el configurado)")
+    parser.add_argument("--mix", nargs="*", metavar="ENDPOINT=PESO", help="Mezcla de endpoints (por defecto generate_sql=8 execute_sql=3 training=1)")
+    parser.add_argument("--cases", nargs="*", help="Archivos JSONL (por defecto outputs/*/ptuning_*.jsonl)")
+    parser.add_argument("--latency", nargs="*", metavar="SERVICIO=MS", help="Latencias de los sustitutos")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplica todas las latencias")
+    parser.add_argument("--index", choices=["holdout", "all", "none"], default="holdout", help="Casos exitosos cargados en la colección de preguntas")
+    parser.add_argument("--max-in-flight", type=int, default=1000, help="Peticiones abiertas máximas en carga abierta")
+    parser.add_argument("--timeout", type=float, default=60, help="Timeout por petición (seg.)")
+    parser.add_argument("--slo-p95", type=float, default=5000, help="p95 máximo (ms) para considerar un nivel sostenible")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Tasa de errores máxima sostenible")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", help="Carpeta para logs, eventos y trazas del backend")
+    parser.add_argument("--output", help="Guarda el reporte en JSON")
+    parser.add_argument("--csv", help="Guarda las curvas en CSV (una fila por configuración, nivel y endpoint)")
+    args = parser.parse_args()
+
+    levels = [("concurrency", c) for c in args.concurrency] if args.concurrency else \
+             [("rate", r) for r in args.rate] if args.rate else [("concurrency", c) for c in (1, 2, 4, 8)]
+    latency = parse_latency(args.latency, args.latency_scale)
+    cases = load_cases(args.cases)
+    if not cases:
+        raise SystemExit("❌ No hay casos registrados para generar carga.")
+    mix = parse_mix(args.mix)
+
+    workdir = str(Path(args.workdir or tempfile.mkdtemp(prefix="loadtest_")).resolve())
+    os.makedirs(workdir, exist_ok=True)
+    server = StandInServer(latency=latency).start()
+    env = {
+        **os.environ,
+        **benchmark_env(server, workdir),
+        "STAND_IN_LATENCY": json.dumps(latency),
+        "STAND_IN_INDEX": args.index,
+        **({"STAND_IN_CASES": os.pathsep.join(str(Path(path).resolve()) for path in args.cases)} if args.cases else {})
+    }
+
+    # El proceso de prueba también lee la configuración (dominios del responder) con las sobrescrituras
+    os.environ.update(benchmark_env(server, workdir))
+    from shared.utils import load_config
+    server.responder = ReplayResponder(cases, list(load_config()["domain_to_db"]))
+
+    print(f"▶️ Prueba de carga | mezcla {mix} | niveles {[value for _, value in levels]} ({levels[0][0]}) | "
+          f"sustitutos en {server.url} | salida en {workdir}")
+    configs = []
+    try:
+        for workers in args.workers:
+            for mode in args.modes:
+                backend = Backend(workers, env, os.path.join(workdir, f"uvicorn_w{workers}.log")).wait_ready()
+                try:
+                    config = {"workers": workers, "pipeline_mode": mode or "default", "levels": []}
+                    for kind, value in levels:
+                        sampler = RequestSampler(cases, mix, mode, args.seed)
+                        samples = asyncio.run(run_level(
+                            backend.url, sampler, args.duration, args.warmup,
+                            concurrency=value if kind == "concurrency" else None,
+                            rate=value if kind == "rate" else None,
+                            max_in_flight=args.max_in_flight, timeout_s=args.timeout
+                        ))
+                        config["levels"].append({"load": value, "kind": kind, "summary": summarize_level(samples, args.duration)})
+                    config["capacity"] = capacity(config["levels"], args.slo_p95, args.max_error_rate)
+                    configs.append(config)
+                    print_curve(config)
+                finally:
+                    backend.stop()
+    finally:
+        server.stop()
+
+    best = max(configs, key=lambda config: config["capacity"]["throughput_rps"])
+    print(f"\n🏁 Mejor configuración: workers={best['workers']} modo={best['pipeline_mode']} → "
+          f"{best['capacity']['throughput_rps']:.2f} req/s con p95 ≤ {args.slo_p95:.0f} ms y errores ≤ {args.max_error_rate:.0%}")
+
+    report = {
+        "run": {"mix": mix, "duration_s": args.duration, "warmup_s": args.warmup, "slo_p95_ms": args.slo_p95,
+                "max_error_rate": args.max_error_rate, "index": args.index, "cases": len(cases)},
+        "latency_ms": latency,
+        "configs": configs,
+        "stand_ins": {"server": server.stats, "responder": server.responder.stats}
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 Reporte guardado en {args.output}")
+    if args.csv:
+        write_csv(args.csv, configs)
+        print(f"💾 Curvas guardadas en {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
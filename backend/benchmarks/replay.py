@@ -0,0 +1,279 @@
+# backend/benchmarks/replay.py
+
+"""
+Benchmark fuera de línea: reproduce los casos registrados en `outputs/*/ptuning_*.jsonl`
+a través de `handle_user_question_async` contra los servicios sustitutos de `stand_ins.py`
+y reporta rendimiento, percentiles por etapa y la sobrecarga propia del agente
+(tiempo de la etapa menos la latencia inyectada por los sustitutos).
+
+Uso (desde backend/):
+    python benchmarks/replay.py --concurrency 4 --mode serial
+    python benchmarks/replay.py --latency-scale 0 --output base.json          # solo código del agente
+    python benchmarks/replay.py --baseline base.json --max-regression 0.15     # falla si hay regresión
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from benchmarks.stand_ins import DEFAULT_LATENCY, StandInServer, benchmark_env, load_cases
+
+# Etapas de primer nivel del pipeline (hijas directas del span raíz)
+PIPELINE_STAGES = ("retrieval_raw", "reformulation", "retrieval", "flow", "sql_generation", "cost_retry", "validation", "execution")
+
+
+def percentile(values: list, q: float) -> float:
+    """Percentil con interpolación lineal (q entre 0 y 100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(values: list) -> dict:
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3) if values else 0.0,
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(max(values), 3) if values else 0.0
+    }
+
+
+def parse_latency(specs: list, scale: float) -> dict:
+    """`["gemma=300", "db=20"]` → latencias en ms (las no indicadas usan `DEFAULT_LATENCY`)."""
+    latency = dict(DEFAULT_LATENCY)
+    for spec in specs or []:
+        key, _, value = spec.partition("=")
+        if key not in latency:
+            raise SystemExit(f"❌ Servicio de latencia desconocido: {key} (opciones: {', '.join(latency)})")
+        latency[key] = float(value)
+    for key in latency:
+        if key != "jitter":
+            latency[key] *= scale
+    return latency
+
+
+def injected_ms(span: dict, children: dict, latency: dict) -> float:
+    """Latencia que agregaron los sustitutos dentro de `span` (media configurada si hay jitter)."""
+    name, attributes = span["name"], span["attributes"]
+    kids = children.get(span["spanId"], [])
+    if name == "llm.request":
+        return latency.get(attributes.get("model"), 0)
+    if name == "llm.stream":
+        return latency.get(attributes.get("model"), 0) + latency["token"] * attributes.get("chunks", 0)
+    if name == "embedding":
+        return latency["embedding"] if attributes.get("outcome") == "ok" else 0.0
+    if name == "milvus_search":
+        return latency["milvus"]
+    if name == "db.query":
+        return latency["db"]
+    if name in ("retrieval", "retrieval_raw"):
+        # Las búsquedas en las colecciones corren en paralelo: cuenta la más lenta
+        searches = [injected_ms(kid, children, latency) for kid in kids if kid["name"] == "milvus_search"]
+        others = [injected_ms(kid, children, latency) for kid in kids if kid["name"] != "milvus_search"]
+        return sum(others) + (max(searches) if searches else 0.0)
+    return sum(injected_ms(kid, children, latency) for kid in kids)
+
+
+def analyze_spans(spans: list, latency: dict, mode: str) -> dict:
+    """Duración y sobrecarga por nombre de span, más la sobrecarga total por petición."""
+    children, roots = {}, []
+    for span in spans:
+        if span["parentSpanId"]:
+            children.setdefault(span["parentSpanId"], []).append(span)
+        else:
+            roots.append(span)
+
+    durations, overheads, cancelled = {}, {}, 0
+    for span in spans:
+        if span["parentSpanId"] == "":
+            continue
+        if span["status"]["code"] == "ERROR" and span["status"]["message"] == "cancelled":
+            cancelled += 1
+            continue
+        duration = span["durationMs"]
+        durations.setdefault(span["name"], []).append(duration)
+        overheads.setdefault(span["name"], []).append(max(0.0, duration - injected_ms(span, children, latency)))
+
+    totals, framework = [], []
+    for root in roots:
+        totals.append(root["durationMs"])
+        if mode == "serial":
+            stages = [kid for kid in children.get(root["spanId"], []) if kid["name"] in PIPELINE_STAGES]
+            framework.append(max(0.0, root["durationMs"] - sum(injected_ms(kid, children, latency) for kid in stages)))
+
+    stages = {}
+    for name in sorted(durations, key=lambda n: (n not in PIPELINE_STAGES, n)):
+        stages[name] = {**summarize(durations[name]), "overhead": summarize(overheads[name])}
+    return {
+        "total": summarize(totals),
+        # En modo especulativo las etapas se traslapan y no hay una ruta única que restar
+        "framework_overhead": summarize(framework) if framework else None,
+        "stages": stages,
+        "cancelled_spans": cancelled
+    }
+
+
+def compare(report: dict, baseline: dict, max_regression: float, min_delta_ms: float) -> list:
+    """Etapas cuyo p95 empeoró más de `max_regression` (y más de `min_delta_ms`) contra la línea base."""
+    regressions = []
+    current = {"total": report["total"], **report["stages"]}
+    previous = {"total": baseline["total"], **baseline.get("stages", {})}
+    for name, stats in current.items():
+        before = previous.get(name)
+        if not before or not before.get("p95"):
+            continue
+        delta = stats["p95"] - before["p95"]
+        if delta > min_delta_ms and delta / before["p95"] > max_regression:
+            regressions.append({"stage": name, "baseline_p95": before["p95"], "p95": stats["p95"], "change": round(delta / before["p95"], 3)})
+    return regressions
+
+
+def print_report(report: dict):
+    run = report["run"]
+    print(f"\n📊 {run['requests']} peticiones | modo {run['mode']} | concurrencia {run['concurrency']} | "
+          f"{run['wall_s']:.2f} s | {run['throughput_rps']:.2f} req/s | errores {run['errors']}")
+    print(f"   Caminos: {run['paths']} | Resultados: {run['outcomes']}")
+    header = f"{'etapa':<18}{'n':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'sobrecarga p50':>16}{'p95':>10}"
+    print("\n" + header + "\n" + "-" * len(header))
+    rows = [("total", {**report["total"], "overhead": report["framework_overhead"] or {}})] + list(report["stages"].items())
+    for name, stats in rows:
+        overhead = stats.get("overhead") or {}
+        print(f"{name:<18}{stats['count']:>6}{stats['p50']:>10.1f}{stats['p95']:>10.1f}{stats['p99']:>10.1f}"
+              f"{overhead.get('p50', float('nan')):>16.1f}{overhead.get('p95', float('nan')):>10.1f}")
+    print("   (ms; sobrecarga = duración - latencia inyectada por los sustitutos)")
+
+
+async def replay(cases: list, args, handle_user_question_async, start_trace) -> dict:
+    semaphore = asyncio.Semaphore(args.concurrency)
+    paths, outcomes, errors = {}, {}, []
+
+    async def noop_emit(event):
+        pass
+
+    async def run_case(index: int, case: dict):
+        async with semaphore:
+            request_id = str(uuid.uuid4())
+            with start_trace("replay", request_id, case=case.get("request_id"), index=index) as trace:
+                try:
+                    *_, return_type, _, meta = await handle_user_question_async(
+                        case["original_question"],
+                        domain=case.get("domain") or "tickets",
+                        emit=noop_emit if args.stream else None,
+                        mode=args.mode
+                    )
+                    paths[meta["path"]] = paths.get(meta["path"], 0) + 1
+                    outcomes[return_type] = outcomes.get(return_type, 0) + 1
+                    trace.set_attributes(path=meta["path"], outcome=return_type)
+                except Exception as e:
+                    errors.append(f"{case.get('request_id')}: {e}")
+
+    jobs = [(i, case) for _ in range(args.repeat) for i, case in enumerate(cases)]
+    start_time = time.perf_counter()
+    await asyncio.gather(*(run_case(i, case) for i, case in jobs))
+    wall_s = time.perf_counter() - start_time
+    return {
+        "requests": len(jobs),
+        "wall_s": round(wall_s, 3),
+        "throughput_rps": round(len(jobs) / wall_s, 3) if wall_s else 0.0,
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "paths": paths,
+        "outcomes": outcomes
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay de casos de ptuning contra servicios sustitutos.")
+    parser.add_argument("--cases", nargs="*", help="Archivos JSONL (por defecto outputs/*/ptuning_*.jsonl)")
+    parser.add_argument("--limit", type=int, default=0, help="Máximo de casos a reproducir")
+    parser.add_argument("--repeat", type=int, default=1, help="Veces que se reproduce cada caso")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--mode", choices=["serial", "speculative"], default="serial")
+    parser.add_argument("--stream", action="store_true", help="Consume los modelos en streaming (como /generate_sql_stream)")
+    parser.add_argument("--latency", nargs="*", metavar="SERVICIO=MS", help=f"Latencias ({', '.join(DEFAULT_LATENCY)})")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplica todas las latencias (0 = solo código del agente)")
+    parser.add_argument("--index", choices=["holdout", "all", "none"], default="holdout", help="Casos exitosos cargados en la colección de preguntas")
+    parser.add_argument("--workdir", help="Carpeta para logs, eventos y trazas del benchmark")
+    parser.add_argument("--output", help="Guarda el reporte en JSON")
+    parser.add_argument("--baseline", help="Reporte JSON previo para detectar regresiones")
+    parser.add_argument("--max-regression", type=float, default=0.15, help="Aumento relativo de p95 tolerado")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="Diferencia mínima de p95 para considerar regresión")
+    args = parser.parse_args()
+
+    latency = parse_latency(args.latency, args.latency_scale)
+    cases = load_cases(args.cases)
+    if args.limit:
+        cases = cases[:args.limit]
+    if not cases:
+        raise SystemExit("❌ No hay casos para reproducir.")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="replay_")
+    server = StandInServer(latency=latency).start()
+    # La configuración del agente se lee una sola vez: las sobrescrituras van antes de importarlo
+    os.environ.update(benchmark_env(server, workdir))
+
+    from benchmarks.stand_ins import ReplayResponder, install_stand_ins
+    from shared.utils import init_config, load_config, get_log_writer
+    from core.tracing import start_trace
+    from agent.sql_agent import handle_user_question_async
+
+    logging.getLogger("sql_agent").setLevel(logging.ERROR)
+    init_config()
+    server.responder = ReplayResponder(cases, list(load_config()["domain_to_db"]))
+    installed = install_stand_ins(cases, latency, args.index)
+
+    print(f"▶️ Reproduciendo {len(cases)} casos x{args.repeat} (indexados: {installed['indexed']}) | sustitutos en {server.url} | salida en {workdir}")
+    run = asyncio.run(replay(cases, args, handle_user_question_async, start_trace))
+    get_log_writer().flush()
+    server.stop()
+
+    trace_file = os.environ["AGENT__TRACING__PATH"]
+    with open(trace_file, "r", encoding="utf-8") as f:
+        spans = [json.loads(line) for line in f if line.strip()]
+
+    report = {
+        "run": {**run, "mode": args.mode, "concurrency": args.concurrency, "stream": args.stream, "cases": len(cases)},
+        "latency_ms": latency,
+        **analyze_spans(spans, latency, args.mode),
+        "stand_ins": {
+            "server": server.stats,
+            "responder": server.responder.stats,
+            "database": installed["database"].stats
+        }
+    }
+    print_report(report)
+    if run["error_samples"]:
+        print(f"⚠️ Errores (muestra): {run['error_samples']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"💾 Reporte guardado en {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.max_regression, args.min_delta_ms)
+        if regressions:
+            print("🚨 Regresiones de p95:")
+            for regression in regressions:
+                print(f"   {regression['stage']}: {regression['baseline_p95']:.1f} → {regression['p95']:.1f} ms (+{regression['change']:.0%})")
+            sys.exit(1)
+        print("✅ Sin regresiones contra la línea base.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# backend/benchmarks/stand_in_app.py
+
+"""
+Aplicación FastAPI del agente con Milvus y el DWH sustituidos en el proceso, para pruebas
+de carga con `uvicorn benchmarks.stand_in_app:app --workers N` (desde backend/).
+
+Cada worker de uvicorn importa este módulo e instala sus propios sustitutos; los modelos y
+embeddings se redirigen al `StandInServer` del proceso que lanza la prueba mediante las
+sobrescrituras de `benchmark_env`. Variables de entorno:
+    STAND_IN_CASES    Archivos JSONL de casos separados por `os.pathsep` (por defecto outputs/*/ptuning_*.jsonl)
+    STAND_IN_LATENCY  Latencias en JSON (ms) para Milvus y el DWH
+    STAND_IN_INDEX    Casos cargados en la colección de preguntas (holdout/all/none)
+"""
+
+import os
+import sys
+import json
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from benchmarks.stand_ins import install_stand_ins, load_cases
+import core.init_collections
+
+cases_env = os.getenv("STAND_IN_CASES")
+cases = load_cases(cases_env.split(os.pathsep) if cases_env else None)
+install_stand_ins(cases, json.loads(os.getenv("STAND_IN_LATENCY", "{}")), os.getenv("STAND_IN_INDEX", "holdout"))
+
+# `main` se conecta a Milvus al importarse; las colecciones ya quedaron registradas en memoria
+core.init_collections.init_milvus_collections = lambda host, port, refresh=False: None
+
+from main import app  # noqa: E402
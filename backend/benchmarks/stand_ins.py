@@ -0,0 +1,585 @@
+# backend/benchmarks/stand_ins.py
+
+"""
+Servicios locales que sustituyen a NIM, al servicio de embeddings, a Milvus y al DWH
+para medir el código del agente sin GPUs ni acceso a la base de datos.
+
+- `StandInServer`: servidor HTTP con los endpoints de los modelos (chat y completions,
+  con streaming) y de embeddings. Responde lo que se registró en los casos de ptuning
+  y agrega una latencia configurable por servicio.
+- `InMemoryCollection`: colección compatible con `pymilvus.Collection` (search/insert/flush).
+- `ReplayDatabase`: fábrica de conexiones tipo psycopg2 que devuelve los resultados
+  registrados para cada SQL y ejecuta en SQLite los que no se conocen.
+"""
+
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+from pathlib import Path
+from types import SimpleNamespace
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+BACKEND_PATH = Path(__file__).resolve().parent.parent
+ROOT_PATH = BACKEND_PATH.parent
+sys.path.append(str(BACKEND_PATH))
+sys.path.append(str(ROOT_PATH))
+
+# Latencias por defecto (ms) de cada servicio sustituido; "jitter" es la variación relativa
+DEFAULT_LATENCY = {
+    "gemma": 300,
+    "mistral": 600,
+    "token": 15,
+    "embedding": 20,
+    "milvus": 5,
+    "db": 50,
+    "jitter": 0.0
+}
+
+# Misma dimensión que el esquema de las colecciones (core/init_collections.py)
+EMBEDDING_DIM = 1024
+
+
+def load_cases(paths: list = None) -> list:
+    """
+    Casos registrados por `log_event` en `outputs/{success,fails}/ptuning_*.jsonl`.
+
+    Returns:
+        list: Eventos (dict) únicos por request_id, en orden de fecha.
+    """
+    if paths is None:
+        paths = sorted((ROOT_PATH / "outputs").glob("*/ptuning_*_cases_*.jsonl"))
+    cases, seen = [], set()
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    case = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if not case.get("original_question") or case.get("request_id") in seen:
+                    continue
+                seen.add(case.get("request_id"))
+                cases.append(case)
+    return sorted(cases, key=lambda case: case.get("timestamp", ""))
+
+
+def _tokens(text: str) -> list:
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.findall(r"[a-z0-9]+", text)
+
+
+def hashed_embedding(text: str, dim: int = EMBEDDING_DIM) -> list:
+    """
+    Embedding determinista por hashing de palabras y bigramas: preguntas parecidas
+    quedan cerca, así el camino semántico y los umbrales se comportan de forma realista.
+    """
+    vector = [0.0] * dim
+    words = _tokens(text)
+    features = words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+    for feature in features:
+        digest = hashlib.md5(feature.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "little") % dim
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def _sleep_ms(ms: float, jitter: float = 0.0):
+    if ms > 0:
+        time.sleep(max(0.0, ms * (1 + random.uniform(-jitter, jitter))) / 1000)
+
+
+def normalize_sql(sql: str) -> str:
+    return re.sub(r"\s+", " ", (sql or "").strip().rstrip(";")).lower()
+
+
+class ReplayResponder:
+    """
+    Decide qué texto devuelve el modelo falso a partir del prompt: identifica la plantilla
+    (reformulación, flujo o SQL) y la pregunta insertada en ella, y busca el caso registrado.
+
+    Args:
+        cases (list): Casos de `load_cases`.
+        domains (list): Dominios cuyas plantillas se reconocen.
+    """
+
+    TEMPLATES = {
+        "reformulation": "question_enhancer.txt",
+        "flow": "flow_generator_rag.txt",
+        "sql": "system_context_rag.txt"
+    }
+
+    def __init__(self, cases: list, domains: list):
+        from shared.utils import load_prompt_template
+
+        self.by_question = {case["original_question"].strip(): case for case in cases}
+        self.by_enhanced = {(case.get("enhanced_question") or "").strip(): case for case in cases}
+        self.patterns = []
+        for domain in domains:
+            for kind, template_name in self.TEMPLATES.items():
+                try:
+                    template = load_prompt_template(domain, template_name)
+                except FileNotFoundError:
+                    continue
+                # Texto fijo alrededor de {question} una vez aplicado format (respeta las llaves escapadas)
+                rendered = template.format(question="\x00", flow="\x01", context="\x01")
+                before, after = rendered.split("\x00", 1)
+                anchor = before.rsplit("\x01", 1)[-1]
+                self.patterns.append((kind, anchor, after))
+        self._lock = threading.Lock()
+        self.stats = {"replayed": 0, "fallback": 0}
+
+    def _match(self, prompt: str):
+        for kind, anchor, after in self.patterns:
+            if prompt.endswith(after) and anchor in prompt:
+                start = prompt.rindex(anchor) + len(anchor)
+                return kind, prompt[start:len(prompt) - len(after)].strip()
+        return None, prompt.strip()
+
+    def respond(self, prompt: str) -> str:
+        kind, question = self._match(prompt)
+        if kind == "flow":
+            case = self.by_enhanced.get(question)
+            text = case.get("flow") if case else None
+        else:
+            case = self.by_question.get(question)
+            if kind == "reformulation":
+                text = case.get("enhanced_question") if case else None
+            else:
+                text = f"```sql\n{case['generated_sql']}\n```" if case and case.get("generated_sql") else None
+
+        with self._lock:
+            self.stats["replayed" if text else "fallback"] += 1
+        if text:
+            return text
+        # Sin caso registrado: respuestas mínimas válidas para que el pipeline continúe
+        return {"reformulation": question, "flow": ""}.get(kind, "```sql\nSELECT 1\n```")
+
+
+class StandInServer:
+    """
+    Servidor HTTP local con los endpoints de los modelos y de embeddings.
+
+    Rutas:
+        POST /<modelo>/v1/chat/completions  (formato chat, con `stream`)
+        POST /<modelo>/v1/completions       (formato prompt → {"sql": ...})
+        POST /v1/embeddings
+
+    Args:
+        responder (ReplayResponder): Genera el texto de cada respuesta. Puede asignarse después
+            de crear el servidor (la configuración del agente necesita la URL antes de leerse).
+        latency (dict): Latencias en ms por servicio (ver `DEFAULT_LATENCY`).
+        host (str) / port (int): Dirección de escucha (puerto 0 = libre).
+    """
+
+    def __init__(self, responder: ReplayResponder = None, latency: dict = None, host: str = "127.0.0.1", port: int = 0):
+        self.responder = responder
+        self.latency = {**DEFAULT_LATENCY, **(latency or {})}
+        self._lock = threading.Lock()
+        self.stats = {"chat": 0, "completions": 0, "embeddings": 0, "embedded_texts": 0, "disconnects": 0}
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def endpoints(self) -> dict:
+        """Sobrescrituras de configuración (`AGENT__...`) que apuntan el agente a este servidor."""
+        return {
+            "AGENT__MODEL_ENDPOINTS__GEMMA": f"{self.url}/gemma/v1/chat/completions",
+            "AGENT__MODEL_ENDPOINTS__MISTRAL": f"{self.url}/mistral/v1/completions",
+            "AGENT__EMBEDDING_ENDPOINT": f"{self.url}/v1/embeddings"
+        }
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _handler(self):
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Encabezados y cuerpo van en escrituras separadas: sin esto Nagle + ACK diferido
+            # agregan ~40 ms por respuesta que se contarían como sobrecarga del agente
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def handle(self):
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    # El agente canceló la petición (p. ej. la rama descartada del modo especulativo)
+                    stand_in._count("disconnects")
+
+            def _send_json(self, data: dict):
+                body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _stream(self, text: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                for token in re.findall(r"\S+\s*", text) or [text]:
+                    _sleep_ms(stand_in.latency["token"], stand_in.latency["jitter"])
+                    chunk = {"choices": [{"delta": {"content": token}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                latency = stand_in.latency
+
+                if self.path.endswith("/embeddings"):
+                    texts = payload.get("input", [])
+                    stand_in._count("embeddings")
+                    stand_in._count("embedded_texts", len(texts))
+                    _sleep_ms(latency["embedding"], latency["jitter"])
+                    self._send_json({"data": [
+                        {"index": i, "embedding": hashed_embedding(text)} for i, text in enumerate(texts)
+                    ]})
+                    return
+
+                model = self.path.strip("/").split("/")[0]
+                if "messages" in payload:
+                    stand_in._count("chat")
+                    text = stand_in.responder.respond(payload["messages"][-1]["content"])
+                    if payload.get("stream"):
+                        # El tiempo hasta el primer token es la latencia del modelo
+                        _sleep_ms(latency.get(model, 0), latency["jitter"])
+                        self._stream(text)
+                        return
+                    _sleep_ms(latency.get(model, 0), latency["jitter"])
+                    self._send_json({"choices": [{"message": {"role": "assistant", "content": text}}]})
+                else:
+                    stand_in._count("completions")
+                    text = stand_in.responder.respond(payload.get("prompt", ""))
+                    _sleep_ms(latency.get(model, 0), latency["jitter"])
+                    self._send_json({"sql": text})
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stand-in-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class _Hit:
+    def __init__(self, row_id: int, distance: float, entity: dict):
+        self.id = row_id
+        self.distance = distance
+        self._entity = entity
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "distance": self.distance, "entity": self._entity}
+
+
+class InMemoryCollection:
+    """
+    Colección en memoria compatible con lo que usan `search_collection` y `save_collection_bulk`:
+    `search`, `insert` (columnas pregunta, contenido, embedding), `flush` y `load`.
+
+    Args:
+        name (str): Nombre de la colección.
+        content_field (str): Campo de contenido ("sql", "ddl" o "texto").
+        latency_ms (float) / jitter (float): Latencia agregada a cada búsqueda.
+    """
+
+    def __init__(self, name: str, content_field: str, latency_ms: float = 0, jitter: float = 0.0):
+        self.name = name
+        self.content_field = content_field
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self._rows = []
+        self._lock = threading.Lock()
+
+    @property
+    def num_entities(self) -> int:
+        return len(self._rows)
+
+    def load(self):
+        pass
+
+    def flush(self):
+        pass
+
+    def insert(self, fields: list):
+        questions, contents, embeddings = fields
+        with self._lock:
+            start = len(self._rows)
+            for question, content, embedding in zip(questions, contents, embeddings):
+                self._rows.append((len(self._rows) + 1, embedding, {"question": question, self.content_field: content}))
+            return SimpleNamespace(insert_count=len(self._rows) - start)
+
+    def search(self, data: list, anns_field: str, param: dict, limit: int, output_fields: list = None, **kwargs):
+        _sleep_ms(self.latency_ms, self.jitter)
+        with self._lock:
+            rows = list(self._rows)
+        results = []
+        for query in data:
+            scored = sorted(
+                ((sum(a * b for a, b in zip(query, embedding)), row_id, entity) for row_id, embedding, entity in rows),
+                key=lambda item: item[0],
+                reverse=True
+            )[:limit]
+            results.append([
+                _Hit(row_id, score, {field: entity.get(field) for field in (output_fields or entity)})
+                for score, row_id, entity in scored
+            ])
+        return results
+
+
+class ReplayCursor:
+    """Cursor tipo psycopg2 sobre `ReplayDatabase` (acepta `name` de cursor server-side)."""
+
+    def __init__(self, database, sqlite_connection):
+        self._database = database
+        self._sqlite = sqlite_connection
+        self._rows, self._position = [], 0
+        self.description = None
+        self.rowcount = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _set(self, columns: list, rows: list):
+        self.description = [(column,) for column in columns]
+        self._rows, self._position = [tuple(row) for row in rows], 0
+        self.rowcount = len(rows)
+
+    @staticmethod
+    def _literal(value) -> str:
+        if value is None:
+            return "NULL"
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        if isinstance(value, (int, float)):
+            return str(value)
+        return "'" + str(value).replace("'", "''") + "'"
+
+    def execute(self, sql: str, params=None):
+        # Como psycopg2: con parámetros, todo `%` del texto es un marcador (un `%` literal debe ir
+        # como `%%`) y los valores se interpolan del lado del cliente; sin parámetros no se toca
+        if params is not None:
+            sql = sql % tuple(self._literal(value) for value in params)
+        statement = sql.strip()
+        upper = statement.upper()
+        if upper.startswith("SET "):
+            return
+        if upper == "SELECT 1":
+            self._set(["?column?"], [[1]])
+            return
+        if upper.startswith("EXPLAIN"):
+            # Plan mínimo: el guardia de costo siempre lo considera dentro de los límites
+            self._set(["QUERY PLAN"], [[[{"Plan": {"Total Cost": 1.0, "Plan Rows": 1}}]]])
+            return
+
+        self._database.wait()
+        recorded = self._database.lookup(statement)
+        if recorded is not None:
+            if "error" in recorded:
+                self._database.count("replayed_errors")
+                raise RuntimeError(recorded["error"])
+            self._database.count("replayed")
+            self._set(recorded.get("columns", []), recorded.get("rows", []))
+            return
+
+        # SQL desconocido (p. ej. envoltura LIMIT/OFFSET de paginación): se intenta en SQLite
+        try:
+            cursor = self._sqlite.execute(statement)
+            self._set([d[0] for d in cursor.description or []], cursor.fetchall())
+            self._database.count("sqlite")
+        except sqlite3.Error:
+            self._database.count("unknown")
+            raise
+
+    def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+        self._position += 1
+        return self._rows[self._position - 1]
+
+    def fetchmany(self, size: int = 1):
+        rows = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+        return rows
+
+    def close(self):
+        pass
+
+
+class ReplayConnection:
+    def __init__(self, database):
+        self._database = database
+        self._sqlite = sqlite3.connect(database.sqlite_path, check_same_thread=False)
+        self.closed = 0
+
+    def cursor(self, name: str = None):
+        return ReplayCursor(self._database, self._sqlite)
+
+    def commit(self):
+        self._sqlite.commit()
+
+    def rollback(self):
+        self._sqlite.rollback()
+
+    def close(self):
+        self._sqlite.close()
+        self.closed = 1
+
+
+class ReplayDatabase:
+    """
+    Base de datos sustituta: cada SQL registrado devuelve su resultado (o su error) y
+    los demás se ejecutan en SQLite (`sqlite_path`, en memoria por defecto).
+
+    Args:
+        cases (list): Casos de `load_cases`.
+        latency_ms (float) / jitter (float): Latencia por consulta ejecutada.
+        sqlite_path (str): Base SQLite para SQL no registrado.
+    """
+
+    def __init__(self, cases: list, latency_ms: float = 0, jitter: float = 0.0, sqlite_path: str = ":memory:"):
+        from core.query_validator import validate_sql_query
+
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.sqlite_path = sqlite_path
+        self._lock = threading.Lock()
+        self.stats = {"connections": 0, "replayed": 0, "replayed_errors": 0, "sqlite": 0, "unknown": 0}
+        self._results = {}
+        for case in cases:
+            sql, result = case.get("generated_sql"), case.get("result")
+            if not sql or not isinstance(result, dict):
+                continue
+            # Se registra tal cual y como lo deja el validador (es lo que llega a ejecutarse)
+            self._results[normalize_sql(sql)] = result
+            try:
+                is_valid, validated, _ = validate_sql_query(sql)
+                if is_valid:
+                    self._results.setdefault(normalize_sql(validated), result)
+            except Exception:
+                pass
+
+    def connect(self, **kwargs) -> ReplayConnection:
+        self.count("connections")
+        return ReplayConnection(self)
+
+    def lookup(self, sql: str):
+        return self._results.get(normalize_sql(sql))
+
+    def wait(self):
+        _sleep_ms(self.latency_ms, self.jitter)
+
+    def count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+
+def split_index(cases: list, policy: str = "holdout") -> list:
+    """
+    Casos exitosos que se cargan en la colección de preguntas.
+    "holdout" indexa la mitad (por hash del request_id) para mezclar aciertos semánticos
+    y generación completa como en producción; "all" indexa todos y "none" ninguno.
+    """
+    success = [case for case in cases if case.get("status") == "success" and case.get("generated_sql")]
+    if policy == "none":
+        return []
+    if policy == "all":
+        return success
+    return [case for case in success if int(hashlib.md5(case["request_id"].encode()).hexdigest(), 16) % 2 == 0]
+
+
+def benchmark_env(server: StandInServer, workdir: str) -> dict:
+    """
+    Sobrescrituras de configuración (`AGENT__...`) para un proceso de benchmark: modelos y
+    embeddings apuntan a `server`, los cachés se desactivan para que cada pregunta recorra
+    el pipeline completo y los logs, eventos y trazas se escriben en `workdir`.
+    Deben aplicarse a `os.environ` antes de importar el agente (la configuración se lee una vez).
+    """
+    workdir = str(Path(workdir).resolve())
+    return {
+        **server.endpoints(),
+        "AGENT__EXECUTION_MODE": "real",
+        "AGENT__LOG_FOLDER": workdir,
+        "AGENT__OUTPUT_FOLDER": workdir,
+        "AGENT__EMBEDDING_CACHE__ENABLED": "false",
+        "AGENT__RESPONSE_CACHE__ENABLED": "false",
+        "AGENT__RESULT_CACHE__ENABLED": "false",
+        "AGENT__API_LOG_FILE": os.path.join(workdir, "api_log.txt"),
+        "AGENT__LOG_FILE": os.path.join(workdir, "execution_log.txt"),
+        "AGENT__JSONL_OUTPUT": os.path.join(workdir, "log_respuestas.jsonl"),
+        "AGENT__EVENT_STORE__PATH": os.path.join(workdir, "events.sqlite3"),
+        "AGENT__TRACING__PATH": os.path.join(workdir, "spans.jsonl"),
+        "AGENT__VECTOR_WRITE_BUFFER__DEAD_LETTER_PATH": os.path.join(workdir, "dead_letter.jsonl")
+    }
+
+
+def install_stand_ins(cases: list, latency: dict = None, index_policy: str = "holdout") -> dict:
+    """
+    Sustituye Milvus y el DWH dentro del proceso actual (los endpoints HTTP se redirigen
+    con `benchmark_env`).
+
+    Returns:
+        dict: Objetos instalados ("collections", "database") y número de casos indexados.
+    """
+    from shared.utils import load_config
+    from core.milvus_registry import milvus_registry
+    from core.db_pool import set_connection_factory
+
+    latency = {**DEFAULT_LATENCY, **(latency or {})}
+    collection_names = load_config()["milvus_endpoint"]["collections"]
+    content_fields = {"questions": "sql", "ddl": "ddl", "docs": "texto"}
+
+    collections = {}
+    for key, name in collection_names.items():
+        collections[key] = InMemoryCollection(name, content_fields.get(key, "texto"), latency["milvus"], latency["jitter"])
+        milvus_registry.register_collection(name, collections[key])
+
+    indexed = split_index(cases, index_policy)
+    if indexed:
+        collections["questions"].insert([
+            [case["original_question"] for case in indexed],
+            [case["generated_sql"] for case in indexed],
+            [hashed_embedding(case["original_question"]) for case in indexed]
+        ])
+
+    database = ReplayDatabase(cases, latency["db"], latency["jitter"])
+    set_connection_factory(database.connect)
+    return {"collections": collections, "database": database, "indexed": len(indexed)}
@@ -0,0 +1,58 @@
+# backend/core/concurrency.py
+
+import sys
+import os
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.utils import load_config
+
+CONFIG_JSON = load_config()
+CONCURRENCY = CONFIG_JSON.get("concurrency", {})
+
+# Pools acotados para las librerías bloqueantes (pymilvus, psycopg2).
+# Cada recurso tiene su propio pool para que uno lento no acapare los hilos del otro.
+_EXECUTORS = {
+    "milvus": ThreadPoolExecutor(
+        max_workers=CONCURRENCY.get("milvus_workers", 16),
+        thread_name_prefix="milvus"
+    ),
+    "db": ThreadPoolExecutor(
+        max_workers=CONCURRENCY.get("db_workers", 16),
+        thread_name_prefix="db"
+    ),
+    # Lecturas del caché de embeddings en SQLite (se serializan con un lock; pocos hilos bastan)
+    "embedding_cache": ThreadPoolExecutor(
+        max_workers=CONCURRENCY.get("embedding_cache_workers", 2),
+        thread_name_prefix="embedding_cache"
+    ),
+}
+
+
+async def run_blocking(pool: str, func, *args, **kwargs):
+    """
+    Ejecuta una función bloqueante en el pool indicado sin bloquear el event loop.
+
+    Args:
+        pool (str): Nombre del pool ("milvus", "db" o "embedding_cache").
+        func (callable): Función bloqueante a ejecutar.
+
+    Returns:
+        Any: Resultado de la función.
+    """
+    loop = asyncio.get_running_loop()
+    # Se copia el contexto para que el hilo vea las variables de la petición (traza activa, dominio)
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_EXECUTORS[pool], functools.partial(context.run, func, *args, **kwargs))
+
+
+def submit_blocking(pool: str, func, *args, **kwargs):
+    """Encola una función bloqueante en el pool indicado sin esperar su resultado."""
+    return _EXECUTORS[pool].submit(func, *args, **kwargs)
+
+
+def shutdown_executors(wait: bool = True):
+    for executor in _EXECUTORS.values():
+        executor.shutdown(wait=wait)
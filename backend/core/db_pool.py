@@ -0,0 +1,270 @@
+# backend/core/db_pool.py
+
+import sys
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager, asynccontextmanager
+import psycopg2
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.utils import load_config
+from core.config import DB_CONNECTIONS
+from core.concurrency import run_blocking
+from core.tracing import span
+from core.exceptions import DatabasePoolError
+
+logger = logging.getLogger("db_pool")
+
+CONFIG_JSON = load_config()
+DB_POOL = CONFIG_JSON.get("db_pool", {})
+DOMAIN_TO_DB = CONFIG_JSON["domain_to_db"]
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones psycopg2 para una base de datos.
+
+    Mantiene entre `min_size` y `max_size` conexiones, descarta las que llevan más de
+    `idle_timeout_s` sin uso y verifica cada conexión al prestarla.
+
+    Args:
+        name (str): Nombre de la base de datos (llave de `DB_CONNECTIONS`).
+        conn_kwargs (dict): Parámetros para `psycopg2.connect`.
+        min_size (int): Conexiones inactivas que se conservan aunque expiren.
+        max_size (int): Máximo de conexiones abiertas a la vez.
+        idle_timeout_s (float): Tiempo sin uso tras el cual se cierra una conexión.
+        checkout_timeout_s (float): Espera máxima por una conexión libre.
+        ping_on_checkout (bool): Ejecuta `SELECT 1` antes de prestar una conexión reutilizada.
+        connect (callable): Fábrica de conexiones (por defecto `psycopg2.connect`).
+    """
+
+    def __init__(self, name: str, conn_kwargs: dict, min_size: int = 1, max_size: int = 10,
+                 idle_timeout_s: float = 300, checkout_timeout_s: float = 30,
+                 ping_on_checkout: bool = True, connect=psycopg2.connect):
+        self.name = name
+        self.conn_kwargs = conn_kwargs
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout_s = idle_timeout_s
+        self.checkout_timeout_s = checkout_timeout_s
+        self.ping_on_checkout = ping_on_checkout
+        self._connect = connect
+        self._idle = []
+        self._size = 0
+        self._condition = threading.Condition()
+        self._stats = {"created": 0, "reused": 0, "discarded": 0, "waits": 0, "timeouts": 0}
+
+    def _is_healthy(self, connection) -> bool:
+        if connection.closed:
+            return False
+        if not self.ping_on_checkout:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._condition:
+            self._size -= 1
+            self._stats["discarded"] += 1
+            self._condition.notify()
+
+    def _prune_idle(self, now: float) -> list:
+        # Se llama con el lock tomado; devuelve las conexiones a cerrar fuera del lock
+        expired = []
+        while len(self._idle) > self.min_size and now - self._idle[0][1] > self.idle_timeout_s:
+            expired.append(self._idle.pop(0)[0])
+        return expired
+
+    def acquire(self):
+        """
+        Presta una conexión sana, creando una nueva si hay capacidad.
+
+        Returns:
+            connection: Conexión psycopg2 lista para usarse.
+
+        Raises:
+            DatabasePoolError: Si no hay conexión libre dentro de `checkout_timeout_s`.
+        """
+        deadline = time.time() + self.checkout_timeout_s
+        while True:
+            with self._condition:
+                for connection in self._prune_idle(time.time()):
+                    self._size -= 1
+                    self._stats["discarded"] += 1
+                    connection.close()
+
+                if self._idle:
+                    connection, _ = self._idle.pop()
+                    reused = True
+                elif self._size < self.max_size:
+                    self._size += 1
+                    connection, reused = None, False
+                else:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise DatabasePoolError(f"No hay conexiones libres para '{self.name}' tras {self.checkout_timeout_s} seg.")
+                    self._stats["waits"] += 1
+                    self._condition.wait(timeout=remaining)
+                    continue
+
+            if reused:
+                if self._is_healthy(connection):
+                    with self._condition:
+                        self._stats["reused"] += 1
+                    return connection
+                logger.warning(f"⚠️ Conexión inválida en el pool '{self.name}', se descarta.")
+                self._discard(connection)
+                continue
+
+            try:
+                connection = self._connect(**self.conn_kwargs)
+            except Exception:
+                with self._condition:
+                    self._size -= 1
+                    self._condition.notify()
+                raise
+            with self._condition:
+                self._stats["created"] += 1
+            return connection
+
+    def release(self, connection, discard: bool = False):
+        """Devuelve la conexión al pool (o la cierra si está rota o se pide descartarla)."""
+        if discard or connection.closed:
+            self._discard(connection)
+            return
+        try:
+            # No dejar transacciones abiertas ni abortadas en conexiones reutilizables
+            connection.rollback()
+        except Exception:
+            self._discard(connection)
+            return
+        with self._condition:
+            self._idle.append((connection, time.time()))
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Presta una conexión y la devuelve al salir por cualquier camino, incluidos
+        `GeneratorExit` (generador cerrado) y cancelaciones, que no son `Exception`.
+        """
+        with span("db.checkout", pool=self.name):
+            connection = self.acquire()
+        discard = False
+        try:
+            yield connection
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        finally:
+            self.release(connection, discard=discard)
+
+    @asynccontextmanager
+    async def connection_async(self):
+        """
+        Variante para el pipeline asíncrono: la espera por una conexión libre ocurre en
+        el pool de hilos "db", sin bloquear el event loop.
+        """
+        connection = await run_blocking("db", self.acquire)
+        discard = False
+        try:
+            yield connection
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        except BaseException:
+            # Cancelación o cierre del generador: ya no se puede esperar, se devuelve aquí mismo
+            self.release(connection)
+            connection = None
+            raise
+        finally:
+            if connection is not None:
+                await run_blocking("db", self.release, connection, discard)
+
+    def close(self):
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for connection, _ in idle:
+            connection.close()
+
+    def stats(self) -> dict:
+        with self._condition:
+            stats = dict(self._stats)
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._size - len(self._idle)
+            stats["max_size"] = self.max_size
+        return stats
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_connect = psycopg2.connect
+
+
+def set_connection_factory(connect):
+    """
+    Reemplaza la fábrica de conexiones de los pools (por defecto `psycopg2.connect`).
+    Los pools existentes se cierran para que las siguientes conexiones usen la nueva fábrica.
+    """
+    global _connect
+    close_pools()
+    with _pools_lock:
+        _pools.clear()
+        _connect = connect
+
+
+def get_pool(db_name: str) -> ConnectionPool:
+    """
+    Pool de la base de datos `db_name`, creado la primera vez que se solicita.
+    Los parámetros salen de `db_pool` con sobrescrituras opcionales en `db_pool.databases`.
+    """
+    with _pools_lock:
+        pool = _pools.get(db_name)
+        if pool is None:
+            db_conf = DB_CONNECTIONS.get(db_name)
+            if not db_conf:
+                raise ValueError(f"No hay configuración de base de datos para '{db_name}'")
+            settings = {**DB_POOL, **DB_POOL.get("databases", {}).get(db_name, {})}
+            pool = ConnectionPool(
+                db_name,
+                db_conf,
+                min_size=settings.get("min_size", 1),
+                max_size=settings.get("max_size", 10),
+                idle_timeout_s=settings.get("idle_timeout_s", 300),
+                checkout_timeout_s=settings.get("checkout_timeout_s", 30),
+                ping_on_checkout=settings.get("ping_on_checkout", True),
+                connect=_connect
+            )
+            _pools[db_name] = pool
+        return pool
+
+
+def get_pool_for_domain(domain: str) -> ConnectionPool:
+    db_name = DOMAIN_TO_DB.get(domain)
+    if not db_name:
+        raise ValueError(f"No hay configuración de base de datos para el dominio '{domain}'")
+    return get_pool(db_name)
+
+
+def get_db_pool_stats() -> dict:
+    with _pools_lock:
+        return {name: pool.stats() for name, pool in _pools.items()}
+
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
@@ -0,0 +1,90 @@
+# backend/core/embedding_batcher.py
+
+import asyncio
+import threading
+import weakref
+
+
+class EmbeddingBatcher:
+    """
+    Agrupa las peticiones de embeddings que llegan dentro de una ventana corta y
+    las envía como una sola petición multi-input, repartiendo los vectores a cada llamador.
+
+    Args:
+        send_batch (callable): Corrutina que recibe una lista de textos y devuelve sus vectores en orden.
+        max_batch_size (int): Máximo de textos por petición.
+        max_wait_ms (float): Tiempo máximo que espera una petición antes de enviarse el lote.
+    """
+
+    def __init__(self, send_batch, max_batch_size: int = 32, max_wait_ms: float = 5):
+        self._send_batch = send_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        # Estado por event loop: los futures no pueden cruzar loops
+        self._states = weakref.WeakKeyDictionary()
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "batches": 0, "texts_sent": 0}
+
+    def _state(self, loop) -> dict:
+        state = self._states.get(loop)
+        if state is None:
+            state = {"pending": [], "timer": None, "tasks": set()}
+            self._states[loop] = state
+        return state
+
+    async def embed(self, text: str) -> list:
+        loop = asyncio.get_running_loop()
+        state = self._state(loop)
+        future = loop.create_future()
+        state["pending"].append((text, future))
+
+        with self._stats_lock:
+            self._stats["requests"] += 1
+
+        if len(state["pending"]) >= self.max_batch_size:
+            self._flush(loop)
+        elif state["timer"] is None:
+            state["timer"] = loop.call_later(self.max_wait, self._flush, loop)
+
+        return await future
+
+    def _flush(self, loop):
+        state = self._state(loop)
+        if state["timer"] is not None:
+            state["timer"].cancel()
+            state["timer"] = None
+
+        batch, state["pending"] = state["pending"], []
+        if batch:
+            task = loop.create_task(self._dispatch(batch))
+            state["tasks"].add(task)
+            task.add_done_callback(state["tasks"].discard)
+
+    async def _dispatch(self, batch: list):
+        # Textos repetidos dentro del mismo lote se envían una sola vez
+        texts = list(dict.fromkeys(text for text, _ in batch))
+
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["texts_sent"] += len(texts)
+
+        try:
+            vectors = await self._send_batch(texts)
+            if len(vectors) != len(texts):
+                raise ValueError(f"Se esperaban {len(texts)} embeddings y se recibieron {len(vectors)}.")
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_text = dict(zip(texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["avg_batch_size"] = round(stats["texts_sent"] / stats["batches"], 2) if stats["batches"] else 0.0
+        return stats
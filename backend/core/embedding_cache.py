@@ -0,0 +1,273 @@
+# backend/core/embedding_cache.py
+
+import sys
+import os
+import re
+import queue
+import hashlib
+import logging
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.utils import load_config
+from core.concurrency import run_blocking
+
+logger = logging.getLogger("embedding_cache")
+
+CONFIG_JSON = load_config()
+CACHE_CONFIG = CONFIG_JSON.get("embedding_cache", {})
+ROOT_PATH = Path(__file__).resolve().parent.parent.parent
+
+_STOP = object()
+
+
+def normalize_text(text: str) -> str:
+    """Normaliza el texto para la llave del caché (Unicode NFC y espacios colapsados)."""
+    text = unicodedata.normalize("NFC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class EmbeddingCache:
+    """
+    Caché de embeddings en dos niveles: LRU en memoria acotado por bytes y
+    almacén persistente en SQLite que sobrevive reinicios.
+
+    La llave es (modelo, input_type, texto normalizado).
+
+    Desde el event loop se usan `get_async`/`get_many_async`: la memoria se consulta en
+    línea y el disco en el pool de hilos "embedding_cache". `put` solo toca la memoria;
+    un hilo en segundo plano agrupa las escrituras a disco en una sola transacción.
+    """
+
+    def __init__(self, max_memory_bytes: int, disk_path: str = None, enabled: bool = True,
+                 write_batch_size: int = 200, flush_interval_s: float = 0.5):
+        self.enabled = enabled
+        self.max_memory_bytes = max_memory_bytes
+        self.disk_path = disk_path
+        self.write_batch_size = write_batch_size
+        self.flush_interval_s = flush_interval_s
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_writes": 0, "disk_errors": 0}
+
+    @staticmethod
+    def _key(model: str, input_type: str, text: str) -> tuple:
+        digest = hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+        return model, input_type, digest
+
+    def _connect(self):
+        if self._db is None and self.disk_path:
+            Path(self.disk_path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.disk_path, check_same_thread=False, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            # Con WAL, NORMAL no arriesga la integridad y evita un fsync por transacción
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                """CREATE TABLE IF NOT EXISTS embeddings (
+                    model TEXT NOT NULL,
+                    input_type TEXT NOT NULL,
+                    text_hash TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (model, input_type, text_hash)
+                )"""
+            )
+            db.commit()
+            self._db = db
+        return self._db
+
+    def _remember(self, key: tuple, blob: bytes):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = blob
+            self._memory_bytes += len(blob)
+            while self._memory_bytes > self.max_memory_bytes and self._memory:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+                self._stats["evictions"] += 1
+
+    def _from_memory(self, key: tuple):
+        with self._lock:
+            blob = self._memory.get(key)
+            if blob is None:
+                return None
+            self._memory.move_to_end(key)
+            self._stats["memory_hits"] += 1
+            return array("f", blob).tolist()
+
+    def _from_disk(self, keys: list) -> dict:
+        """Busca en SQLite (bloqueante); devuelve {llave: vector} de las encontradas."""
+        found = {}
+        try:
+            with self._db_lock:
+                db = self._connect()
+                if db is not None:
+                    for key in keys:
+                        row = db.execute(
+                            "SELECT vector FROM embeddings WHERE model = ? AND input_type = ? AND text_hash = ?",
+                            key
+                        ).fetchone()
+                        if row is not None:
+                            found[key] = row[0]
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ No se pudo leer el caché de embeddings en disco: {e}")
+
+        for key, blob in found.items():
+            self._remember(key, blob)
+        with self._lock:
+            self._stats["disk_hits"] += len(found)
+            self._stats["misses"] += len(keys) - len(found)
+        return {key: array("f", blob).tolist() for key, blob in found.items()}
+
+    def get(self, model: str, input_type: str, text: str):
+        """
+        Busca un embedding primero en memoria y luego en disco (bloqueante; desde el
+        event loop usar `get_async`).
+
+        Returns:
+            list | None: Vector almacenado o None si no existe.
+        """
+        if not self.enabled:
+            return None
+        key = self._key(model, input_type, text)
+        vector = self._from_memory(key)
+        if vector is not None:
+            return vector
+        return self._from_disk([key]).get(key)
+
+    async def get_async(self, model: str, input_type: str, text: str):
+        """Como `get`, pero la lectura en disco ocurre fuera del event loop."""
+        return (await self.get_many_async(model, input_type, [text]))[0]
+
+    async def get_many_async(self, model: str, input_type: str, texts: list) -> list:
+        """
+        Busca varios textos; los que no están en memoria se consultan en disco en un solo
+        viaje al pool de hilos.
+
+        Returns:
+            list: Vector o None por cada texto, en el mismo orden.
+        """
+        if not self.enabled:
+            return [None] * len(texts)
+        keys = [self._key(model, input_type, text) for text in texts]
+        vectors = [self._from_memory(key) for key in keys]
+        missing = list(dict.fromkeys(key for key, vector in zip(keys, vectors) if vector is None))
+        if not missing:
+            return vectors
+        if not self.disk_path:
+            with self._lock:
+                self._stats["misses"] += len(missing)
+            return vectors
+        found = await run_blocking("embedding_cache", self._from_disk, missing)
+        return [vector if vector is not None else found.get(key) for key, vector in zip(keys, vectors)]
+
+    def put(self, model: str, input_type: str, text: str, vector: list):
+        """Guarda en memoria de inmediato y encola la escritura a disco."""
+        if not self.enabled:
+            return
+
+        key = self._key(model, input_type, text)
+        blob = array("f", vector).tobytes()
+        self._remember(key, blob)
+        if self.disk_path:
+            self._ensure_thread()
+            self._queue.put((*key, blob))
+
+    def _ensure_thread(self):
+        if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+                    self._pid = os.getpid()
+                    self._queue = queue.Queue()
+                    self._thread = threading.Thread(target=self._run, name="embedding-cache-writer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval_s)
+            except queue.Empty:
+                continue
+            rows, waiters, stop = [], [], False
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    rows.append(item)
+                if stop or len(rows) >= self.write_batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if rows:
+                self._write(rows)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+    def _write(self, rows: list):
+        try:
+            with self._db_lock:
+                db = self._connect()
+                db.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+                db.commit()
+            with self._lock:
+                self._stats["disk_writes"] += len(rows)
+        except sqlite3.Error as e:
+            with self._lock:
+                self._stats["disk_errors"] += 1
+            logger.warning(f"⚠️ No se pudieron persistir {len(rows)} embeddings en disco: {e}")
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Espera a que las escrituras encoladas lleguen a disco."""
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Escribe lo pendiente y detiene el hilo (usar al apagar la app)."""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_bytes
+            stats["pending_writes"] = self._queue.qsize() if self._queue is not None else 0
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
+
+
+def _disk_path() -> str:
+    path = CACHE_CONFIG.get("disk_path")
+    if not path:
+        return None
+    return str(path if os.path.isabs(path) else ROOT_PATH / path)
+
+
+embedding_cache = EmbeddingCache(
+    max_memory_bytes=int(CACHE_CONFIG.get("max_memory_mb", 64) * 1024 * 1024),
+    disk_path=_disk_path(),
+    enabled=CACHE_CONFIG.get("enabled", True)
+)
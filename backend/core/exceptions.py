@@ -1,39 +1,51 @@
-# backend/core/exceptions.py
-
-# backend/core/exceptions.py
-
-class EmbeddingServiceError(Exception):
-    """Error al obtener embeddings desde el microservicio."""
-    pass
-
-class MilvusConnectionError(Exception):
-    """Error al conectar o consultar en Milvus."""
-    pass
-
-class InvalidCollectionTypeError(Exception):
-    """El tipo de colección recibido no está soportado."""
-    pass
-
-class SQLValidationError(Exception):
-    """Error de validación en la consulta SQL."""
-    pass
-
-class SQLExecutionError(Exception):
-    """Fallo durante la ejecución de SQL."""
-    pass
-
-class SQLAgentPipelineError(Exception):
-    """Fallo en alguna etapa del flujo del agente SQL."""
-    pass
-
-class ReformulationError(Exception):
-    """Fallo al reformular la pregunta del usuario."""
-    pass
-
-class RagContextError(Exception):
-    """Fallo al recuperar el contexto con RAG."""
-    pass
-
-class FlowGenerationError(Exception):
-    """Fallo al generar flujo técnico"""
+# backend/core/exceptions.py
+
+# backend/core/exceptions.py
+
+class EmbeddingServiceError(Exception):
+    """Error al obtener embeddings desde el microservicio."""
+    pass
+
+class MilvusConnectionError(Exception):
+    """Error al conectar o consultar en Milvus."""
+    pass
+
+class InvalidCollectionTypeError(Exception):
+    """El tipo de colección recibido no está soportado."""
+    pass
+
+class InvalidTrainingDataError(Exception):
+    """La fila de entrenamiento no cumple el esquema de la colección."""
+    pass
+
+class SQLValidationError(Exception):
+    """Error de validación en la consulta SQL."""
+    pass
+
+class SQLExecutionError(Exception):
+    """Fallo durante la ejecución de SQL."""
+    pass
+
+class InvalidPageTokenError(Exception):
+    """El token de página no es válido para la consulta solicitada."""
+    pass
+
+class DatabasePoolError(Exception):
+    """No se obtuvo una conexión del pool de base de datos."""
+    pass
+
+class SQLAgentPipelineError(Exception):
+    """Fallo en alguna etapa del flujo del agente SQL."""
+    pass
+
+class ReformulationError(Exception):
+    """Fallo al reformular la pregunta del usuario."""
+    pass
+
+class RagContextError(Exception):
+    """Fallo al recuperar el contexto con RAG."""
+    pass
+
+class FlowGenerationError(Exception):
+    """Fallo al generar flujo técnico"""
     pass
\ No newline at end of file
@@ -0,0 +1,199 @@
+# backend/core/http_client.py
+
+import sys
+import os
+import asyncio
+import logging
+import threading
+import weakref
+from urllib.parse import urlsplit
+import httpx
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.utils import load_config
+
+logger = logging.getLogger("http_client")
+
+CONFIG_JSON = load_config()
+HTTP_CONFIG = CONFIG_JSON.get("http_client", {})
+TIMEOUTS = HTTP_CONFIG.get("timeouts", {})
+HTTP2_ENABLED = HTTP_CONFIG.get("http2", False)
+
+if HTTP2_ENABLED:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("⚠️ HTTP/2 habilitado pero falta el paquete 'h2'; se usará HTTP/1.1.")
+        HTTP2_ENABLED = False
+
+
+class PoolStats:
+    """Contadores de reutilización de conexiones de un endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, new_connection: bool):
+        with self._lock:
+            self.requests += 1
+            if new_connection:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / self.requests, 4) if self.requests else 0.0
+            }
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+_sync_clients = {}
+_sync_lock = threading.Lock()
+# httpx.AsyncClient no puede compartirse entre event loops: un juego de clientes por loop
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def _origin(url: str) -> str:
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def _get_stats(origin: str) -> PoolStats:
+    with _stats_lock:
+        if origin not in _stats:
+            _stats[origin] = PoolStats()
+        return _stats[origin]
+
+
+def _is_new_connection(event_name: str) -> bool:
+    # httpcore emite "connection.connect_tcp.started" (o connect_unix_socket) al abrir un socket
+    return event_name.startswith("connection.connect_") and event_name.endswith(".started")
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=HTTP_CONFIG.get("max_connections", 100),
+        max_keepalive_connections=HTTP_CONFIG.get("max_keepalive_connections", 20),
+        keepalive_expiry=HTTP_CONFIG.get("keepalive_expiry", 30)
+    )
+
+
+def get_timeout(name: str) -> httpx.Timeout:
+    """
+    Timeout configurado para un endpoint lógico (ej. "gemma", "mistral", "embedding").
+
+    Args:
+        name (str): Nombre del endpoint en `http_client.timeouts`.
+
+    Returns:
+        httpx.Timeout: Timeout de lectura del endpoint con timeout de conexión común.
+    """
+    seconds = TIMEOUTS.get(name, TIMEOUTS.get("default", 60))
+    return httpx.Timeout(seconds, connect=HTTP_CONFIG.get("connect_timeout", 10))
+
+
+class _CountingTransport(httpx.HTTPTransport):
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self._stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        state = {"new": False}
+
+        def trace(event_name, info):
+            if _is_new_connection(event_name):
+                state["new"] = True
+
+        request.extensions = {**request.extensions, "trace": trace}
+        try:
+            return super().handle_request(request)
+        finally:
+            self._stats.record(state["new"])
+
+
+class _AsyncCountingTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self._stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        state = {"new": False}
+
+        async def trace(event_name, info):
+            if _is_new_connection(event_name):
+                state["new"] = True
+
+        request.extensions = {**request.extensions, "trace": trace}
+        try:
+            return await super().handle_async_request(request)
+        finally:
+            self._stats.record(state["new"])
+
+
+def get_client(url: str) -> httpx.Client:
+    """
+    Devuelve el cliente síncrono con pool keep-alive del endpoint de `url`.
+
+    Args:
+        url (str): URL a invocar; el pool se comparte por esquema + host + puerto.
+
+    Returns:
+        httpx.Client: Cliente reutilizable entre peticiones e hilos.
+    """
+    origin = _origin(url)
+    with _sync_lock:
+        client = _sync_clients.get(origin)
+        if client is None or client.is_closed:
+            transport = _CountingTransport(_get_stats(origin), limits=_limits(), http2=HTTP2_ENABLED)
+            client = httpx.Client(transport=transport, timeout=get_timeout("default"))
+            _sync_clients[origin] = client
+        return client
+
+
+def get_async_client(url: str) -> httpx.AsyncClient:
+    """
+    Devuelve el cliente asíncrono con pool keep-alive del endpoint de `url` para el loop actual.
+
+    Args:
+        url (str): URL a invocar; el pool se comparte por esquema + host + puerto.
+
+    Returns:
+        httpx.AsyncClient: Cliente reutilizable para llamadas a modelos y embeddings.
+    """
+    origin = _origin(url)
+    clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = clients.get(origin)
+    if client is None or client.is_closed:
+        transport = _AsyncCountingTransport(_get_stats(origin), limits=_limits(), http2=HTTP2_ENABLED)
+        client = httpx.AsyncClient(transport=transport, timeout=get_timeout("default"))
+        clients[origin] = client
+    return client
+
+
+def get_pool_stats() -> dict:
+    """Contadores de aciertos (conexión reutilizada) y fallos (conexión nueva) por endpoint."""
+    with _stats_lock:
+        return {origin: stats.as_dict() for origin, stats in _stats.items()}
+
+
+def close_clients():
+    with _sync_lock:
+        for client in _sync_clients.values():
+            client.close()
+        _sync_clients.clear()
+
+
+async def close_async_clients():
+    """Cierra los clientes asíncronos del event loop actual (usar al apagar la app)."""
+    clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        if not client.is_closed:
+            await client.aclose()
@@ -1,129 +1,213 @@
-# backend/core/llm.py
-
-import sys
-import os
-import requests
-import time
-import json
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from shared.utils import load_config
-
-
-CONFIG_JSON = load_config()
-MODEL_ENDPOINTS = CONFIG_JSON["model_endpoints"]
-
-def model_mapper(model: str):
-    mapping = {
-        "gemma": "google/gemma-2-9b-it",
-        "llama": "meta/llama-3.1-8b-instruct",
-        "mistral": "mistral/mistral-7b-instruct-v0.3",        
-        "hermes": "teknium/openhermes-2.5-mistral-7b",
-        "deepseek": "deepseek-ai/deepseek-coder-6.7b-instruct",
-        "mixtral": "mistralai/mixtral-8x7b-instruct-v0.1",
-        "starcoder": "bigcode/starcoder2-15b",
-        "codellama": "codellama/codellama-13b-instruct-hf",
-    }
-    return mapping.get(model.lower(), model)
-
-def call_model(model: str, prompt: str):    
-    start_time = time.time()
-    model_id = model.lower()
-    model_use = model_mapper(model_id)
-    model_endpoint = MODEL_ENDPOINTS.get(model_id)
-
-    if not model_endpoint:
-        raise ValueError(f"Modelo '{model_use}' no está configurado en MODEL_ENDPOINTS.")
-    
-    chat_models = {"gemma", "llama", "mixtral", "deepseek", "starcoder", "codellama"}
-
-    if model_id in chat_models:
-        # Usar formato de mensajes estilo OpenAI
-        payload = {
-            "model": model_use,
-            "messages": [
-                {"role": "user", "content": prompt}
-            ],
-            "stream": False
-        }
-    else:
-        # Usar formato clásico con prompt directo
-        payload = {
-            "prompt": prompt,
-            "model": model_use
-        }
-
-    try:
-        response = requests.post(
-            url=model_endpoint,
-            headers={"Content-Type": "application/json"},
-            json=payload,
-            timeout=180
-        )
-
-        response.raise_for_status()
-        data = response.json()
-
-        # Decodificación dinámica del resultado según el tipo de modelo
-        if model_id in chat_models:
-            generated_text = data["choices"][0]["message"]["content"]
-        else:
-            generated_text = data["sql"]
-
-        duration = round(time.time() - start_time, 2)
-        return generated_text, duration, data
-
-    except requests.RequestException as e:
-        print(f"🚨 Error al invocar el modelo {model}: {e}")
-        raise e
-
-
-def call_model_streaming(model: str, prompt: str):
-    """
-    Ejecuta una inferencia en modo streaming si el modelo lo soporta.
-    Compatible con modelos tipo chat que usan el formato 'messages' y retorno de fragmentos.
-    """
-    model_id = model.lower()
-    model_use = model_mapper(model_id)
-    model_endpoint = MODEL_ENDPOINTS.get(model_id)
-
-    if not model_endpoint:
-        raise ValueError(f"Modelo '{model_use}' no está configurado en MODEL_ENDPOINTS.")
-
-    # Modelos que soportan chat streaming con 'messages' y 'delta'
-    chat_models = {"gemma", "llama", "mixtral", "deepseek", "starcoder", "codellama"}
-
-    if model_id in chat_models:
-        payload = {
-            "model": model_use,
-            "messages": [{"role": "user", "content": prompt}],
-            "stream": True
-        }
-    else:
-        raise NotImplementedError(f"El modelo '{model_id}' no soporta streaming en este flujo.")
-    try:
-        response = requests.post(
-            url=model_endpoint,
-            headers={"Content-Type": "application/json"},
-            json=payload,
-            stream=True,
-            timeout=120
-        ) 
-        buffer = ""
-        for line in response.iter_lines():
-            if line and line.decode().startswith("data:"):
-                payload = line.decode().replace("data: ", "")
-                if payload.strip() == "[DONE]":
-                    break
-                try:
-                    data = json.loads(payload)
-                    delta = data["choices"][0]["delta"]
-                    if "content" in delta:
-                        chunk = delta["content"]
-                        buffer += chunk
-                        yield chunk
-                except json.JSONDecodeError:
-                    continue
-
-    except requests.RequestException as e:
-        print(f"🚨 Error al invocar modelo en streaming ({model_id}): {e}")
-        raise e
+# backend/core/llm.py
+
+import sys
+import os
+import time
+import json
+import httpx
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.utils import load_config
+from core.http_client import get_client, get_async_client, get_timeout
+from core.tracing import span, start_span
+
+
+CONFIG_JSON = load_config()
+MODEL_ENDPOINTS = CONFIG_JSON["model_endpoints"]
+
+def model_mapper(model: str):
+    mapping = {
+        "gemma": "google/gemma-2-9b-it",
+        "llama": "meta/llama-3.1-8b-instruct",
+        "mistral": "mistral/mistral-7b-instruct-v0.3",        
+        "hermes": "teknium/openhermes-2.5-mistral-7b",
+        "deepseek": "deepseek-ai/deepseek-coder-6.7b-instruct",
+        "mixtral": "mistralai/mixtral-8x7b-instruct-v0.1",
+        "starcoder": "bigcode/starcoder2-15b",
+        "codellama": "codellama/codellama-13b-instruct-hf",
+    }
+    return mapping.get(model.lower(), model)
+
+CHAT_MODELS = {"gemma", "llama", "mixtral", "deepseek", "starcoder", "codellama"}
+
+def _prepare_request(model: str, prompt: str):
+    model_id = model.lower()
+    model_use = model_mapper(model_id)
+    model_endpoint = MODEL_ENDPOINTS.get(model_id)
+
+    if not model_endpoint:
+        raise ValueError(f"Modelo '{model_use}' no está configurado en MODEL_ENDPOINTS.")
+
+    if model_id in CHAT_MODELS:
+        # Usar formato de mensajes estilo OpenAI
+        payload = {
+            "model": model_use,
+            "messages": [
+                {"role": "user", "content": prompt}
+            ],
+            "stream": False
+        }
+    else:
+        # Usar formato clásico con prompt directo
+        payload = {
+            "prompt": prompt,
+            "model": model_use
+        }
+    return model_id, model_endpoint, payload
+
+def _extract_text(model_id: str, data: dict) -> str:
+    # Decodificación dinámica del resultado según el tipo de modelo
+    if model_id in CHAT_MODELS:
+        return data["choices"][0]["message"]["content"]
+    return data["sql"]
+
+def call_model(model: str, prompt: str):    
+    start_time = time.time()
+    model_id, model_endpoint, payload = _prepare_request(model, prompt)
+
+    try:
+        response = get_client(model_endpoint).post(
+            model_endpoint,
+            headers={"Content-Type": "application/json"},
+            json=payload,
+            timeout=get_timeout(model_id)
+        )
+
+        response.raise_for_status()
+        data = response.json()
+        generated_text = _extract_text(model_id, data)
+
+        duration = round(time.time() - start_time, 2)
+        return generated_text, duration, data
+
+    except httpx.HTTPError as e:
+        print(f"🚨 Error al invocar el modelo {model}: {e}")
+        raise e
+
+
+async def call_model_async(model: str, prompt: str):
+    """
+    Versión asíncrona de `call_model`: no bloquea el event loop mientras espera al modelo.
+
+    Returns:
+        tuple: Texto generado, duración en segundos y respuesta completa.
+    """
+    start_time = time.time()
+    model_id, model_endpoint, payload = _prepare_request(model, prompt)
+
+    try:
+        with span("llm.request", model=model, model_id=model_id, prompt_chars=len(prompt)) as llm_span:
+            response = await get_async_client(model_endpoint).post(
+                model_endpoint,
+                headers={"Content-Type": "application/json"},
+                json=payload,
+                timeout=get_timeout(model_id)
+            )
+            llm_span.set_attribute("http.status_code", response.status_code)
+
+            response.raise_for_status()
+            data = response.json()
+            generated_text = _extract_text(model_id, data)
+            llm_span.set_attributes(completion_chars=len(generated_text), usage=data.get("usage"))
+
+        duration = round(time.time() - start_time, 2)
+        return generated_text, duration, data
+
+    except httpx.HTTPError as e:
+        print(f"🚨 Error al invocar el modelo {model}: {e}")
+        raise e
+
+
+def _parse_stream_line(line: str):
+    """
+    Interpreta una línea SSE de un modelo tipo chat.
+
+    Returns:
+        tuple: (fragmento de texto o None, True si el modelo indicó el fin del stream).
+    """
+    if not line or not line.startswith("data:"):
+        return None, False
+    payload = line[len("data:"):].strip()
+    if payload == "[DONE]":
+        return None, True
+    try:
+        delta = json.loads(payload)["choices"][0]["delta"]
+    except (json.JSONDecodeError, KeyError, IndexError):
+        return None, False
+    return delta.get("content"), False
+
+
+def call_model_streaming(model: str, prompt: str):
+    """
+    Ejecuta una inferencia en modo streaming si el modelo lo soporta.
+    Compatible con modelos tipo chat que usan el formato 'messages' y retorno de fragmentos.
+    """
+    model_id, model_endpoint, payload = _prepare_request(model, prompt)
+    if model_id not in CHAT_MODELS:
+        raise NotImplementedError(f"El modelo '{model_id}' no soporta streaming en este flujo.")
+    payload["stream"] = True
+
+    try:
+        with get_client(model_endpoint).stream(
+            "POST",
+            model_endpoint,
+            headers={"Content-Type": "application/json"},
+            json=payload,
+            timeout=get_timeout(model_id)
+        ) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                chunk, done = _parse_stream_line(line)
+                if done:
+                    break
+                if chunk:
+                    yield chunk
+
+    except httpx.HTTPError as e:
+        print(f"🚨 Error al invocar modelo en streaming ({model_id}): {e}")
+        raise e
+
+
+async def call_model_stream_async(model: str, prompt: str):
+    """
+    Versión asíncrona de `call_model_streaming` que produce los fragmentos conforme llegan.
+    Los modelos sin formato chat (p. ej. mistral con prompt directo) no transmiten por fragmentos:
+    su texto completo se entrega como un único fragmento.
+
+    Yields:
+        str: Fragmentos de texto generados.
+    """
+    model_id, model_endpoint, payload = _prepare_request(model, prompt)
+    if model_id not in CHAT_MODELS:
+        generated_text, _, _ = await call_model_async(model, prompt)
+        yield generated_text
+        return
+    payload["stream"] = True
+
+    stream_span = start_span("llm.stream", model=model, model_id=model_id, prompt_chars=len(prompt))
+    start_time, chunks = time.perf_counter(), 0
+    try:
+        async with get_async_client(model_endpoint).stream(
+            "POST",
+            model_endpoint,
+            headers={"Content-Type": "application/json"},
+            json=payload,
+            timeout=get_timeout(model_id)
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                chunk, done = _parse_stream_line(line)
+                if done:
+                    break
+                if chunk:
+                    if chunks == 0:
+                        stream_span.set_attribute("ttft_ms", round((time.perf_counter() - start_time) * 1000, 1))
+                    chunks += 1
+                    yield chunk
+
+    except httpx.HTTPError as e:
+        print(f"🚨 Error al invocar modelo en streaming ({model_id}): {e}")
+        stream_span.set_error(f"{type(e).__name__}: {e}")
+        raise e
+    finally:
+        stream_span.set_attribute("chunks", chunks)
+        stream_span.end()
@@ -0,0 +1,283 @@
+# backend/core/metrics.py
+
+import sys
+import os
+import time
+import bisect
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.utils import load_config
+from core.tracing import span
+
+CONFIG_JSON = load_config()
+METRICS = CONFIG_JSON.get("metrics", {})
+
+# Buckets en segundos: cubren desde una búsqueda en Milvus hasta una generación larga del modelo
+DEFAULT_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 60]
+
+# Dominio de la petición en curso; las etapas profundas (embedding, Milvus) lo heredan sin recibirlo
+current_domain = contextvars.ContextVar("metrics_domain", default="")
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key: tuple, value) -> list:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: list = None):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = sorted(buckets or DEFAULT_BUCKETS)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        # Conteos por bucket (no acumulados); se acumulan al exportar
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _render_series(self, key: tuple, value) -> list:
+        counts, total, count = value
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets + [float("inf")], counts):
+            cumulative += bucket_count
+            le = f'le="{_format_value(float(bound)) if bound != float("inf") else "+Inf"}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+        lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Registro de métricas del proceso en formato de texto de Prometheus.
+    Implementación mínima (sin dependencias) de contadores, gauges e histogramas con etiquetas.
+    Con varios workers de uvicorn cada proceso expone sus propias series.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: list = None) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics_registry = MetricsRegistry(enabled=METRICS.get("enabled", True))
+
+STAGE_LABELS = ("stage", "domain", "model", "outcome")
+
+stage_duration = metrics_registry.histogram(
+    "agent_stage_duration_seconds",
+    "Duración de cada etapa del pipeline.",
+    STAGE_LABELS,
+    METRICS.get("buckets")
+)
+stage_total = metrics_registry.counter(
+    "agent_stage_total",
+    "Ejecuciones de cada etapa del pipeline por resultado.",
+    STAGE_LABELS
+)
+stage_in_flight = metrics_registry.gauge(
+    "agent_stage_in_flight",
+    "Etapas en ejecución en este momento.",
+    ("stage",)
+)
+request_duration = metrics_registry.histogram(
+    "agent_http_request_duration_seconds",
+    "Duración de las peticiones HTTP por endpoint.",
+    ("method", "endpoint", "status"),
+    METRICS.get("buckets")
+)
+requests_in_flight = metrics_registry.gauge(
+    "agent_http_requests_in_flight",
+    "Peticiones HTTP en curso por endpoint.",
+    ("endpoint",)
+)
+
+
+class StageObservation:
+    """Resultado de una etapa medida; `outcome` se puede cambiar antes de salir del bloque."""
+
+    def __init__(self):
+        self.outcome = "ok"
+        self.duration = 0.0
+
+
+@contextmanager
+def observe_stage(stage: str, model: str = "", domain: str = None):
+    """
+    Mide una etapa del pipeline y la registra en `agent_stage_duration_seconds`,
+    `agent_stage_total` y `agent_stage_in_flight`. Si el bloque lanza una excepción
+    el resultado es "error" ("cancelled" si la tarea se canceló).
+    La etapa también se registra como span de la traza activa (ver core/tracing.py).
+
+    Args:
+        stage (str): Nombre de la etapa (reformulation, embedding, milvus_search, ...).
+        model (str): Modelo o recurso que atiende la etapa.
+        domain (str): Dominio; por defecto el de la petición en curso (`current_domain`).
+    """
+    observation = StageObservation()
+    domain = current_domain.get() if domain is None else domain
+    with span(stage, model=model, domain=domain) as stage_span:
+        if not metrics_registry.enabled:
+            try:
+                yield observation
+            finally:
+                stage_span.set_attribute("outcome", observation.outcome)
+            return
+
+        stage_in_flight.inc(stage=stage)
+        start_time = time.perf_counter()
+        try:
+            yield observation
+        except asyncio.CancelledError:
+            # Trabajo especulativo descartado
+            observation.outcome = "cancelled"
+            raise
+        except BaseException:
+            observation.outcome = "error"
+            raise
+        finally:
+            observation.duration = time.perf_counter() - start_time
+            stage_in_flight.dec(stage=stage)
+            stage_span.set_attribute("outcome", observation.outcome)
+            labels = {"stage": stage, "domain": domain, "model": model, "outcome": observation.outcome}
+            stage_duration.observe(observation.duration, **labels)
+            stage_total.inc(**labels)
+
+
+def render_metrics() -> str:
+    return metrics_registry.render()
+
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que mide cada petición HTTP hasta el último byte de la respuesta
+    (incluye los endpoints de streaming). El endpoint se etiqueta con la plantilla de la
+    ruta para no crear una serie por URL; las rutas desconocidas se agrupan en "unmatched".
+    """
+
+    def __init__(self, app, exclude: tuple = ("/metrics",)):
+        self.app = app
+        self.exclude = set(exclude)
+        self._paths = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not metrics_registry.enabled or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        # Antes del enrutado solo se conoce la URL; se usa si es una ruta fija de la aplicación
+        if self._paths is None:
+            self._paths = {getattr(route, "path", None) for route in getattr(scope.get("app"), "routes", [])}
+        in_flight_label = scope["path"] if scope["path"] in self._paths else "other"
+        requests_in_flight.inc(endpoint=in_flight_label)
+        start_time = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            requests_in_flight.dec(endpoint=in_flight_label)
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            request_duration.observe(
+                time.perf_counter() - start_time,
+                method=scope["method"],
+                endpoint=endpoint,
+                status=str(status["code"])
+            )
@@ -0,0 +1,131 @@
+# backend/core/milvus_registry.py
+
+import sys
+import os
+import logging
+import threading
+from pymilvus import connections, Collection, utility
+from pymilvus.exceptions import ConnectError, ConnectionNotExistException, MilvusUnavailableException
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.utils import load_config
+
+logger = logging.getLogger("milvus_registry")
+
+CONFIG_JSON = load_config()
+MILVUS_ENDPOINT = CONFIG_JSON["milvus_endpoint"]
+
+# Errores que indican conexión perdida: se reconecta y se reintenta una vez
+RECONNECT_ERRORS = (ConnectError, ConnectionNotExistException, MilvusUnavailableException)
+
+
+class MilvusRegistry:
+    """
+    Registro de la conexión a Milvus y de los `Collection` ya cargados, compartido
+    por todo el proceso para que cada búsqueda sea solo la llamada RPC.
+
+    Args:
+        host (str): Host de Milvus.
+        port (int): Puerto de Milvus.
+        collection_names (list): Colecciones que se cargan al iniciar.
+        alias (str): Alias de conexión de pymilvus.
+    """
+
+    def __init__(self, host: str, port: int, collection_names: list, alias: str = "default"):
+        self.host = host
+        self.port = port
+        self.collection_names = collection_names
+        self.alias = alias
+        self._lock = threading.RLock()
+        self._connected = False
+        self._collections = {}
+        self._loaded = set()
+
+    def connect(self):
+        with self._lock:
+            if not self._connected:
+                connections.connect(alias=self.alias, host=self.host, port=self.port)
+                self._connected = True
+
+    def reconnect(self):
+        with self._lock:
+            try:
+                connections.disconnect(self.alias)
+            except Exception:
+                pass
+            self._connected = False
+            self._collections.clear()
+            self._loaded.clear()
+            self.connect()
+
+    def get_collection(self, name: str, load: bool = True) -> Collection:
+        """
+        Devuelve el handle de la colección, conectando y cargándola solo la primera vez.
+
+        Args:
+            name (str): Nombre de la colección.
+            load (bool): Si se requiere la colección cargada en memoria (búsquedas).
+
+        Returns:
+            Collection: Handle reutilizable de pymilvus.
+        """
+        with self._lock:
+            self.connect()
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = Collection(name, using=self.alias)
+                self._collections[name] = collection
+            if load and name not in self._loaded:
+                collection.load()
+                self._loaded.add(name)
+            return collection
+
+    def register_collection(self, name: str, collection):
+        """
+        Registra un objeto compatible con `Collection` (p. ej. un almacén en memoria para
+        benchmarks) sin conectarse a Milvus; `run` lo usará en lugar de la colección real.
+        """
+        with self._lock:
+            self._connected = True
+            self._collections[name] = collection
+            self._loaded.add(name)
+
+    def run(self, name: str, operation, load: bool = True):
+        """
+        Ejecuta `operation(collection)`; si la conexión se perdió, reconecta y reintenta una vez.
+        """
+        try:
+            return operation(self.get_collection(name, load))
+        except RECONNECT_ERRORS as e:
+            logger.warning(f"⚠️ Conexión con Milvus perdida ({e}); reconectando...")
+            self.reconnect()
+            return operation(self.get_collection(name, load))
+
+    def warm_up(self):
+        """Conecta y carga todas las colecciones configuradas (usar al iniciar la app)."""
+        for name in self.collection_names:
+            try:
+                self.get_collection(name)
+                logger.info(f"✅ Colección cargada: {name}")
+            except Exception as e:
+                logger.error(f"❌ No se pudo cargar la colección '{name}': {e}")
+
+    def status(self) -> dict:
+        collections = {}
+        for name in self.collection_names:
+            try:
+                load_state = str(utility.load_state(name, using=self.alias)) if self._connected else "disconnected"
+            except Exception as e:
+                load_state = f"error: {e}"
+            collections[name] = {
+                "handle": name in self._collections,
+                "loaded": name in self._loaded,
+                "load_state": load_state
+            }
+        return {"alias": self.alias, "connected": self._connected, "collections": collections}
+
+
+milvus_registry = MilvusRegistry(
+    MILVUS_ENDPOINT["host"],
+    MILVUS_ENDPOINT["port"],
+    list(MILVUS_ENDPOINT["collections"].values())
+)
@@ -1,56 +1,373 @@
-# backend/core/query_executor.py
-
-from core.config import DB_CONNECTIONS
-from shared.utils import log_to_file, load_config
-import psycopg2
-import time
-
-CONFIG_JSON = load_config()
-SQL_EXECUTION_MODE = CONFIG_JSON['execution_mode']
-DOMAIN_TO_DB = CONFIG_JSON['domain_to_db']
-
-def execute_sql(sql: str, domain: str):
-    """
-    Ejecuta una consulta SQL dependiendo del dominio de datos.
-
-    Args:
-        sql (str): Consulta SQL a ejecutar.
-        domain (str): Dominio de datos (ej. tickets, ventas, etc.)
-
-    Returns:
-        dict: Resultado de la consulta o error.
-    """
-    start_time = time.time()    
-    if SQL_EXECUTION_MODE == "dummy":
-        log_to_file("Modo DUMMY: Simulando ejecución SQL.")
-        return {"mensaje": "Ejecución simulada. SQL no ejecutado."}
-
-    try:
-        # Obtener configuración específica del dominio
-        db_domain = DOMAIN_TO_DB.get(domain)
-        db_conf = DB_CONNECTIONS.get(db_domain)
-        if not db_conf:
-            msg = f"No hay configuración de base de datos para el dominio '{domain}'"
-            log_to_file(msg)
-            raise ValueError(msg)
-
-        connection = psycopg2.connect(**db_conf)
-        cursor = connection.cursor()
-        cursor.execute(sql)
-        
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-        result = {"columns": columns, "rows": rows}
-
-        connection.commit()
-
-        cursor.close()
-        connection.close()
-        duration = round(time.time() - start_time, 2)
-        
-        return result, duration
-
-    except Exception as e:
-        log_to_file(f"Error al ejecutar SQL para el dominio '{domain}': {str(e)}")
-        duration = round(time.time() - start_time, 2)
-        return {"error": str(e)}, duration
+# backend/core/query_executor.py
+
+from shared.utils import log_to_file, load_config
+from shared.app_config import on_config_reload
+from core.concurrency import run_blocking
+from core.metrics import observe_stage
+from core.tracing import span
+from core.result_cache import result_cache
+from core.db_pool import get_pool_for_domain
+from core.exceptions import InvalidPageTokenError
+import time
+import json
+import uuid
+import base64
+import hashlib
+import psycopg2
+import psycopg2.errors
+
+CONFIG_JSON = load_config()
+SQL_EXECUTION_MODE = CONFIG_JSON['execution_mode']
+DOMAIN_TO_DB = CONFIG_JSON['domain_to_db']
+RESULT_PAGING = CONFIG_JSON.get("result_paging", {})
+PREVIEW_ROWS = RESULT_PAGING.get("preview_rows", 500)
+PAGE_SIZE = RESULT_PAGING.get("page_size", 500)
+MAX_PAGE_SIZE = RESULT_PAGING.get("max_page_size", 5000)
+STREAM_FETCH_SIZE = RESULT_PAGING.get("stream_fetch_size", 1000)
+COST_GUARD = CONFIG_JSON.get("cost_guard", {})
+
+
+@on_config_reload
+def _refresh_paging_settings(config):
+    # Paginación y límites de costo ajustables en caliente con /config/reload
+    global RESULT_PAGING, PREVIEW_ROWS, PAGE_SIZE, MAX_PAGE_SIZE, STREAM_FETCH_SIZE, COST_GUARD
+    RESULT_PAGING = config.section("result_paging")
+    PREVIEW_ROWS = RESULT_PAGING.get("preview_rows", 500)
+    PAGE_SIZE = RESULT_PAGING.get("page_size", 500)
+    MAX_PAGE_SIZE = RESULT_PAGING.get("max_page_size", 5000)
+    STREAM_FETCH_SIZE = RESULT_PAGING.get("stream_fetch_size", 1000)
+    COST_GUARD = config.section("cost_guard")
+
+def execute_sql(sql: str, domain: str, use_cache: bool = True, confirmed: bool = False):
+    """
+    Ejecuta una consulta SQL dependiendo del dominio de datos.
+    Los resultados se reutilizan desde `result_cache` mientras sigan vigentes.
+
+    Args:
+        sql (str): Consulta SQL a ejecutar.
+        domain (str): Dominio de datos (ej. tickets, ventas, etc.)
+        use_cache (bool): Si es False, siempre consulta la base de datos.
+        confirmed (bool): Omite la revisión de costo con EXPLAIN (el usuario aceptó el costo).
+
+    Returns:
+        tuple: Resultado de la consulta (o error) y duración en segundos.
+        Si el plan supera los límites del dominio, el resultado incluye `too_expensive`.
+    """
+    if not use_cache:
+        result, duration = _run_query(sql, domain, confirmed)
+        result_cache.put(result_cache.key_for(sql, domain), result)
+        return result, duration
+
+    start_time = time.time()
+    cache_key = result_cache.key_for(sql, domain)
+    cached, state = result_cache.get(cache_key)
+    if cached is not None:
+        if state == "stale":
+            result_cache.refresh_in_background(cache_key, lambda: _run_query(sql, domain, confirmed))
+        return cached, round(time.time() - start_time, 2)
+
+    result, duration = _run_query(sql, domain, confirmed)
+    result_cache.put(cache_key, result)
+    return result, duration
+
+
+def _run_query(sql: str, domain: str, confirmed: bool = False):
+    start_time = time.time()    
+    if SQL_EXECUTION_MODE == "dummy":
+        log_to_file("Modo DUMMY: Simulando ejecución SQL.")
+        return {"mensaje": "Ejecución simulada. SQL no ejecutado."}, 0.0
+
+    try:
+        # Obtener el pool de conexiones específico del dominio
+        try:
+            pool = get_pool_for_domain(domain)
+        except ValueError as e:
+            log_to_file(str(e))
+            raise
+
+        with pool.connection() as connection:
+            guard_cursor = connection.cursor()
+            _set_statement_timeout(guard_cursor, domain)
+            rejection = _guard_cost(guard_cursor, sql, domain, confirmed)
+            guard_cursor.close()
+            if rejection:
+                return rejection, round(time.time() - start_time, 2)
+
+            # Cursor con nombre (server-side): solo viajan las filas de la vista previa
+            with span("db.query") as query_span:
+                cursor = connection.cursor(name=_cursor_name())
+                cursor.execute(sql)
+
+                rows = cursor.fetchmany(PREVIEW_ROWS + 1)
+                query_span.set_attribute("rows", min(len(rows), PREVIEW_ROWS))
+            columns = [desc[0] for desc in cursor.description]
+            truncated = len(rows) > PREVIEW_ROWS
+            result = {
+                "columns": columns,
+                "rows": rows[:PREVIEW_ROWS],
+                "truncated": truncated,
+                "next_page_token": encode_page_token(sql, domain, PREVIEW_ROWS, confirmed) if truncated else None
+            }
+
+            cursor.close()
+            connection.commit()
+
+        duration = round(time.time() - start_time, 2)
+        
+        return result, duration
+
+    except Exception as e:
+        log_to_file(f"Error al ejecutar SQL para el dominio '{domain}': {str(e)}")
+        duration = round(time.time() - start_time, 2)
+        result = {"error": str(e)}
+        if isinstance(e, psycopg2.errors.QueryCanceled):
+            result["timeout"] = True
+        return result, duration
+
+
+async def execute_sql_async(sql: str, domain: str, use_cache: bool = True, confirmed: bool = False):
+    """
+    Ejecuta `execute_sql` en el pool de base de datos sin bloquear el event loop.
+
+    Returns:
+        tuple: Resultado de la consulta (o error) y duración en segundos.
+    """
+    with observe_stage("execution", DOMAIN_TO_DB.get(domain, ""), domain) as observation:
+        result, duration = await run_blocking("db", execute_sql, sql, domain, use_cache=use_cache, confirmed=confirmed)
+        if result.get("too_expensive"):
+            observation.outcome = "too_expensive"
+        elif "error" in result:
+            observation.outcome = "error"
+    return result, duration
+
+
+def get_cost_limits(domain: str) -> dict:
+    """Límites de costo del dominio: valores de `cost_guard.default` sobrescritos por `cost_guard.domains`."""
+    return {**COST_GUARD.get("default", {}), **COST_GUARD.get("domains", {}).get(domain, {})}
+
+
+def _set_statement_timeout(cursor, domain: str):
+    # SET LOCAL solo dura la transacción actual, así no contamina conexiones del pool
+    timeout_ms = get_cost_limits(domain).get("statement_timeout_ms")
+    if timeout_ms:
+        cursor.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms),))
+
+
+def check_query_cost(cursor, sql: str, domain: str):
+    """
+    Estima el costo de la consulta con `EXPLAIN (FORMAT JSON)` antes de ejecutarla.
+
+    Args:
+        cursor: Cursor de la transacción donde se ejecutará la consulta.
+        sql (str): Consulta SQL.
+        domain (str): Dominio cuyos límites se aplican.
+
+    Returns:
+        dict | None: Resultado estructurado "demasiado costosa" o None si está dentro de los límites.
+    """
+    limits = get_cost_limits(domain)
+    if not COST_GUARD.get("enabled", False) or not limits:
+        return None
+
+    cursor.execute(f"EXPLAIN (FORMAT JSON) {sql.strip().rstrip(';')}")
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    root = plan[0]["Plan"]
+    estimate = {"total_cost": root.get("Total Cost", 0), "plan_rows": root.get("Plan Rows", 0)}
+
+    exceeded = []
+    if limits.get("max_total_cost") and estimate["total_cost"] > limits["max_total_cost"]:
+        exceeded.append("total_cost")
+    if limits.get("max_plan_rows") and estimate["plan_rows"] > limits["max_plan_rows"]:
+        exceeded.append("plan_rows")
+    if not exceeded:
+        return None
+
+    return {
+        "error": "La consulta es demasiado costosa para ejecutarse en el DWH.",
+        "too_expensive": True,
+        "requires_confirmation": limits.get("on_exceed", "reject") == "confirm",
+        "estimate": estimate,
+        "limits": {k: limits.get(k) for k in ("max_total_cost", "max_plan_rows")},
+        "exceeded": exceeded
+    }
+
+
+def _guard_cost(cursor, sql: str, domain: str, confirmed: bool):
+    """
+    Revisión de costo previa a cualquier ejecución (vista previa, páginas o streaming),
+    en la misma transacción que ejecutará la consulta.
+
+    Returns:
+        dict | None: Resultado "demasiado costosa" o None si puede ejecutarse.
+    """
+    if confirmed:
+        return None
+    with span("db.cost_check") as cost_span:
+        rejection = check_query_cost(cursor, sql, domain)
+        cost_span.set_attribute("rejected", bool(rejection))
+    if rejection:
+        log_to_file(f"Consulta rechazada por costo para el dominio '{domain}': {rejection['estimate']}")
+    return rejection
+
+
+def _cursor_name() -> str:
+    return f"agent_{uuid.uuid4().hex[:12]}"
+
+
+def _sql_fingerprint(sql: str, domain: str) -> str:
+    # Misma forma canónica que la llave de `result_cache`: un resultado cacheado puede servirse
+    # a un SQL con otro formato, y su token debe seguir siendo válido para ese SQL
+    cache_domain, canonical_sql = result_cache.key_for(sql, domain)
+    return hashlib.sha256(f"{cache_domain}\n{canonical_sql}".encode("utf-8")).hexdigest()[:16]
+
+
+def encode_page_token(sql: str, domain: str, offset: int, confirmed: bool = False) -> str:
+    """
+    Token de página sin estado en el servidor: guarda el desplazamiento y una huella
+    de la consulta para rechazar tokens usados con otro SQL o dominio. Si el usuario
+    confirmó el costo de la consulta, las páginas siguientes no vuelven a pedirlo.
+    """
+    payload = {"o": offset, "f": _sql_fingerprint(sql, domain)}
+    if confirmed:
+        payload["c"] = 1
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+
+def decode_page_token(token: str, sql: str, domain: str) -> tuple:
+    """
+    Devuelve el desplazamiento contenido en el token y si el costo ya fue confirmado.
+
+    Raises:
+        InvalidPageTokenError: Si el token está corrupto o pertenece a otra consulta.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        offset = int(payload["o"])
+        fingerprint = payload["f"]
+    except Exception:
+        raise InvalidPageTokenError("Token de página inválido.")
+    if offset < 0 or fingerprint != _sql_fingerprint(sql, domain):
+        raise InvalidPageTokenError("El token de página no corresponde a esta consulta.")
+    return offset, bool(payload.get("c"))
+
+
+def fetch_page(sql: str, domain: str, page_token: str = None, page_size: int = None, confirmed: bool = False):
+    """
+    Obtiene una página de resultados envolviendo la consulta con LIMIT/OFFSET.
+    El orden entre páginas solo es estable si la consulta incluye ORDER BY.
+
+    Args:
+        sql (str): Consulta SQL (ya validada).
+        domain (str): Dominio de datos.
+        page_token (str): Token devuelto por la página anterior (None = primera página).
+        page_size (int): Filas por página (limitado por `max_page_size`).
+        confirmed (bool): Omite la revisión de costo con EXPLAIN (el usuario aceptó el costo).
+
+    Returns:
+        tuple: Página ({"columns", "rows", "offset", "next_page_token"} o error) y duración.
+        Si el plan supera los límites del dominio, el resultado incluye `too_expensive`.
+    """
+    start_time = time.time()
+    offset, token_confirmed = decode_page_token(page_token, sql, domain) if page_token else (0, False)
+    confirmed = confirmed or token_confirmed
+    page_size = max(1, min(page_size or PAGE_SIZE, MAX_PAGE_SIZE))
+
+    if SQL_EXECUTION_MODE == "dummy":
+        return {"columns": [], "rows": [], "offset": offset, "next_page_token": None}, 0.0
+
+    inner_sql = sql.strip().rstrip(";")
+    # LIMIT/OFFSET van como enteros en el texto y la consulta se ejecuta sin parámetros:
+    # con parámetros psycopg2 tomaría cada `%` del SQL generado (p. ej. ILIKE '%ABIERTO%') como marcador
+    paged_sql = f"SELECT * FROM ({inner_sql}) AS _page LIMIT {int(page_size) + 1} OFFSET {int(offset)}"
+    try:
+        with get_pool_for_domain(domain).connection() as connection:
+            cursor = connection.cursor()
+            _set_statement_timeout(cursor, domain)
+            # El límite de la página no acota el costo: OFFSET recorre todo lo anterior
+            rejection = _guard_cost(cursor, sql, domain, confirmed)
+            if rejection:
+                cursor.close()
+                return rejection, round(time.time() - start_time, 2)
+            cursor.execute(paged_sql)
+            columns = [desc[0] for desc in cursor.description]
+            rows = cursor.fetchall()
+            cursor.close()
+            connection.commit()
+
+        has_more = len(rows) > page_size
+        page = {
+            "columns": columns,
+            "rows": rows[:page_size],
+            "offset": offset,
+            "next_page_token": encode_page_token(sql, domain, offset + page_size, confirmed) if has_more else None
+        }
+        return page, round(time.time() - start_time, 2)
+
+    except Exception as e:
+        log_to_file(f"Error al paginar SQL para el dominio '{domain}': {str(e)}")
+        return {"error": str(e)}, round(time.time() - start_time, 2)
+
+
+async def fetch_page_async(sql: str, domain: str, page_token: str = None, page_size: int = None, confirmed: bool = False):
+    return await run_blocking("db", fetch_page, sql, domain, page_token, page_size, confirmed)
+
+
+def stream_query(sql: str, domain: str, confirmed: bool = False):
+    """
+    Recorre el resultado completo con un cursor con nombre, en bloques de `stream_fetch_size`,
+    sin cargar todas las filas en memoria. La conexión queda ocupada mientras se consume.
+
+    Args:
+        sql (str): Consulta SQL (ya validada).
+        domain (str): Dominio de datos.
+        confirmed (bool): Omite la revisión de costo con EXPLAIN (el usuario aceptó el costo).
+
+    Yields:
+        dict: {"type": "columns"}, luego bloques {"type": "rows"} y al final {"type": "end"}
+        (o {"type": "error"} si la consulta falla). Si el plan supera los límites del dominio,
+        el único bloque es {"type": "too_expensive", "result": ...}.
+    """
+    start_time = time.time()
+    if SQL_EXECUTION_MODE == "dummy":
+        yield {"type": "columns", "columns": []}
+        yield {"type": "end", "row_count": 0, "duration": 0.0}
+        return
+
+    row_count = 0
+    try:
+        with get_pool_for_domain(domain).connection() as connection:
+            guard_cursor = connection.cursor()
+            _set_statement_timeout(guard_cursor, domain)
+            rejection = _guard_cost(guard_cursor, sql, domain, confirmed)
+            guard_cursor.close()
+
+            # El rechazo se entrega fuera del `with`: quien lo recibe puede cerrar el generador
+            # sin consumirlo y la conexión ya debe estar de vuelta en el pool
+            if not rejection:
+                cursor = connection.cursor(name=_cursor_name())
+                try:
+                    cursor.itersize = STREAM_FETCH_SIZE
+                    cursor.execute(sql)
+
+                    rows = cursor.fetchmany(STREAM_FETCH_SIZE)
+                    yield {"type": "columns", "columns": [desc[0] for desc in cursor.description]}
+                    while rows:
+                        row_count += len(rows)
+                        yield {"type": "rows", "rows": rows}
+                        rows = cursor.fetchmany(STREAM_FETCH_SIZE)
+                finally:
+                    # También si el cliente se desconecta y Starlette cierra el generador (GeneratorExit):
+                    # el cursor server-side se cierra y el pool hace rollback al recibir la conexión
+                    cursor.close()
+                connection.commit()
+
+        if rejection:
+            yield {"type": "too_expensive", "result": rejection}
+            return
+        yield {"type": "end", "row_count": row_count, "duration": round(time.time() - start_time, 2)}
+
+    except Exception as e:
+        log_to_file(f"Error al transmitir SQL para el dominio '{domain}': {str(e)}")
+        yield {"type": "error", "error": str(e), "row_count": row_count}
@@ -0,0 +1,109 @@
+# backend/core/response_cache.py
+
+import sys
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.utils import load_config, get_prompt_version
+from core.embedding_cache import normalize_text
+from core.llm import model_mapper
+
+CONFIG_JSON = load_config()
+RESPONSE_CACHE = CONFIG_JSON.get("response_cache", {})
+
+
+class ResponseCache:
+    """
+    Caché de respuestas completas de `/generate_sql` por coincidencia exacta.
+
+    La llave combina la pregunta normalizada, el dominio, la versión de las plantillas
+    de prompt del dominio y los modelos del pipeline, por lo que editar un prompt o
+    cambiar de modelo deja de reutilizar respuestas anteriores.
+
+    Args:
+        models (list): Modelos usados por el pipeline.
+        max_entries (int): Máximo de respuestas guardadas (se descartan las menos usadas).
+        ttl_s (float): Vigencia de cada respuesta en segundos.
+        enabled (bool): Activa o desactiva el caché.
+    """
+
+    def __init__(self, models: list, max_entries: int = 1000, ttl_s: float = 300, enabled: bool = True):
+        self.models = "|".join(model_mapper(model) for model in models)
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        self._prompt_versions = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def key_for(self, question: str, domain: str) -> str:
+        prompt_version = get_prompt_version(domain)
+        with self._lock:
+            # Si cambió algún prompt del dominio, sus respuestas previas ya no sirven
+            previous = self._prompt_versions.get(domain)
+            if previous is not None and previous != prompt_version:
+                self._drop_domain(domain)
+            self._prompt_versions[domain] = prompt_version
+
+        normalized = normalize_text(question).casefold()
+        raw_key = "\x1f".join([normalized, domain, prompt_version, self.models])
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry["stored_at"] > self.ttl_s:
+                if entry is not None:
+                    del self._entries[key]
+                self._stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry["response"]
+
+    def put(self, key: str, domain: str, response: dict):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._entries[key] = {"domain": domain, "response": response, "stored_at": time.time()}
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _drop_domain(self, domain: str):
+        for key in [k for k, entry in self._entries.items() if entry["domain"] == domain]:
+            del self._entries[key]
+        self._stats["invalidations"] += 1
+
+    def invalidate(self, domain: str = None):
+        """Descarta las respuestas guardadas de un dominio, o todas si no se indica."""
+        with self._lock:
+            if domain is None:
+                self._entries.clear()
+                self._stats["invalidations"] += 1
+            else:
+                self._drop_domain(domain)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+response_cache = ResponseCache(
+    models=RESPONSE_CACHE.get("models", ["gemma", "mistral"]),
+    max_entries=RESPONSE_CACHE.get("max_entries", 1000),
+    ttl_s=RESPONSE_CACHE.get("ttl_s", 300),
+    enabled=RESPONSE_CACHE.get("enabled", True)
+)
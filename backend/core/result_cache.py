@@ -0,0 +1,151 @@
+# backend/core/result_cache.py
+
+import sys
+import os
+import re
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+import sqlglot
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.utils import load_config
+from core.concurrency import submit_blocking
+
+logger = logging.getLogger("result_cache")
+
+CONFIG_JSON = load_config()
+RESULT_CACHE = CONFIG_JSON.get("result_cache", {})
+
+
+def canonicalize_sql(sql: str) -> str:
+    """
+    Forma canónica de una consulta para usarla como llave: sin comentarios,
+    con espacios y mayúsculas normalizados por sqlglot.
+    Si sqlglot no puede parsearla se usa el texto con espacios colapsados.
+    """
+    try:
+        return sqlglot.parse_one(sql, read="postgres").sql(dialect="postgres", normalize=True, comments=False)
+    except Exception:
+        return re.sub(r"\s+", " ", sql).strip().rstrip(";")
+
+
+class ResultCache:
+    """
+    Caché de resultados de `execute_sql` con TTL por dominio, límite en bytes y
+    stale-while-revalidate: pasado el TTL, el resultado se sigue sirviendo durante
+    `stale_ttl_s` mientras se refresca en segundo plano.
+
+    Args:
+        max_bytes (int): Tamaño máximo aproximado de los resultados guardados.
+        ttl_by_domain (dict): Vigencia en segundos por dominio.
+        default_ttl_s (float): Vigencia para dominios sin TTL propio.
+        stale_ttl_s (float): Ventana adicional en la que se sirve el resultado vencido.
+        enabled (bool): Activa o desactiva el caché.
+    """
+
+    def __init__(self, max_bytes: int, ttl_by_domain: dict = None, default_ttl_s: float = 60,
+                 stale_ttl_s: float = 300, enabled: bool = True):
+        self.max_bytes = max_bytes
+        self.ttl_by_domain = ttl_by_domain or {}
+        self.default_ttl_s = default_ttl_s
+        self.stale_ttl_s = stale_ttl_s
+        self.enabled = enabled
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0, "evictions": 0}
+
+    @staticmethod
+    def key_for(sql: str, domain: str) -> tuple:
+        return domain, canonicalize_sql(sql)
+
+    def get(self, key: tuple):
+        """
+        Returns:
+            tuple: (resultado o None, estado "fresh" | "stale" | "miss").
+        """
+        if not self.enabled:
+            return None, "miss"
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = time.time() - entry["stored_at"]
+                ttl = self.ttl_by_domain.get(key[0], self.default_ttl_s)
+                if age <= ttl:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry["result"], "fresh"
+                if age <= ttl + self.stale_ttl_s:
+                    self._entries.move_to_end(key)
+                    self._stats["stale_hits"] += 1
+                    return entry["result"], "stale"
+                self._remove(key)
+            self._stats["misses"] += 1
+            return None, "miss"
+
+    def put(self, key: tuple, result: dict):
+        if not self.enabled or "error" in result:
+            return
+
+        size = len(json.dumps(result, default=str))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {"result": result, "size": size, "stored_at": time.time()}
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key)
+        self._bytes -= entry["size"]
+
+    def refresh_in_background(self, key: tuple, run_query):
+        """
+        Vuelve a ejecutar la consulta en el pool de base de datos, una sola vez por llave.
+
+        Args:
+            key (tuple): Llave del resultado vencido.
+            run_query (callable): Función sin argumentos que devuelve (resultado, duración).
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+            self._stats["refreshes"] += 1
+
+        def refresh():
+            try:
+                result, _ = run_query()
+                self.put(key, result)
+            except Exception as e:
+                logger.warning(f"⚠️ No se pudo refrescar el resultado en caché: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        submit_blocking("db", refresh)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        return stats
+
+
+result_cache = ResultCache(
+    max_bytes=int(RESULT_CACHE.get("max_mb", 64) * 1024 * 1024),
+    ttl_by_domain=RESULT_CACHE.get("ttl_s", {}),
+    default_ttl_s=RESULT_CACHE.get("default_ttl_s", 60),
+    stale_ttl_s=RESULT_CACHE.get("stale_ttl_s", 300),
+    enabled=RESULT_CACHE.get("enabled", True)
+)
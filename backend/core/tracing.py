@@ -0,0 +1,225 @@
+# backend/core/tracing.py
+
+import sys
+import os
+import json
+import time
+import uuid
+import random
+import asyncio
+import contextvars
+from pathlib import Path
+from contextlib import contextmanager
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from shared.utils import load_config, get_log_writer
+
+CONFIG_JSON = load_config()
+TRACING = CONFIG_JSON.get("tracing", {})
+ROOT_PATH = Path(__file__).resolve().parent.parent.parent
+SERVICE_NAME = TRACING.get("service_name", "sql-agent")
+
+# Span activo de la tarea/hilo actual; los hijos se enlazan a él
+_current_span = contextvars.ContextVar("trace_span", default=None)
+
+
+def _trace_file() -> str:
+    path = TRACING.get("path", "outputs/traces/spans.jsonl")
+    return path if os.path.isabs(path) else str(ROOT_PATH / path)
+
+
+class Span:
+    """
+    Intervalo de trabajo dentro de una traza. Los campos siguen los nombres de OTLP/JSON
+    (traceId, spanId, parentSpanId, startTimeUnixNano, ...) para poder importarlos a
+    un colector; los atributos se guardan como un objeto plano.
+    """
+
+    def __init__(self, name: str, trace_id: str, parent_id: str = None, request_id: str = None,
+                 sampled: bool = True, attributes: dict = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.request_id = request_id
+        self.sampled = sampled
+        self.attributes = dict(attributes or {})
+        self.status, self.status_message = "OK", ""
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def set_error(self, message: str):
+        self.status, self.status_message = "ERROR", message
+
+    def end(self):
+        self.end_ns = time.time_ns()
+        if self.sampled:
+            get_log_writer().write(_trace_file(), json.dumps(self.to_dict(), ensure_ascii=False, default=str) + "\n", rotate=True)
+
+    def to_dict(self) -> dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round((self.end_ns - self.start_ns) / 1e6, 3) if self.end_ns else None,
+            "attributes": {**self.attributes, "request_id": self.request_id},
+            "status": {"code": self.status, "message": self.status_message},
+            "resource": {"service.name": SERVICE_NAME, "process.pid": os.getpid()}
+        }
+
+
+class _NoopSpan:
+    # Fuera de una traza (o sin muestreo) las llamadas a `span()` no registran nada
+    trace_id = None
+    request_id = None
+    sampled = False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def set_error(self, message):
+        pass
+
+    def end(self):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def trace_id_for(request_id: str) -> str:
+    """El request_id (uuid4) ya es un id de traza válido de 32 caracteres hex; así ambos se correlacionan."""
+    try:
+        return uuid.UUID(str(request_id)).hex
+    except ValueError:
+        return uuid.uuid4().hex
+
+
+@contextmanager
+def _activate(span: Span):
+    token = _current_span.set(span)
+    try:
+        yield span
+    except asyncio.CancelledError:
+        span.set_error("cancelled")
+        raise
+    except BaseException as e:
+        span.set_error(f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current_span.reset(token)
+        span.end()
+
+
+@contextmanager
+def start_trace(name: str, request_id: str, **attributes):
+    """
+    Abre el span raíz de una petición. Todo `span()` abierto dentro del mismo contexto
+    (incluidas tareas creadas y funciones enviadas con `run_blocking`) queda enlazado a él.
+
+    Args:
+        name (str): Nombre del span raíz (normalmente el endpoint).
+        request_id (str): Id de la petición; determina el id de la traza.
+        **attributes: Atributos iniciales del span.
+    """
+    if not TRACING.get("enabled", True):
+        yield _NOOP
+        return
+    sampled = random.random() < TRACING.get("sample_rate", 1.0)
+    root = Span(name, trace_id_for(request_id), request_id=request_id, sampled=sampled, attributes=attributes)
+    with _activate(root):
+        yield root
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Abre un span hijo del span activo; sin traza activa no registra nada."""
+    parent = _current_span.get()
+    if parent is None or not parent.sampled:
+        yield _NOOP
+        return
+    child = Span(name, parent.trace_id, parent.span_id, parent.request_id, True, attributes)
+    with _activate(child):
+        yield child
+
+
+def start_span(name: str, **attributes):
+    """
+    Crea un span hijo sin activarlo; quien lo crea debe llamar `end()`.
+    Sirve en generadores asíncronos, donde cambiar la variable de contexto entre `yield`s
+    afectaría al código que los consume.
+    """
+    parent = _current_span.get()
+    if parent is None or not parent.sampled:
+        return _NOOP
+    return Span(name, parent.trace_id, parent.span_id, parent.request_id, True, attributes)
+
+
+def current_span():
+    return _current_span.get() or _NOOP
+
+
+def current_trace_id() -> str:
+    return current_span().trace_id
+
+
+def current_request_id() -> str:
+    return current_span().request_id
+
+
+def load_trace(trace_id: str, path: str = None) -> list:
+    """Spans de una traza leídos del archivo de salida, ordenados por inicio."""
+    spans = []
+    with open(path or _trace_file(), "r", encoding="utf-8") as f:
+        for line in f:
+            if trace_id not in line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("traceId") == trace_id:
+                spans.append(record)
+    return sorted(spans, key=lambda record: record["startTimeUnixNano"])
+
+
+def format_trace(spans: list) -> str:
+    """Árbol de spans con desfase y duración en milisegundos."""
+    if not spans:
+        return "(sin spans)"
+    children = {}
+    for record in spans:
+        children.setdefault(record["parentSpanId"], []).append(record)
+    known = {record["spanId"] for record in spans}
+    roots = [record for record in spans if record["parentSpanId"] not in known]
+    origin = min(record["startTimeUnixNano"] for record in spans)
+
+    lines = []
+
+    def walk(record, depth):
+        offset = (record["startTimeUnixNano"] - origin) / 1e6
+        status = "" if record["status"]["code"] == "OK" else f"  ⚠️ {record['status']['message']}"
+        attributes = {k: v for k, v in record["attributes"].items() if k != "request_id"}
+        lines.append(f"{'  ' * depth}{record['name']:<{32 - 2 * depth}} +{offset:9.1f} ms {record['durationMs']:9.1f} ms  {attributes}{status}")
+        for child in children.get(record["spanId"], []):
+            walk(child, depth + 1)
+
+    for root in roots:
+        walk(root, 0)
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # Uso: python core/tracing.py <trace_id | request_id>
+    print(format_trace(load_trace(trace_id_for(sys.argv[1]))))
@@ -0,0 +1,275 @@
+# backend/core/vector_write_buffer.py
+
+import os
+import json
+import math
+import time
+import logging
+import threading
+
+logger = logging.getLogger("vector_write_buffer")
+
+
+def _cosine(a: list, b: list) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class VectorWriteBuffer:
+    """
+    Buffer de escritura diferida para el vector store.
+
+    `enqueue` confirma la escritura en cuanto las filas quedan en memoria; un hilo
+    en segundo plano las inserta agrupadas por colección con un único flush cuando
+    se alcanza `max_rows` o `max_delay_s`. Las filas pendientes (y las recién escritas
+    durante `grace_period_s`) pueden consultarse con `search` para leer lo propio.
+
+    Un lote que falla vuelve a la cola con espera exponencial; las filas que agotan
+    `max_retries` se intentan una por una y las que siguen fallando (o las que no se
+    pudieron escribir al apagar) se registran en `dead_letter_path` en vez de perderse.
+
+    Args:
+        write_rows (callable): Función `(collection_name, fields) -> dict` que inserta y hace flush.
+        max_rows (int): Filas pendientes por colección que disparan la escritura.
+        max_delay_s (float): Antigüedad máxima de una fila pendiente antes de escribirse.
+        grace_period_s (float): Tiempo que las filas escritas siguen visibles en `search`.
+        max_retries (int): Intentos por fila antes de enviarla a dead-letter.
+        retry_backoff_s (float): Espera tras el primer fallo (se duplica en cada intento, máximo 60 seg.).
+        dead_letter_path (str): Archivo JSONL para las filas que no se pudieron escribir.
+    """
+
+    def __init__(self, write_rows, max_rows: int = 500, max_delay_s: float = 2.0, grace_period_s: float = 10.0,
+                 max_retries: int = 5, retry_backoff_s: float = 1.0, dead_letter_path: str = None):
+        self._write_rows = write_rows
+        self.max_rows = max_rows
+        self.max_delay_s = max_delay_s
+        self.grace_period_s = grace_period_s
+        self.max_retries = max_retries
+        self.retry_backoff_s = retry_backoff_s
+        self.dead_letter_path = dead_letter_path
+        # Filas como (encolada_en, fila, intentos fallidos)
+        self._pending = {}
+        self._in_flight = {}
+        self._recent = {}
+        self._retry_at = {}
+        self._condition = threading.Condition()
+        self._dead_letter_lock = threading.Lock()
+        self._thread = None
+        self._stopped = False
+        self._stats = {"enqueued": 0, "written": 0, "flushes": 0, "failures": 0, "dead_lettered": 0}
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="vector-write-buffer", daemon=True)
+            self._thread.start()
+
+    def enqueue(self, collection_name: str, rows: list) -> int:
+        """
+        Encola filas para escritura diferida.
+
+        Args:
+            collection_name (str): Colección destino.
+            rows (list): Filas como diccionarios `{campo: valor}` en el orden del esquema.
+
+        Returns:
+            int: Filas pendientes de la colección tras encolar.
+        """
+        now = time.time()
+        with self._condition:
+            self._ensure_started()
+            pending = self._pending.setdefault(collection_name, [])
+            pending.extend((now, row, 0) for row in rows)
+            self._stats["enqueued"] += len(rows)
+            if len(pending) >= self.max_rows:
+                self._condition.notify()
+            return len(pending)
+
+    def _due_collections(self, now: float, force: bool) -> list:
+        return [
+            name for name, pending in self._pending.items()
+            if pending and (force or (
+                now >= self._retry_at.get(name, 0)
+                and (len(pending) >= self.max_rows or now - pending[0][0] >= self.max_delay_s)
+            ))
+        ]
+
+    @staticmethod
+    def _columns(rows: list) -> list:
+        return [[row[name] for row in rows] for name in rows[0]]
+
+    def _write(self, collection_name: str, final: bool = False):
+        """
+        Escribe las filas pendientes de la colección. Con `final` (al apagar) no hay reintentos:
+        lo que falle va directo a dead-letter.
+        """
+        with self._condition:
+            batch = self._pending.pop(collection_name, [])
+            if not batch:
+                return
+            self._in_flight.setdefault(collection_name, []).extend(batch)
+
+        rows = [row for _, row, _ in batch]
+        try:
+            self._write_rows(collection_name, self._columns(rows))
+        except Exception as e:
+            with self._condition:
+                self._remove_in_flight(collection_name, batch)
+                self._stats["failures"] += 1
+            self._handle_failure(collection_name, batch, e, final)
+            return
+
+        with self._condition:
+            self._remove_in_flight(collection_name, batch)
+            self._retry_at.pop(collection_name, None)
+            self._mark_written(collection_name, rows)
+
+    def _mark_written(self, collection_name: str, rows: list):
+        # Se llama con el lock tomado
+        written_at = time.time()
+        self._recent.setdefault(collection_name, []).extend((written_at, row) for row in rows)
+        self._stats["written"] += len(rows)
+        self._stats["flushes"] += 1
+
+    def _handle_failure(self, collection_name: str, batch: list, error: Exception, final: bool):
+        failed = [(enqueued_at, row, attempts + 1) for enqueued_at, row, attempts in batch]
+        if final:
+            self._dead_letter(collection_name, failed, error)
+            return
+
+        exhausted = [item for item in failed if item[2] >= self.max_retries]
+        retry = [item for item in failed if item[2] < self.max_retries]
+        if exhausted:
+            # Aísla la fila culpable para no descartar las válidas que venían en el mismo lote
+            exhausted = self._write_one_by_one(collection_name, exhausted)
+            self._dead_letter(collection_name, exhausted, error)
+
+        if retry:
+            attempts = max(item[2] for item in retry)
+            delay = min(self.retry_backoff_s * 2 ** (attempts - 1), 60.0)
+            with self._condition:
+                self._pending[collection_name] = retry + self._pending.get(collection_name, [])
+                self._retry_at[collection_name] = time.time() + delay
+            logger.error(f"❌ Falló la escritura diferida en '{collection_name}' (intento {attempts}/{self.max_retries}), "
+                         f"se reintentará en {delay:.1f} seg.: {error}")
+
+    def _write_one_by_one(self, collection_name: str, items: list) -> list:
+        """Escribe cada fila por separado; devuelve las que siguen fallando."""
+        still_failing = []
+        for item in items:
+            try:
+                self._write_rows(collection_name, self._columns([item[1]]))
+            except Exception:
+                still_failing.append(item)
+                continue
+            with self._condition:
+                self._mark_written(collection_name, [item[1]])
+        return still_failing
+
+    def _dead_letter(self, collection_name: str, items: list, error: Exception):
+        if not items:
+            return
+        with self._condition:
+            self._stats["dead_lettered"] += len(items)
+        logger.error(f"❌ {len(items)} filas de '{collection_name}' no se pudieron escribir y se envían a dead-letter "
+                     f"({self.dead_letter_path or 'sin archivo configurado'}): {error}")
+        if not self.dead_letter_path:
+            for _, row, _ in items:
+                logger.error(f"   ↳ fila descartada: {row.get('question')!r}")
+            return
+
+        failed_at = time.strftime("%Y-%m-%dT%H:%M:%S")
+        lines = "".join(
+            json.dumps({
+                "collection": collection_name,
+                "failed_at": failed_at,
+                "attempts": attempts,
+                "error": str(error),
+                "row": row
+            }, ensure_ascii=False, default=str) + "\n"
+            for _, row, attempts in items
+        )
+        try:
+            with self._dead_letter_lock:
+                os.makedirs(os.path.dirname(os.path.abspath(self.dead_letter_path)), exist_ok=True)
+                with open(self.dead_letter_path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+        except OSError as e:
+            logger.error(f"❌ No se pudo escribir el archivo dead-letter '{self.dead_letter_path}': {e}")
+            for _, row, _ in items:
+                logger.error(f"   ↳ fila descartada: {row.get('question')!r}")
+
+    def _remove_in_flight(self, collection_name: str, batch: list):
+        in_flight = self._in_flight.get(collection_name, [])
+        ids = {id(item) for item in batch}
+        self._in_flight[collection_name] = [item for item in in_flight if id(item) not in ids]
+
+    def _expire_recent(self, now: float):
+        for name, rows in self._recent.items():
+            self._recent[name] = [(t, row) for t, row in rows if now - t < self.grace_period_s]
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait(timeout=self.max_delay_s / 2 or 0.1)
+                now = time.time()
+                self._expire_recent(now)
+                stopped = self._stopped
+                due = self._due_collections(now, force=stopped)
+            for collection_name in due:
+                self._write(collection_name, final=stopped)
+            if stopped:
+                return
+
+    def flush(self, collection_name: str = None, final: bool = False):
+        """Escribe de inmediato las filas pendientes (de una colección o de todas), sin esperar el backoff."""
+        with self._condition:
+            names = [collection_name] if collection_name else list(self._pending)
+        for name in names:
+            self._write(name, final=final)
+
+    def stop(self):
+        """
+        Detiene el hilo escribiendo antes todo lo pendiente (usar al apagar la app).
+        Lo que no se pueda escribir queda en dead-letter.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+        self.flush(final=True)
+
+    def search(self, collection_name: str, query_embedding: list, output_fields: list, top_k: int,
+               threshold: float, embedding_field: str = "embedding") -> list:
+        """
+        Busca por similitud coseno en las filas aún no visibles en el vector store.
+
+        Returns:
+            list: Hits con el mismo formato que `search_collection` (`id` = None).
+        """
+        with self._condition:
+            rows = [row for _, row, _ in self._pending.get(collection_name, [])]
+            rows += [row for _, row, _ in self._in_flight.get(collection_name, [])]
+            rows += [row for _, row in self._recent.get(collection_name, [])]
+
+        hits = []
+        for row in rows:
+            score = _cosine(query_embedding, row[embedding_field])
+            if score >= threshold:
+                entity = {field: row.get(field) for field in output_fields}
+                hits.append({**entity, "score": score, "id": None})
+
+        hits.sort(key=lambda hit: hit["score"], reverse=True)
+        return hits[:top_k]
+
+    def stats(self) -> dict:
+        with self._condition:
+            stats = dict(self._stats)
+            stats["pending"] = {name: len(rows) for name, rows in self._pending.items() if rows}
+            stats["retrying"] = {
+                name: max(attempts for _, _, attempts in rows)
+                for name, rows in self._pending.items() if rows and rows[0][2]
+            }
+        return stats
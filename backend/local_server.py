@@ -1,4 +1,4 @@
-import uvicorn
-
-if __name__ == "__main__":
-    uvicorn.run( "main:app", host="0.0.0.0", port=8000, reload=True)
+import uvicorn
+
+if __name__ == "__main__":
+    uvicorn.run( "main:app", host="0.0.0.0", port=8000, reload=True)
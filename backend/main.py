@@ -3,23 +3,49 @@
 from pymilvus import connections, Collection
 import sys
 import os
+import time
+import json
+import asyncio
+import itertools
 import requests
+from typing import Literal
 from fastapi import FastAPI,  HTTPException, Request, UploadFile, File
-from pydantic import BaseModel
-from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ValidationError
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from agent.sql_agent import handle_user_question
-from agent.rag_agent import generate_embedding, save_collection
-from shared.utils import init_config, generate_request_id, log_to_file, log_event, load_config
+from agent.sql_agent import handle_user_question_async
+from agent.rag_agent import (
+    generate_embedding_async,
+    generate_embeddings_async,
+    save_collection,
+    save_collection_bulk,
+    validate_training_row,
+    embedding_batcher,
+    vector_write_buffer
+)
+from shared.utils import init_config, generate_request_id, log_to_file, log_event, load_config, get_prompt_version, get_log_writer, get_event_store
+from shared.prompt_registry import prompt_registry
+from shared.app_config import reload_config, ConfigError
 from core.query_validator import validate_sql_query
-from core.query_executor import execute_sql
+from core.query_executor import execute_sql_async, fetch_page_async, stream_query
 from core.init_collections import init_milvus_collections
+from core.milvus_registry import milvus_registry
+from core.http_client import close_clients, close_async_clients, get_pool_stats
+from core.concurrency import run_blocking, shutdown_executors
+from core.embedding_cache import embedding_cache
+from core.response_cache import response_cache
+from core.result_cache import result_cache
+from core.db_pool import get_db_pool_stats, close_pools
+from core.metrics import MetricsMiddleware, render_metrics
+from core.tracing import start_trace
 from core.exceptions import (
     InvalidCollectionTypeError,
+    InvalidTrainingDataError,
     EmbeddingServiceError,
     SQLExecutionError,
-    SQLValidationError
+    SQLValidationError,
+    InvalidPageTokenError
 )
 
 init_config()
@@ -30,6 +56,8 @@ MILVUS_HOST = MILVUS_ENDPOINT["host"]
 MILVUS_PORT = MILVUS_ENDPOINT["port"]
 EMBEDDING_ENDPOINT = CONFIG_JSON["embedding_endpoint"]
 COLLECTIONS_NAME = MILVUS_ENDPOINT["collections"]
+TRAINING_BULK = CONFIG_JSON.get("training_bulk", {})
+GENERATE_SQL_STREAM = CONFIG_JSON.get("generate_sql_stream", {})
 
 init_milvus_collections(MILVUS_HOST, MILVUS_PORT, False)
 
@@ -38,10 +66,27 @@ app = FastAPI(
     description="Agente que genera consultas SQL a partir de preguntas en lenguaje natural usando modelos multi-inferencia.",
     version="1.0.0"
 )
+app.add_middleware(MetricsMiddleware)
+
+@app.on_event("startup")
+async def startup():
+    await run_blocking("milvus", milvus_registry.warm_up)
+
+@app.on_event("shutdown")
+async def shutdown():
+    vector_write_buffer.stop()
+    await close_async_clients()
+    close_clients()
+    close_pools()
+    embedding_cache.close()
+    get_event_store().close()
+    get_log_writer().close()
+    shutdown_executors(wait=False)
 
 class SQLRequest(BaseModel):
     question: str
     domain: str
+    pipeline_mode: Literal["serial", "speculative"] = None
 
 class TrainingInput(BaseModel):
     question: str
@@ -50,66 +95,301 @@ class TrainingInput(BaseModel):
 
 class SQLExecute(BaseModel):
     sql: str
+    domain: str = "tickets"
+    use_cache: bool = True
+    confirm: bool = False
+
+class SQLPage(BaseModel):
+    sql: str
+    domain: str = "tickets"
+    page_token: str = None
+    page_size: int = None
+    confirm: bool = False
 
 @app.get("/health")
 def health_check():
     return {"status": "ok", "message": "Agente SQL IA funcionando correctamente"}
 
+@app.get("/stats")
+def stats():
+    return {
+        "http_pools": get_pool_stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "embedding_batching": embedding_batcher.stats(),
+        "vector_write_buffer": vector_write_buffer.stats(),
+        "milvus": milvus_registry.status(),
+        "response_cache": response_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "db_pools": get_db_pool_stats(),
+        "prompts": prompt_registry.stats(),
+        "log_writer": get_log_writer().stats(),
+        "event_store": get_event_store().stats()
+    }
+
+@app.get("/metrics")
+def metrics():
+    # Formato de texto de exposición de Prometheus
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/events")
+async def list_events(status: str = None, domain: str = None, since: str = None, until: str = None,
+                      request_id: str = None, search: str = None, tag: str = None,
+                      limit: int = 100, offset: int = 0, full: bool = False):
+    events = await run_blocking(
+        "db", get_event_store().query,
+        status=status, domain=domain, since=since, until=until, request_id=request_id,
+        search=search, tag=tag, limit=min(limit, 1000), offset=offset, full=full
+    )
+    return {"events": events, "count": len(events), "offset": offset}
+
+@app.get("/events/summary")
+async def events_summary(since: str = None, until: str = None, domain: str = None):
+    return {"summary": await run_blocking("db", get_event_store().summary, since=since, until=until, domain=domain)}
+
+@app.post("/config/reload")
+def config_reload():
+    """Relee la configuración; solo acepta cambios en las secciones recargables (ver `RELOADABLE_KEYS`)."""
+    try:
+        config = reload_config()
+    except ConfigError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "OK", "path": str(config.path), "loaded_at": config.loaded_at, "overrides": sorted(config.overrides)}
+
+@app.post("/cache/invalidate")
+def invalidate_cache(domain: str = None):
+    response_cache.invalidate(domain)
+    return {"status": "OK", "domain": domain or "all"}
+
 @app.post("/generate_sql")
 async def generate_sql(request: SQLRequest, http_request: Request):
 
     client_ip = http_request.client.host
     request_id = generate_request_id()
 
-    try:
-        log_to_file(f"API Request {request_id} desde {client_ip} | Pregunta: {request.question} | Dominio: {request.domain}", api=True)
+    with start_trace("generate_sql", request_id, domain=request.domain, client_ip=client_ip) as trace:
+        try:
+            log_to_file(f"API Request {request_id} desde {client_ip} | Pregunta: {request.question} | Dominio: {request.domain}", api=True)
 
-        sql, result_exec, flow, reformulation, total_time_ia, return_type, rag_context = handle_user_question(
-            request.question, 
-            domain=request.domain
-            )
+            cache_key = response_cache.key_for(request.question, request.domain)
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                log_event(
+                    request_id=request_id,
+                    client_ip=client_ip,
+                    user_question=request.question,
+                    reformulation=cached["reformulation"],
+                    flow=cached["flow"],
+                    generated_sql=cached["sql"],
+                    result=cached["result"],
+                    type_result="success",
+                    model="mistral & gemma",
+                    domain=request.domain,
+                    duration=0,
+                    tags=["cache:hit"],
+                    path=cached["path"]
+                )
+                trace.set_attribute("cache", "hit")
+                return {**cached, "client_ip": client_ip, "request_id": request_id, "trace_id": trace.trace_id, "cache": "hit"}
+
+            sql, result_exec, flow, reformulation, total_time_ia, return_type, rag_context, meta = await handle_user_question_async(
+                request.question, 
+                domain=request.domain,
+                mode=request.pipeline_mode
+                )
                 
-        log_event(
-            request_id=request_id,
-            client_ip=client_ip,
-            user_question=request.question,
-            reformulation=reformulation,
-            flow=flow,
-            generated_sql=sql,
-            result=result_exec,
-            type_result=return_type,
-            model="mistral & gemma",
-            domain=request.domain,
-            duration=total_time_ia
-        )
+            log_event(
+                request_id=request_id,
+                client_ip=client_ip,
+                user_question=request.question,
+                reformulation=reformulation,
+                flow=flow,
+                generated_sql=sql,
+                result=result_exec,
+                type_result=return_type,
+                model="mistral & gemma",
+                domain=request.domain,
+                duration=total_time_ia,
+                tags=[f"pipeline:{meta['pipeline_mode']}", f"reformulation:{meta['reformulation']['decision']}"],
+                path=meta["path"],
+                prompt_version=get_prompt_version(request.domain)
+            )
 
-        return {
-            "sql": sql,
-            "flow": flow,
-            "reformulation": reformulation,
-            "client_ip": client_ip,
-            "domain": request.domain,
-            "request_id": request_id,
-            "duration_agent": total_time_ia,
-            "result": result_exec,
-            "rag_context": rag_context
-        }
+            response = {
+                "sql": sql,
+                "flow": flow,
+                "reformulation": reformulation,
+                "client_ip": client_ip,
+                "domain": request.domain,
+                "request_id": request_id,
+                "trace_id": trace.trace_id,
+                "duration_agent": total_time_ia,
+                "result": result_exec,
+                "rag_context": rag_context,
+                "path": meta["path"],
+                "pipeline_mode": meta["pipeline_mode"],
+                "timings": meta["timings"],
+                "reformulation_policy": meta["reformulation"],
+                "cache": "miss"
+            }
+            trace.set_attributes(cache="miss", path=meta["path"], pipeline_mode=meta["pipeline_mode"], outcome=return_type)
+            if return_type == "success":
+                response_cache.put(cache_key, request.domain, response)
+
+            return response
   
-    except Exception as e:
-        log_event(
-            request_id=request_id,
-            client_ip=client_ip,
-            user_question=request.question,
-            reformulation="",
-            flow="",
-            generated_sql="",
-            result={"error": str(e)},
-            type_result="fails",
-            model="mistral & gemma",
-            domain=request.domain,
-            duration=0
-        )        
-        raise HTTPException(status_code=500, detail=str(e))
+        except Exception as e:
+            log_event(
+                request_id=request_id,
+                client_ip=client_ip,
+                user_question=request.question,
+                reformulation="",
+                flow="",
+                generated_sql="",
+                result={"error": str(e)},
+                type_result="fails",
+                model="mistral & gemma",
+                domain=request.domain,
+                duration=0
+            )        
+            raise HTTPException(status_code=500, detail=str(e))
+
+def _sse(event) -> str:
+    data = event if isinstance(event, str) else json.dumps(event, ensure_ascii=False, default=str)
+    return f"data: {data}\n\n"
+
+@app.post("/generate_sql_stream")
+async def generate_sql_stream(request: SQLRequest, http_request: Request):
+    """
+    Igual que /generate_sql, pero como Server-Sent Events: eventos por etapa, tokens de los
+    modelos conforme llegan y, al final, el resultado seguido de páginas adicionales.
+    """
+    client_ip = http_request.client.host
+    request_id = generate_request_id()
+    log_to_file(f"API Stream Request {request_id} desde {client_ip} | Pregunta: {request.question} | Dominio: {request.domain}", api=True)
+
+    queue = asyncio.Queue()
+
+    async def emit(event: dict):
+        await queue.put(event)
+
+    async def run_pipeline():
+        with start_trace("generate_sql_stream", request_id, domain=request.domain, client_ip=client_ip) as trace:
+            try:
+                await emit({"stage": "start", "request_id": request_id, "trace_id": trace.trace_id, "message": "Procesando pregunta..."})
+
+                cache_key = response_cache.key_for(request.question, request.domain)
+                cached = response_cache.get(cache_key)
+                if cached is not None:
+                    for stage, field in (("reformulation", "reformulation"), ("flow", "flow"), ("sql", "sql")):
+                        await emit({"stage": stage, "content": cached[field]})
+                    await emit({"stage": "result", "content": cached["result"], "cache": "hit"})
+                    log_event(
+                        request_id=request_id,
+                        client_ip=client_ip,
+                        user_question=request.question,
+                        reformulation=cached["reformulation"],
+                        flow=cached["flow"],
+                        generated_sql=cached["sql"],
+                        result=cached["result"],
+                        type_result="success",
+                        model="mistral & gemma",
+                        domain=request.domain,
+                        duration=0,
+                        tags=["cache:hit", "stream"],
+                        path=cached["path"]
+                    )
+                    trace.set_attribute("cache", "hit")
+                    await emit({"stage": "done", "total_time": 0})
+                    return
+
+                sql, result_exec, flow, reformulation, total_time_ia, return_type, rag_context, meta = await handle_user_question_async(
+                    request.question,
+                    domain=request.domain,
+                    emit=emit,
+                    mode=request.pipeline_mode
+                )
+                await emit({"stage": "result", "content": result_exec, "cache": "miss"})
+
+                # Páginas adicionales después de la vista previa, hasta `result_pages`
+                page_token = result_exec.get("next_page_token")
+                for _ in range(GENERATE_SQL_STREAM.get("result_pages", 0)):
+                    if not page_token:
+                        break
+                    page, _ = await fetch_page_async(sql, request.domain, page_token)
+                    if "error" in page:
+                        break
+                    await emit({"stage": "result_page", "content": page})
+                    page_token = page["next_page_token"]
+
+                log_event(
+                    request_id=request_id,
+                    client_ip=client_ip,
+                    user_question=request.question,
+                    reformulation=reformulation,
+                    flow=flow,
+                    generated_sql=sql,
+                    result=result_exec,
+                    type_result=return_type,
+                    model="mistral & gemma",
+                    domain=request.domain,
+                    duration=total_time_ia,
+                    tags=["stream", f"pipeline:{meta['pipeline_mode']}", f"reformulation:{meta['reformulation']['decision']}"],
+                    path=meta["path"],
+                    prompt_version=get_prompt_version(request.domain)
+                )
+                if return_type == "success":
+                    response_cache.put(cache_key, request.domain, {
+                        "sql": sql,
+                        "flow": flow,
+                        "reformulation": reformulation,
+                        "domain": request.domain,
+                        "duration_agent": total_time_ia,
+                        "result": result_exec,
+                        "rag_context": rag_context,
+                        "path": meta["path"]
+                    })
+                trace.set_attributes(cache="miss", path=meta["path"], pipeline_mode=meta["pipeline_mode"], outcome=return_type)
+                await emit({"stage": "done", "total_time": total_time_ia, "path": meta["path"], "timings": meta["timings"]})
+
+            except Exception as e:
+                log_event(
+                    request_id=request_id,
+                    client_ip=client_ip,
+                    user_question=request.question,
+                    reformulation="",
+                    flow="",
+                    generated_sql="",
+                    result={"error": str(e)},
+                    type_result="fails",
+                    model="mistral & gemma",
+                    domain=request.domain,
+                    duration=0,
+                    tags=["stream"]
+                )
+                trace.set_error(str(e))
+                await emit({"stage": "error", "message": str(e)})
+            finally:
+                await queue.put(None)
+
+    async def event_source():
+        task = asyncio.create_task(run_pipeline())
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield _sse(event)
+            yield _sse("[DONE]")
+        finally:
+            # Si el cliente se desconecta, se cancela el pipeline pendiente
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.post("/execute_sql")
 async def try_execute_sql(payload: SQLExecute):
@@ -118,8 +398,22 @@ async def try_execute_sql(payload: SQLExecute):
         if not is_valid:
             raise SQLValidationError(msg)
         
-        result, duration = execute_sql(payload.sql, domain="tickets")
-        
+        with start_trace("execute_sql", generate_request_id(), domain=payload.domain) as trace:
+            result, duration = await execute_sql_async(
+                payload.sql, domain=payload.domain, use_cache=payload.use_cache, confirmed=payload.confirm
+            )
+
+        if result.get("too_expensive"):
+            return JSONResponse(
+                status_code=409,
+                content={
+                    "success": False,
+                    "error": result["error"],
+                    "result": result,
+                    "message": "La consulta excede el costo permitido para el dominio"
+                }
+            )
+
         if "error" in result:
             raise SQLExecutionError(result["error"])
                 
@@ -127,6 +421,7 @@ async def try_execute_sql(payload: SQLExecute):
             "success": True,
             "result": result,
             "duration": duration,
+            "trace_id": trace.trace_id,
             "message": msg
         }
 
@@ -159,32 +454,189 @@ async def try_execute_sql(payload: SQLExecute):
                 "message": "Ocurrió un error inesperado durante la ejecución"
             }
         )    
-    
 
 
+@app.post("/execute_sql/page")
+async def execute_sql_page(payload: SQLPage):
+    is_valid, _, msg = validate_sql_query(payload.sql)
+    if not is_valid:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "error": msg, "message": "Error de validación en la consulta SQL"}
+        )
+
+    try:
+        page, duration = await fetch_page_async(
+            payload.sql, payload.domain, payload.page_token, payload.page_size, confirmed=payload.confirm
+        )
+    except InvalidPageTokenError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "error": str(e), "message": "Token de página inválido"}
+        )
+
+    if page.get("too_expensive"):
+        return JSONResponse(
+            status_code=409,
+            content={"success": False, "error": page["error"], "result": page, "message": "La consulta excede el costo permitido para el dominio"}
+        )
+
+    if "error" in page:
+        return JSONResponse(
+            status_code=500,
+            content={"success": False, "error": page["error"], "message": "Fallo en la ejecución de la consulta SQL"}
+        )
+    return {"success": True, "result": page, "duration": duration}
+
+
+@app.post("/execute_sql_stream")
+def execute_sql_stream(payload: SQLExecute):
+    """
+    Devuelve el resultado completo como NDJSON (una línea JSON por bloque de filas),
+    leyendo de un cursor con nombre para no materializar todo el resultado en memoria.
+    Aplica la misma revisión de costo que /execute_sql (409 salvo `confirm`).
+    """
+    is_valid, _, msg = validate_sql_query(payload.sql)
+    if not is_valid:
+        return JSONResponse(
+            status_code=400,
+            content={"success": False, "error": msg, "message": "Error de validación en la consulta SQL"}
+        )
+
+    # El primer bloque llega después de la revisión de costo: si la rechaza aún se puede responder 409
+    chunks = stream_query(payload.sql, payload.domain, confirmed=payload.confirm)
+    first = next(chunks)
+    if first["type"] == "too_expensive":
+        chunks.close()
+        rejection = first["result"]
+        return JSONResponse(
+            status_code=409,
+            content={"success": False, "error": rejection["error"], "result": rejection, "message": "La consulta excede el costo permitido para el dominio"}
+        )
+
+    def ndjson():
+        for chunk in itertools.chain([first], chunks):
+            yield json.dumps(chunk, ensure_ascii=False, default=str) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+
+def collection_for_type(training_type: str) -> str:
+    match training_type:
+        case "sql":
+            return COLLECTIONS_NAME["questions"]
+        case "ddl":
+            return COLLECTIONS_NAME["ddl"]
+        case "docs":
+            return COLLECTIONS_NAME["docs"]
+        case _:
+            raise InvalidCollectionTypeError(f"Tipo de colección no válido: {training_type}")
+
 @app.post("/training")
 async def training(payload: TrainingInput):
         try:
-            embedding = generate_embedding(payload.question)
-            collections = CONFIG_JSON["milvus_endpoint"]["collections"]
-
-            match payload.type:
-                case "sql":
-                    collection_name = collections["questions"]
-                case "ddl":
-                    collection_name = collections["ddl"]
-                case "docs":
-                    collection_name = collections["docs"]
-                case _:
-                    raise HTTPException(status_code=400, detail="Tipo de colección no válido")
+            collection_name = collection_for_type(payload.type)
+            embedding = await generate_embedding_async(payload.question)
     
             fields = [[payload.question], [payload.content], [embedding]]
-            result = save_collection(collection_name=collection_name, fields=fields)
+            result = await run_blocking("milvus", save_collection, collection_name=collection_name, fields=fields)
+            # Un ejemplo nuevo puede cambiar la respuesta de preguntas ya cacheadas
+            response_cache.invalidate()
             return result
         
         except EmbeddingServiceError as e:
             raise HTTPException(status_code=502, detail=str(e))
-        except InvalidCollectionTypeError as e:
+        except (InvalidCollectionTypeError, InvalidTrainingDataError) as e:
             raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error inesperado: {str(e)}")
+
+
+async def _read_bulk_records(http_request: Request) -> list:
+    content_type = http_request.headers.get("content-type", "")
+
+    # Archivo JSONL subido como multipart/form-data (campo "file")
+    if content_type.startswith("multipart/form-data"):
+        form = await http_request.form()
+        upload = form.get("file")
+        if upload is None:
+            raise ValueError("No se recibió el archivo 'file' con los ejemplos.")
+        raw = (await upload.read()).decode("utf-8")
+        return [json.loads(line) for line in raw.splitlines() if line.strip()]
+
+    # JSONL directo en el cuerpo
+    if "ndjson" in content_type or "jsonl" in content_type:
+        raw = (await http_request.body()).decode("utf-8")
+        return [json.loads(line) for line in raw.splitlines() if line.strip()]
+
+    # Arreglo JSON
+    records = await http_request.json()
+    if not isinstance(records, list):
+        raise ValueError("Se esperaba un arreglo JSON de ejemplos.")
+    return records
+
+
+@app.post("/training/bulk")
+async def training_bulk(http_request: Request):
+    """
+    Carga masiva de ejemplos de entrenamiento (arreglo JSON o archivo JSONL).
+    Los embeddings se generan por lotes y cada colección recibe inserciones
+    en bloques con un único flush.
+    """
+    start_time = time.time()
+    try:
+        records = await _read_bulk_records(http_request)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Formato de carga inválido: {str(e)}")
+
+    # Validar y agrupar por colección; los registros inválidos se reportan sin detener la carga
+    grouped = {}
+    rejected = []
+    for i, record in enumerate(records):
+        try:
+            item = TrainingInput(**record)
+            collection_name = collection_for_type(item.type)
+            validate_training_row(collection_name, item.question, item.content)
+        except (ValidationError, InvalidCollectionTypeError, InvalidTrainingDataError, TypeError) as e:
+            rejected.append({"index": i, "error": str(e)})
+            continue
+        grouped.setdefault(collection_name, []).append(item)
+
+    try:
+        collections_result = {}
+        for collection_name, items in grouped.items():
+            questions = [item.question for item in items]
+            embeddings = await generate_embeddings_async(
+                questions,
+                batch_size=TRAINING_BULK.get("embedding_batch_size", 32)
+            )
+            fields = [questions, [item.content for item in items], embeddings]
+            result = await run_blocking(
+                "milvus",
+                save_collection_bulk,
+                collection_name=collection_name,
+                fields=fields,
+                chunk_size=TRAINING_BULK.get("insert_chunk_size", 1000)
+            )
+            collections_result[collection_name] = result["insert_count"]
+
+    except EmbeddingServiceError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error inesperado: {str(e)}")
+
+    if collections_result:
+        response_cache.invalidate()
+
+    duration = round(time.time() - start_time, 2)
+    inserted = sum(collections_result.values())
+    return {
+        "status": "OK",
+        "received": len(records),
+        "insert_count": inserted,
+        "collections": collections_result,
+        "rejected": rejected,
+        "duration": duration,
+        "rows_per_sec": round(inserted / duration, 2) if duration else float(inserted)
+    }
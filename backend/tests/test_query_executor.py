@@ -0,0 +1,122 @@
+# backend/tests/test_query_executor.py
+
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+import core.db_pool as db_pool
+import core.query_executor as query_executor
+from core.db_pool import set_connection_factory, get_pool_for_domain
+from benchmarks.stand_ins import ReplayDatabase
+
+DOMAIN = "tickets"
+
+
+class StubCursor:
+    """Cursor tipo psycopg2 que devuelve `total_rows` filas de una columna."""
+
+    def __init__(self, connection, name=None, total_rows=10):
+        self.connection = connection
+        self.name = name
+        self.closed = False
+        self.itersize = 0
+        self.description = [("n",)]
+        self._rows = []
+        self._total_rows = total_rows
+
+    def execute(self, sql, params=None):
+        self._rows = [(i,) for i in range(self._total_rows)] if self.name else [(1,)]
+
+    def fetchone(self):
+        return self._rows[0]
+
+    def fetchmany(self, size=1):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def close(self):
+        self.closed = True
+
+
+class StubConnection:
+    def __init__(self):
+        self.closed = False
+        self.named_cursors = []
+
+    def cursor(self, name=None):
+        cursor = StubCursor(self, name)
+        if name:
+            self.named_cursors.append(cursor)
+        return cursor
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def real_execution(monkeypatch):
+    monkeypatch.setattr(query_executor, "SQL_EXECUTION_MODE", "real")
+    original_connect = db_pool._connect
+    yield
+    set_connection_factory(original_connect)
+
+
+def test_stream_closed_early_returns_connection(real_execution, monkeypatch):
+    connections = []
+
+    def connect(**kwargs):
+        connections.append(StubConnection())
+        return connections[-1]
+
+    set_connection_factory(connect)
+    monkeypatch.setattr(query_executor, "STREAM_FETCH_SIZE", 2)
+
+    stream = query_executor.stream_query("SELECT n FROM t", DOMAIN, confirmed=True)
+    assert next(stream)["type"] == "columns"
+    assert next(stream)["type"] == "rows"
+    # Lo que hace Starlette cuando el cliente se desconecta a mitad de la respuesta
+    stream.close()
+
+    stats = get_pool_for_domain(DOMAIN).stats()
+    assert stats["in_use"] == 0
+    assert stats["idle"] == 1
+    assert all(cursor.closed for cursor in connections[0].named_cursors)
+
+
+def test_fetch_page_keeps_literal_percent(real_execution):
+    set_connection_factory(ReplayDatabase([]).connect)
+    sql = "SELECT 'EN PROCESO' AS estado WHERE 'EN PROCESO' LIKE '%PROCESO%'"
+
+    page, _ = query_executor.fetch_page(sql, DOMAIN, page_size=10, confirmed=True)
+
+    assert "error" not in page
+    assert page["rows"] == [("EN PROCESO",)]
+
+
+def test_replay_cursor_formats_parameters_like_psycopg2():
+    cursor = ReplayDatabase([]).connect().cursor()
+
+    with pytest.raises((TypeError, ValueError)):
+        cursor.execute("SELECT 1 WHERE 'a' LIKE '%a%' LIMIT %s", (1,))
+
+    cursor.execute("SELECT %s AS valor", ("it's",))
+    assert cursor.fetchall() == [("it's",)]
+
+
+def test_page_token_matches_equivalent_sql():
+    token = query_executor.encode_page_token("SELECT id FROM tickets  LIMIT 900", DOMAIN, 500)
+
+    offset, confirmed = query_executor.decode_page_token(token, "select id\nfrom tickets limit 900;", DOMAIN)
+
+    assert (offset, confirmed) == (500, False)
+    with pytest.raises(query_executor.InvalidPageTokenError):
+        query_executor.decode_page_token(token, "SELECT id FROM tickets LIMIT 900", "ventas")
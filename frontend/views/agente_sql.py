@@ -17,6 +17,7 @@ API_ENDPOINTS_BASE = CONFIG_JSON['api_endpoints_base']
 API_SQL_GENERATION = API_ENDPOINTS_BASE + CONFIG_JSON['api_endpoints']['generate_sql']
 API_SQL_TRAINING = API_ENDPOINTS_BASE + CONFIG_JSON['api_endpoints']['training']
 API_SQL_EXECUTION = API_ENDPOINTS_BASE + CONFIG_JSON['api_endpoints']['execute_sql']
+API_SQL_PAGE = API_ENDPOINTS_BASE + CONFIG_JSON['api_endpoints']['execute_sql_page']
 
 
 logging.basicConfig(
@@ -53,6 +54,7 @@ with st.form(key="sql_form"):
     
 if enviar and pregunta_usuario:
     st.session_state["last_question"] = pregunta_usuario
+    st.session_state.pop("needs_confirm", None)
     load_init_prompts(dominio)
 
     try:
@@ -70,6 +72,8 @@ if "last_response" in st.session_state:
     data = st.session_state["last_response"]
     contain_error = "error" in data['result']
     lock_to_save = False
+    if data.get("path") == "semantic":
+        st.caption("⚡ Se reutilizó el SQL validado de una pregunta casi idéntica.")
     with st.status("🧠 Preparando resultados...", expanded=True) as status:        
             
         tabs = st.tabs(["🧠 Reformulación", "📘 Contexto", "💻 SQL Generado",])            
@@ -90,10 +94,13 @@ if "last_response" in st.session_state:
                 height=200
             )
             training_message = ""
+            confirmar_costo = False
+            if data['result'].get("requires_confirmation") or st.session_state.get("needs_confirm"):
+                confirmar_costo = st.checkbox("💸 Ejecutar aunque la consulta sea costosa")
             cols = st.columns([1, 1, 6])
             with cols[0]:
                 if st.button("🐘", help="Ejecutar SQL", use_container_width=True):
-                    payload ={"sql":edited_sql}
+                    payload ={"sql":edited_sql, "domain": dominio, "confirm": confirmar_costo}
                     try:
                         response = requests.post(API_SQL_EXECUTION, json=payload)        
                         
@@ -101,6 +108,12 @@ if "last_response" in st.session_state:
                             st.warning("⚠️ Consulta SQL inválida. Revisa la sintaxis o los campos.")
                             lock_to_save = True
 
+                        elif response.status_code == 409:
+                            costo = response.json()["result"]
+                            st.warning(f"💸 La consulta es demasiado costosa (costo estimado {costo['estimate']['total_cost']:.0f}).")
+                            st.session_state["needs_confirm"] = costo.get("requires_confirmation", False)
+                            lock_to_save = True
+
                         elif response.status_code == 500:
                             st.error("❌ Error interno del agente al ejecutar la consulta.")
                             lock_to_save = True
@@ -111,6 +124,7 @@ if "last_response" in st.session_state:
                             lock_to_save = not new_data['success']
                         
                             if new_data["success"]:                            
+                                st.session_state.pop("needs_confirm", None)
                                 data['result'] = new_data["result"]
                                 data['sql'] = edited_sql
                                 st.session_state["last_response"] = data
@@ -167,6 +181,24 @@ if "last_response" in st.session_state:
         df = pd.DataFrame(data['result']["rows"], columns=data['result']["columns"])
         st.dataframe(df, use_container_width=True)
 
+        # La vista previa trae un número limitado de filas; el resto se pide por páginas
+        next_token = data['result'].get("next_page_token")
+        if next_token:
+            st.caption(f"ℹ️ Mostrando las primeras {len(df)} filas.")
+            if st.button("⬇️ Cargar más filas"):
+                payload = {"sql": data['sql'], "domain": dominio, "page_token": next_token}
+                try:
+                    response = requests.post(API_SQL_PAGE, json=payload)
+                    response.raise_for_status()
+                    page = response.json()["result"]
+                    data['result']["rows"] = data['result']["rows"] + page["rows"]
+                    data['result']["next_page_token"] = page["next_page_token"]
+                    st.session_state["last_response"] = data
+                    st.rerun()
+                except Exception as e:
+                    st.error("❌ No se pudieron cargar más filas.")
+                    logger.error(f"❌ Fallo al paginar resultados\n{e}", exc_info=True)
+
 
 st.divider()
 st.caption(f" 🧠 **InnovAI** puede cometer errores. El modelo utiliza datos de **{dominio}** para responder tus preguntas.")
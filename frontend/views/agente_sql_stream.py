@@ -1,124 +1,153 @@
-# pages/agente_sql.py
-
-import sys
-import os
-import streamlit as st
-import pandas as pd
-import requests
-import logging
-import json
-import sseclient
-from traceback import format_exc
-
-# Agrega ruta del proyecto
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
-from shared.utils import load_prompt_template, load_config
-
-# Configuración general
-st.set_page_config(page_title="Agente SQL Inteligente", layout="wide")
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[logging.FileHandler('logs/app_debug.log', encoding='utf-8')],
-    encoding='utf-8',
-)
-logger = logging.getLogger(__name__)
-config = load_config()
-
-API_STREAM_URL = "http://localhost:8000/generate_sql_stream"
-
-# Carga de prompts
-def load_init_prompts(domain: str):
-    if 'prompts' not in st.session_state:
-        st.session_state.prompts = {
-            'enhancer': load_prompt_template(domain=domain, template_name="question_enhancer.txt"),
-            'flow': load_prompt_template(domain=domain, template_name="flow_generator_prompt.txt"),
-            'sql': load_prompt_template(domain=domain, template_name="system_context.txt")
-        }
-
-# UI principal
-st.title("🤖 Agente SQL Inteligente")
-st.markdown("Formula una pregunta en lenguaje natural y deja que el agente de IA genere y ejecute la consulta SQL por ti.")
-
-with st.form(key="sql_form"):
-    pregunta_usuario = st.text_area(
-        label="✍️ Escribe tu pregunta:",
-        placeholder="Ej. ¿Cuántos tickets cerrados hubo este mes?",
-        height=70,
-    )
-    enviar = st.form_submit_button("🚀 Ejecutar")
-    dominio = "tickets"
-
-if enviar and pregunta_usuario:
-    load_init_prompts(dominio)
-
-    # Estado inicial
-    reformulada = ""
-    flujo = ""
-    sql_generado = ""
-    resultado = None
-
-    with st.status("🧠 Ejecutando agente de IA...", expanded=True) as status:
-        try:
-            response = requests.post(
-                API_STREAM_URL,
-                json={"question": pregunta_usuario, "domain": dominio},
-                stream=True,
-                timeout=300
-            )
-            client = sseclient.SSEClient(response)
-
-            for event in client.events():
-                if event.data.strip() == "[DONE]":
-                    break
-
-                data = json.loads(event.data)
-                stage = data.get("stage")
-
-                if stage == "reformulation":
-                    reformulada = data["content"]
-                    status.update(label="🧠 Reformulación completada", state="running")
-                    st.markdown("#### 🧠 Reformulación")
-                    st.markdown(reformulada)
-
-                elif stage == "flow":
-                    flujo = data["content"]
-                    status.update(label="📘 Flujo técnico generado", state="running")
-                    st.markdown("#### 📘 Flujo Técnico")
-                    st.code(flujo, language="markdown")
-
-                elif stage == "sql":
-                    sql_generado = data["content"]
-                    status.update(label="💻 SQL generado", state="running")
-                    st.markdown("#### 💻 Consulta SQL Generada")
-                    st.code(sql_generado, language="sql")
-
-                elif stage == "result":
-                    resultado = data["content"]
-                    status.update(label="📊 Consulta ejecutada correctamente", state="complete")
-
-                    st.markdown("#### 📊 Resultado")
-                    if "error" in resultado:
-                        st.error(f"Error al ejecutar SQL: {resultado['error']}")
-                    else:
-                        df = pd.DataFrame(resultado["rows"], columns=resultado["columns"])
-                        st.dataframe(df, use_container_width=True)
-
-                elif stage == "error":
-                    st.error(f"❌ Error: {data['message']}")
-                    status.update(label="❌ Fallo durante el procesamiento", state="error")
-
-                elif stage == "message":
-                    st.info(data["message"])
-
-                elif stage == "done":
-                    st.success("✅ Agente completó el proceso.")
-                    break
-
-        except Exception as e:
-            st.error("⚠️ Error al conectar con el backend.")
-            logger.error("Error en procesamiento", exc_info=True)
-
-st.divider()
-st.caption("🧠 Este agente utiliza modelos de lenguaje para interpretar y generar SQL. Puede cometer errores.")
-st.caption("👨🏻‍💻 Desarrollado por el equipo de IE – Grupo Reyma")
+# pages/agente_sql.py
+
+import sys
+import os
+import streamlit as st
+import pandas as pd
+import requests
+import logging
+import json
+import sseclient
+from traceback import format_exc
+
+# Agrega ruta del proyecto
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from shared.utils import load_prompt_template, load_config
+
+# Configuración general
+st.set_page_config(page_title="Agente SQL Inteligente", layout="wide")
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.FileHandler('logs/app_debug.log', encoding='utf-8')],
+    encoding='utf-8',
+)
+logger = logging.getLogger(__name__)
+config = load_config()
+
+API_STREAM_URL = config['api_endpoints_base'] + config['api_endpoints']['generate_sql_stream']
+
+TITULOS = {
+    "reformulation": "#### 🧠 Reformulación",
+    "flow": "#### 📘 Flujo Técnico",
+    "sql": "#### 💻 Consulta SQL Generada",
+}
+
+def mostrar_etapa(placeholders: dict, paso: str, contenido: str):
+    """Crea (una sola vez) el bloque de la etapa y reemplaza su contenido."""
+    if paso not in placeholders:
+        st.markdown(TITULOS[paso])
+        placeholders[paso] = st.empty()
+    if paso == "sql":
+        placeholders[paso].code(contenido, language="sql")
+    else:
+        placeholders[paso].markdown(contenido)
+
+# Carga de prompts
+def load_init_prompts(domain: str):
+    if 'prompts' not in st.session_state:
+        st.session_state.prompts = {
+            'enhancer': load_prompt_template(domain=domain, template_name="question_enhancer.txt"),
+            'flow': load_prompt_template(domain=domain, template_name="flow_generator_prompt.txt"),
+            'sql': load_prompt_template(domain=domain, template_name="system_context.txt")
+        }
+
+# UI principal
+st.title("🤖 Agente SQL Inteligente")
+st.markdown("Formula una pregunta en lenguaje natural y deja que el agente de IA genere y ejecute la consulta SQL por ti.")
+
+with st.form(key="sql_form"):
+    pregunta_usuario = st.text_area(
+        label="✍️ Escribe tu pregunta:",
+        placeholder="Ej. ¿Cuántos tickets cerrados hubo este mes?",
+        height=70,
+    )
+    enviar = st.form_submit_button("🚀 Ejecutar")
+    dominio = "tickets"
+
+if enviar and pregunta_usuario:
+    load_init_prompts(dominio)
+
+    # Estado inicial
+    reformulada = ""
+    flujo = ""
+    sql_generado = ""
+    resultado = None
+
+    with st.status("🧠 Ejecutando agente de IA...", expanded=True) as status:
+        try:
+            response = requests.post(
+                API_STREAM_URL,
+                json={"question": pregunta_usuario, "domain": dominio},
+                stream=True,
+                timeout=300
+            )
+            client = sseclient.SSEClient(response)
+            placeholders = {}
+            parciales = {}
+            tabla = None
+
+            for event in client.events():
+                if event.data.strip() == "[DONE]":
+                    break
+
+                data = json.loads(event.data)
+                stage = data.get("stage")
+
+                if stage == "token":
+                    # Fragmentos del modelo conforme se generan
+                    paso = data["step"]
+                    parciales[paso] = parciales.get(paso, "") + data["content"]
+                    mostrar_etapa(placeholders, paso, parciales[paso])
+
+                elif stage == "reformulation":
+                    reformulada = data["content"]
+                    status.update(label="🧠 Reformulación completada", state="running")
+                    mostrar_etapa(placeholders, "reformulation", reformulada)
+
+                elif stage == "flow":
+                    flujo = data["content"]
+                    status.update(label="📘 Flujo técnico generado", state="running")
+                    mostrar_etapa(placeholders, "flow", flujo)
+
+                elif stage == "sql":
+                    sql_generado = data["content"]
+                    status.update(label="💻 SQL generado", state="running")
+                    mostrar_etapa(placeholders, "sql", sql_generado)
+
+                elif stage == "result":
+                    resultado = data["content"]
+                    st.markdown("#### 📊 Resultado")
+                    if "error" in resultado:
+                        status.update(label="❌ La consulta no se pudo ejecutar", state="error")
+                        st.error(f"Error al ejecutar SQL: {resultado['error']}")
+                    else:
+                        status.update(label="📊 Consulta ejecutada correctamente", state="running")
+                        tabla = st.empty()
+                        tabla.dataframe(pd.DataFrame(resultado["rows"], columns=resultado["columns"]), use_container_width=True)
+
+                elif stage == "result_page" and tabla is not None:
+                    resultado["rows"] = resultado["rows"] + data["content"]["rows"]
+                    resultado["next_page_token"] = data["content"]["next_page_token"]
+                    tabla.dataframe(pd.DataFrame(resultado["rows"], columns=resultado["columns"]), use_container_width=True)
+
+                elif stage == "error":
+                    st.error(f"❌ Error: {data['message']}")
+                    status.update(label="❌ Fallo durante el procesamiento", state="error")
+
+                elif stage in ("start", "message"):
+                    status.update(label=f"🧠 {data['message']}", state="running")
+
+                elif stage == "done":
+                    status.update(label="✅ Agente completó el proceso.", state="complete")
+                    if resultado and resultado.get("next_page_token"):
+                        st.caption(f"ℹ️ Mostrando las primeras {len(resultado['rows'])} filas.")
+                    break
+
+        except Exception as e:
+            st.error("⚠️ Error al conectar con el backend.")
+            logger.error("Error en procesamiento", exc_info=True)
+
+st.divider()
+st.caption("🧠 Este agente utiliza modelos de lenguaje para interpretar y generar SQL. Puede cometer errores.")
+st.caption("👨🏻‍💻 Desarrollado por el equipo de IE – Grupo Reyma")
@@ -1,55 +1,100 @@
-# pages/eventos.py
-
-import streamlit as st
-import pandas as pd
-import os
-import json
-
-st.set_page_config(page_title="Ejemplos Ejecutados", layout="wide")
-st.title("📊 Resultados Fallidos del Agente SQL")
-
-# Ruta del historial
-LOG_PATH = "outputs/ptuning_failed_cases.jsonl"
-
-def cargar_eventos():
-    eventos = []
-    if os.path.exists(LOG_PATH):
-        with open(LOG_PATH, "r", encoding="utf-8") as f:
-            for line in f:
-                try:
-                    eventos.append(json.loads(line.strip()))
-                except:
-                    continue
-    return eventos
-
-# Cargar eventos
-eventos = cargar_eventos()
-# print(eventos)
-
-if not eventos:
-    st.warning("No se encontraron eventos registrados.")
-else:
-    df = pd.DataFrame(eventos)
-
-    st.markdown("#### 🔍 Detalle de un Evento")
-
-    opciones = df["original_question"].tolist()
-    seleccionado = st.selectbox("Selecciona un evento para ver el detalle completo:", opciones)
-
-    evento = df[df["original_question"] == seleccionado].iloc[0]
-
-    tabs = st.tabs(["🧠 Reformulación", "📘 Flujo", "💻 SQL", "❌ Error"])
-    with tabs[0]:
-        st.markdown(evento["enhanced_question"])
-    with tabs[1]:
-        st.markdown(evento["flow"])
-    with tabs[2]:
-        st.code(evento["generated_sql"], language="sql")
-    with tabs[3]:
-        st.error(evento["error"])
-
-    st.markdown("#### 🔍 Eventos")
-    st.dataframe(
-        df[["request_id", "original_question", "enhanced_question", "flow", "generated_sql", "error"]],
-        use_container_width=True
-    )
\ No newline at end of file
+# pages/eventos.py
+
+import sys
+import os
+import datetime
+import requests
+import streamlit as st
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from shared.utils import load_config
+
+CONFIG_JSON = load_config()
+API_ENDPOINTS_BASE = CONFIG_JSON['api_endpoints_base']
+API_EVENTS = API_ENDPOINTS_BASE + CONFIG_JSON['api_endpoints']['events']
+API_EVENTS_SUMMARY = API_ENDPOINTS_BASE + CONFIG_JSON['api_endpoints']['events_summary']
+
+st.set_page_config(page_title="Ejemplos Ejecutados", layout="wide")
+st.title("📊 Eventos del Agente SQL")
+
+# Filtros: la consulta se resuelve en el backend con índices, no leyendo archivos JSONL
+cols = st.columns([1, 1, 1, 2])
+with cols[0]:
+    estado = st.selectbox("Estado", ["fails", "success", "todos"])
+with cols[1]:
+    dominio = st.selectbox("Dominio", ["todos"] + CONFIG_JSON.get('temas', list(CONFIG_JSON['domain_to_db'])))
+with cols[2]:
+    desde = st.date_input("Desde", value=datetime.date.today() - datetime.timedelta(days=7))
+with cols[3]:
+    busqueda = st.text_input("Buscar en la pregunta")
+
+params = {
+    "status": None if estado == "todos" else estado,
+    "domain": None if dominio == "todos" else dominio,
+    "since": desde.isoformat(),
+    "search": busqueda or None,
+    "limit": 500
+}
+
+@st.cache_data(ttl=10)
+def cargar_eventos(params: dict):
+    response = requests.get(API_EVENTS, params={k: v for k, v in params.items() if v is not None})
+    response.raise_for_status()
+    return response.json()["events"]
+
+@st.cache_data(ttl=10)
+def cargar_resumen(since: str, domain: str):
+    response = requests.get(API_EVENTS_SUMMARY, params={"since": since, "domain": domain} if domain else {"since": since})
+    response.raise_for_status()
+    return response.json()["summary"]
+
+def cargar_detalle(request_id: str):
+    response = requests.get(API_EVENTS, params={"request_id": request_id, "full": True, "limit": 1})
+    response.raise_for_status()
+    eventos = response.json()["events"]
+    return eventos[0] if eventos else None
+
+try:
+    eventos = cargar_eventos(params)
+    resumen = cargar_resumen(params["since"], params["domain"])
+except Exception as e:
+    st.error("❌ No se pudieron consultar los eventos en el backend.")
+    st.stop()
+
+if resumen:
+    df_resumen = pd.DataFrame(resumen)
+    st.markdown("#### 📈 Eventos por día")
+    st.bar_chart(df_resumen.pivot_table(index="day", columns="status", values="events", aggfunc="sum").fillna(0))
+
+if not eventos:
+    st.warning("No se encontraron eventos registrados.")
+else:
+    df = pd.DataFrame(eventos)
+
+    st.markdown("#### 🔍 Detalle de un Evento")
+
+    opciones = df["request_id"].tolist()
+    etiquetas = dict(zip(df["request_id"], df["timestamp"].str[:19] + " · " + df["original_question"]))
+    seleccionado = st.selectbox("Selecciona un evento para ver el detalle completo:", opciones, format_func=lambda rid: etiquetas[rid])
+
+    evento = cargar_detalle(seleccionado)
+    if evento:
+        tabs = st.tabs(["🧠 Reformulación", "📘 Flujo", "💻 SQL", "❌ Error"])
+        with tabs[0]:
+            st.markdown(evento["enhanced_question"])
+        with tabs[1]:
+            st.markdown(evento["flow"])
+        with tabs[2]:
+            st.code(evento["generated_sql"], language="sql")
+        with tabs[3]:
+            if evento["error"]:
+                st.error(evento["error"])
+            else:
+                st.success("Sin errores.")
+
+    st.markdown("#### 🔍 Eventos")
+    st.dataframe(
+        df[["timestamp", "request_id", "status", "domain", "original_question", "generated_sql", "error", "duration"]],
+        use_container_width=True
+    )
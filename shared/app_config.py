@@ -0,0 +1,221 @@
+# shared/app_config.py
+
+import os
+import json
+import time
+import logging
+import threading
+from pathlib import Path
+from dataclasses import dataclass, field
+
+logger = logging.getLogger("app_config")
+
+SHARED_DIR = Path(__file__).resolve().parent
+DEFAULT_CONFIG_FILE = SHARED_DIR / "config_dev.json"
+
+# Variable con la ruta del archivo de configuración (absoluta o relativa a la raíz del proyecto)
+CONFIG_FILE_ENV = "AGENT_CONFIG_FILE"
+# Prefijo de sobrescrituras: AGENT__PIPELINE__MODE=speculative → config["pipeline"]["mode"]
+ENV_OVERRIDE_PREFIX = "AGENT__"
+
+# Llaves obligatorias y su tipo esperado
+REQUIRED_KEYS = {
+    "execution_mode": str,
+    "log_folder": str,
+    "output_folder": str,
+    "jsonl_output": str,
+    "api_log_file": str,
+    "log_file": str,
+    "model_endpoints": dict,
+    "api_endpoints_base": str,
+    "api_endpoints": dict,
+    "milvus_endpoint": dict,
+    "embedding_endpoint": str,
+    "domain_to_db": dict,
+}
+
+
+# Secciones que `reload_config()` puede cambiar en caliente; cada módulo que guarda una copia
+# registra un hook con `on_config_reload` (sql_agent, query_executor, rag_agent)
+RELOADABLE_KEYS = {
+    "semantic_fast_path",
+    "cost_guard",
+    "pipeline",
+    "reformulation_policy",
+    "result_paging",
+    "retrieval",
+}
+
+
+class ConfigError(Exception):
+    """El archivo de configuración no existe o no es válido."""
+    pass
+
+
+@dataclass(frozen=True)
+class AppConfig:
+    """
+    Configuración cargada y validada. `data` es el diccionario que devuelve `load_config()`.
+    """
+    path: Path
+    data: dict
+    overrides: dict = field(default_factory=dict)
+    loaded_at: float = 0.0
+
+    @property
+    def environment(self) -> str:
+        return self.data.get("environment", "")
+
+    @property
+    def execution_mode(self) -> str:
+        return self.data["execution_mode"]
+
+    @property
+    def api_endpoints_base(self) -> str:
+        return self.data["api_endpoints_base"]
+
+    @property
+    def api_endpoints(self) -> dict:
+        return self.data["api_endpoints"]
+
+    @property
+    def model_endpoints(self) -> dict:
+        return self.data["model_endpoints"]
+
+    @property
+    def domain_to_db(self) -> dict:
+        return self.data["domain_to_db"]
+
+    def section(self, name: str) -> dict:
+        """Bloque opcional de configuración (dict vacío si no existe)."""
+        return self.data.get(name, {})
+
+
+def resolve_config_path() -> Path:
+    configured = os.getenv(CONFIG_FILE_ENV)
+    if not configured:
+        return DEFAULT_CONFIG_FILE
+    path = Path(configured)
+    return path if path.is_absolute() else SHARED_DIR.parent / path
+
+
+def _parse_env_value(raw: str):
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError:
+        return raw
+
+
+def apply_env_overrides(data: dict, environ=os.environ) -> dict:
+    """
+    Aplica variables `AGENT__SECCION__LLAVE=valor` sobre la configuración.
+    Los valores se interpretan como JSON cuando es posible (números, booleanos, listas).
+
+    Returns:
+        dict: Sobrescrituras aplicadas, por ruta de llaves.
+    """
+    applied = {}
+    for name, raw in environ.items():
+        if not name.startswith(ENV_OVERRIDE_PREFIX) or name == CONFIG_FILE_ENV:
+            continue
+        parts = [p.lower() for p in name[len(ENV_OVERRIDE_PREFIX):].split("__") if p]
+        if not parts:
+            continue
+
+        node = data
+        for part in parts[:-1]:
+            # Respeta el nombre original de la llave si ya existe con otras mayúsculas
+            key = next((k for k in node if k.lower() == part), part)
+            if not isinstance(node.get(key), dict):
+                node[key] = {}
+            node = node[key]
+        last = next((k for k in node if k.lower() == parts[-1]), parts[-1])
+        node[last] = _parse_env_value(raw)
+        applied[".".join(parts)] = node[last]
+    return applied
+
+
+def validate_config(data: dict):
+    """
+    Raises:
+        ConfigError: Si falta una llave obligatoria o tiene un tipo distinto al esperado.
+    """
+    errors = []
+    for key, expected in REQUIRED_KEYS.items():
+        if key not in data:
+            errors.append(f"falta '{key}'")
+        elif not isinstance(data[key], expected):
+            errors.append(f"'{key}' debe ser {expected.__name__}")
+    for domain, db_name in data.get("domain_to_db", {}).items():
+        if not isinstance(db_name, str):
+            errors.append(f"domain_to_db.{domain} debe ser str")
+    if errors:
+        raise ConfigError("Configuración inválida: " + "; ".join(errors))
+
+
+def read_config(path: Path = None) -> AppConfig:
+    """Lee, sobrescribe con variables de entorno y valida la configuración (sin cachearla)."""
+    path = path or resolve_config_path()
+    if not path.exists():
+        raise ConfigError(f"No existe un archivo de configuración <<{path}>>")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except json.JSONDecodeError as e:
+        raise ConfigError(f"El archivo de configuración <<{path}>> no es JSON válido: {e}")
+
+    overrides = apply_env_overrides(data)
+    validate_config(data)
+    return AppConfig(path=path, data=data, overrides=overrides, loaded_at=time.time())
+
+
+_config = None
+_config_lock = threading.Lock()
+_reload_hooks = []
+
+
+def get_config() -> AppConfig:
+    """Configuración compartida por todo el proceso; el archivo se lee una sola vez."""
+    global _config
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                _config = read_config()
+    return _config
+
+
+def on_config_reload(hook):
+    """Registra `hook(config)` para que un módulo actualice sus valores derivados tras `reload_config()`."""
+    _reload_hooks.append(hook)
+    return hook
+
+
+def reload_config() -> AppConfig:
+    """
+    Vuelve a leer el archivo y reemplaza la configuración de una sola vez (nunca se modifica
+    el diccionario en uso), luego ejecuta los hooks registrados para que cada módulo actualice
+    sus valores derivados. Solo se aceptan cambios en `RELOADABLE_KEYS`; el resto (pools,
+    cachés, endpoints...) se lee al iniciar y requiere reiniciar el proceso.
+    Si el archivo no es válido o cambia llaves no recargables, se conserva la configuración anterior.
+
+    Raises:
+        ConfigError: Si el archivo nuevo no existe, no es válido o cambia llaves no recargables.
+    """
+    global _config
+    fresh = read_config()
+    with _config_lock:
+        if _config is not None:
+            current = _config.data
+            changed = {k for k in current.keys() | fresh.data.keys() if current.get(k) != fresh.data.get(k)}
+            blocked = sorted(changed - RELOADABLE_KEYS)
+            if blocked:
+                raise ConfigError(f"Las llaves {blocked} no se pueden recargar en caliente; reinicia el servicio")
+        _config = fresh
+
+    for hook in list(_reload_hooks):
+        try:
+            hook(fresh)
+        except Exception as e:
+            logger.error(f"❌ Error en hook de recarga de configuración {getattr(hook, '__name__', hook)}: {e}")
+    logger.info(f"🔄 Configuración recargada desde {fresh.path}")
+    return fresh
@@ -0,0 +1,320 @@
+# shared/event_store.py
+
+import os
+import sys
+import json
+import queue
+import atexit
+import sqlite3
+import threading
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).resolve().parent.parent
+
+_STOP = object()
+
+COLUMNS = [
+    "request_id", "timestamp", "day", "status", "domain", "path", "model", "duration",
+    "client_ip", "original_question", "enhanced_question", "flow", "generated_sql",
+    "error", "row_count", "tags", "prompt_version", "result",
+]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    request_id TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    day TEXT NOT NULL,
+    status TEXT NOT NULL,
+    domain TEXT,
+    path TEXT,
+    model TEXT,
+    duration REAL,
+    client_ip TEXT,
+    original_question TEXT,
+    enhanced_question TEXT,
+    flow TEXT,
+    generated_sql TEXT,
+    error TEXT,
+    row_count INTEGER,
+    tags TEXT,
+    prompt_version TEXT,
+    result TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_events_request ON events (request_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events (timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_status ON events (status, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_domain ON events (domain, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_day ON events (day, domain, status);
+"""
+
+# Columnas livianas para listados; el resto se obtiene por request_id
+LIST_COLUMNS = [
+    "request_id", "timestamp", "status", "domain", "path", "duration",
+    "original_question", "generated_sql", "error", "row_count", "tags",
+]
+
+
+def event_to_row(event: dict, max_result_bytes: int) -> tuple:
+    """Convierte un evento de `log_event` en la fila de la tabla `events`."""
+    result = event.get("result") or {}
+    error = result.get("error") if isinstance(result, dict) else None
+    rows = result.get("rows") if isinstance(result, dict) else None
+
+    result_json = json.dumps(result, ensure_ascii=False, default=str)
+    if len(result_json) > max_result_bytes:
+        result_json = json.dumps({"truncated": True, "columns": result.get("columns") if isinstance(result, dict) else None})
+
+    timestamp = event.get("timestamp", "")
+    return (
+        event.get("request_id", ""),
+        timestamp,
+        timestamp[:10],
+        event.get("status", ""),
+        event.get("domain", ""),
+        event.get("path", ""),
+        event.get("model", ""),
+        event.get("duration", 0.0),
+        event.get("client_ip", ""),
+        event.get("original_question", ""),
+        event.get("enhanced_question", ""),
+        event.get("flow", ""),
+        event.get("generated_sql", ""),
+        str(error) if error is not None else None,
+        len(rows) if isinstance(rows, list) else None,
+        json.dumps(event.get("tags") or [], ensure_ascii=False),
+        event.get("prompt_version", ""),
+        result_json,
+    )
+
+
+class EventStore:
+    """
+    Almacén de eventos del agente en SQLite (WAL) con índices por request_id, fecha,
+    estado y dominio. Las inserciones se encolan y un hilo las agrupa en una sola
+    transacción, así `log_event` no espera al disco.
+
+    Args:
+        db_path (str): Ruta del archivo SQLite.
+        enabled (bool): Si es False, `add` no hace nada y las consultas regresan vacío.
+        batch_size (int): Máximo de eventos por transacción.
+        flush_interval_s (float): Espera máxima antes de escribir un lote incompleto.
+        max_result_bytes (int): Tamaño máximo del resultado guardado por evento.
+    """
+
+    def __init__(self, db_path: str, enabled: bool = True, batch_size: int = 200,
+                 flush_interval_s: float = 0.5, max_result_bytes: int = 20000):
+        self.db_path = db_path
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.max_result_bytes = max_result_bytes
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = {"enqueued": 0, "inserted": 0, "batches": 0, "errors": 0}
+        self._pid = None
+        self._queue = None
+        self._thread = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # Una conexión por hilo; el esquema se crea en la primera
+        db = getattr(self._local, "db", None)
+        if db is None or getattr(self._local, "pid", None) != os.getpid():
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.db_path, timeout=10)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.executescript(SCHEMA)
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    def _ensure_thread(self):
+        if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._pid != os.getpid() or self._thread is None or not self._thread.is_alive():
+                    self._pid = os.getpid()
+                    self._queue = queue.Queue()
+                    self._thread = threading.Thread(target=self._run, name="event-store", daemon=True)
+                    self._thread.start()
+
+    def add(self, event: dict):
+        """Encola el evento para insertarlo en segundo plano."""
+        if not self.enabled:
+            return
+        row = event_to_row(event, self.max_result_bytes)
+        self._ensure_thread()
+        self._queue.put(row)
+        self._stats["enqueued"] += 1
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval_s)
+            except queue.Empty:
+                continue
+            rows, waiters, stop = [], [], False
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    rows.append(item)
+                if stop or len(rows) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if rows:
+                self._insert(rows)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+    def _insert(self, rows: list):
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        try:
+            db = self._connect()
+            with db:
+                db.executemany(
+                    f"INSERT OR IGNORE INTO events ({', '.join(COLUMNS)}) VALUES ({placeholders})", rows
+                )
+            self._stats["inserted"] += len(rows)
+            self._stats["batches"] += 1
+        except sqlite3.Error as e:
+            self._stats["errors"] += 1
+            print(f"🚨 Error al guardar eventos en {self.db_path}: {e}", file=sys.stderr)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        if self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    @staticmethod
+    def _filters(status=None, domain=None, since=None, until=None, request_id=None, search=None, tag=None):
+        clauses, params = [], []
+        if request_id:
+            clauses.append("request_id = ?")
+            params.append(request_id)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if domain:
+            clauses.append("domain = ?")
+            params.append(domain)
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        if search:
+            clauses.append("original_question LIKE ?")
+            params.append(f"%{search}%")
+        if tag:
+            clauses.append("tags LIKE ?")
+            params.append(f'%"{tag}"%')
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def query(self, status: str = None, domain: str = None, since: str = None, until: str = None,
+              request_id: str = None, search: str = None, tag: str = None,
+              limit: int = 100, offset: int = 0, full: bool = False) -> list:
+        """
+        Eventos más recientes primero que cumplen los filtros.
+
+        Args:
+            status (str): "success" o "fails".
+            domain (str): Dominio de datos.
+            since / until (str): Rango ISO de `timestamp` (until exclusivo).
+            request_id (str): Evento puntual.
+            search (str): Texto contenido en la pregunta original.
+            tag (str): Etiqueta exacta (p. ej. "cache:hit").
+            limit / offset (int): Paginación.
+            full (bool): Incluye reformulación, flujo y resultado guardado.
+
+        Returns:
+            list: Eventos como diccionarios.
+        """
+        if not self.enabled:
+            return []
+        columns = ["*"] if full else LIST_COLUMNS
+        where, params = self._filters(status, domain, since, until, request_id, search, tag)
+        sql = f"SELECT {', '.join(columns)} FROM events {where} ORDER BY timestamp DESC LIMIT ? OFFSET ?"
+        rows = self._connect().execute(sql, params + [int(limit), int(offset)]).fetchall()
+
+        events = []
+        for row in rows:
+            event = dict(row)
+            event.pop("id", None)
+            event["tags"] = json.loads(event["tags"] or "[]")
+            if full and event.get("result"):
+                event["result"] = json.loads(event["result"])
+            events.append(event)
+        return events
+
+    def summary(self, since: str = None, until: str = None, domain: str = None) -> list:
+        """Conteos y duración promedio por día, dominio y estado."""
+        if not self.enabled:
+            return []
+        where, params = self._filters(domain=domain, since=since, until=until)
+        sql = f"""SELECT day, domain, status, COUNT(*) AS events, ROUND(AVG(duration), 2) AS avg_duration
+                  FROM events {where} GROUP BY day, domain, status ORDER BY day DESC"""
+        return [dict(row) for row in self._connect().execute(sql, params).fetchall()]
+
+    def import_jsonl(self, paths) -> int:
+        """Carga archivos `ptuning_*.jsonl` existentes (eventos repetidos se ignoran)."""
+        total = 0
+        for path in paths:
+            rows = []
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        rows.append(event_to_row(json.loads(line), self.max_result_bytes))
+                    except (json.JSONDecodeError, AttributeError):
+                        continue
+            if rows:
+                self._insert(rows)
+                total += len(rows)
+        return total
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        stats["pending"] = self._queue.qsize() if self._queue is not None else 0
+        stats["path"] = self.db_path
+        return stats
+
+
+def create_event_store(settings: dict) -> EventStore:
+    db_path = settings.get("path", "outputs/events/events.sqlite3")
+    if not os.path.isabs(db_path):
+        db_path = str(ROOT_PATH / db_path)
+    store = EventStore(
+        db_path,
+        enabled=settings.get("enabled", True),
+        batch_size=settings.get("batch_size", 200),
+        flush_interval_s=settings.get("flush_interval_s", 0.5),
+        max_result_bytes=settings.get("max_result_bytes", 20000)
+    )
+    atexit.register(store.close)
+    return store
+
+
+if __name__ == "__main__":
+    # Uso: python -m shared.event_store  → importa outputs/*/ptuning_*.jsonl al almacén
+    from shared.app_config import get_config
+
+    store = create_event_store(get_config().section("event_store"))
+    files = sorted((ROOT_PATH / "outputs").glob("*/ptuning_*.jsonl"))
+    print(f"✅ {store.import_jsonl(files)} eventos importados desde {len(files)} archivos a {store.db_path}")
@@ -0,0 +1,227 @@
+# shared/log_writer.py
+
+import os
+import sys
+import time
+import queue
+import atexit
+import threading
+from pathlib import Path
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos para la rotación
+    fcntl = None
+
+_FLUSH = object()
+_STOP = object()
+
+
+class LogWriter:
+    """
+    Escritor de logs en segundo plano.
+
+    Las llamadas a `write` solo encolan la línea; un hilo dedicado agrupa las líneas por
+    archivo y las escribe en lotes sobre manejadores que permanecen abiertos. Los archivos
+    se abren en modo append y cada lote se escribe con una sola llamada, así varios workers
+    de uvicorn pueden compartir el mismo archivo. Los archivos con `rotate=True` se renombran
+    a `<nombre>_<AAAAMMDD><ext>` cuando cambia el día (con bloqueo entre procesos).
+
+    Args:
+        enabled (bool): Si es False, cada línea se escribe de inmediato (comportamiento anterior).
+        batch_size (int): Máximo de líneas por lote.
+        flush_interval_s (float): Espera máxima antes de escribir un lote incompleto.
+        max_queue (int): Líneas pendientes; si se llena, la línea se escribe de forma síncrona.
+        idle_close_s (float): Cierra manejadores sin escrituras durante este tiempo.
+    """
+
+    def __init__(self, enabled: bool = True, batch_size: int = 256, flush_interval_s: float = 0.5,
+                 max_queue: int = 100000, idle_close_s: float = 300):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self.max_queue = max_queue
+        self.idle_close_s = idle_close_s
+        self._lock = threading.Lock()
+        self._stats = {"enqueued": 0, "written": 0, "batches": 0, "sync_writes": 0, "rotations": 0, "errors": 0}
+        self._reset()
+
+    def _reset(self):
+        # Estado por proceso: tras un fork se crean cola, hilo y manejadores nuevos
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._thread = None
+        self._handles = {}
+
+    def _ensure_thread(self):
+        if self._pid != os.getpid():
+            self._reset()
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                    self._thread.start()
+
+    def write(self, path, line: str, rotate: bool = False):
+        """Encola `line` (debe terminar en salto de línea) para anexarla a `path`."""
+        path = str(path)
+        if not self.enabled:
+            self._write_sync(path, line, rotate)
+            return
+
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait((path, line, rotate))
+            self._stats["enqueued"] += 1
+        except queue.Full:
+            self._write_sync(path, line, rotate)
+
+    def _write_sync(self, path: str, line: str, rotate: bool):
+        with self._lock:
+            self._stats["sync_writes"] += 1
+            self._write_batch({path: ([line], rotate)})
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval_s)
+            except queue.Empty:
+                self._close_idle()
+                continue
+
+            batch, waiters, stop = {}, [], False
+            while True:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, tuple) and item[0] is _FLUSH:
+                    waiters.append(item[1])
+                else:
+                    path, line, rotate = item
+                    lines, _ = batch.setdefault(path, ([], rotate))
+                    lines.append(line)
+                if stop or sum(len(lines) for lines, _ in batch.values()) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            with self._lock:
+                self._write_batch(batch)
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                self._close_handles()
+                return
+
+    def _write_batch(self, batch: dict):
+        for path, (lines, rotate) in batch.items():
+            try:
+                if rotate:
+                    self._maybe_rotate(path)
+                handle = self._handle(path)
+                handle.write("".join(lines))
+                handle.flush()
+                self._stats["written"] += len(lines)
+            except Exception as e:
+                self._stats["errors"] += 1
+                print(f"🚨 Error al escribir log en {path}: {e}", file=sys.stderr)
+        if batch:
+            self._stats["batches"] += 1
+
+    def _handle(self, path: str):
+        entry = self._handles.get(path)
+        if entry is not None:
+            handle = entry[0]
+            # Si otro proceso rotó el archivo, el manejador apunta a un inode viejo
+            try:
+                if os.stat(path).st_ino == os.fstat(handle.fileno()).st_ino:
+                    self._handles[path] = (handle, time.time())
+                    return handle
+            except FileNotFoundError:
+                pass
+            handle.close()
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        handle = open(path, "a", encoding="utf-8")
+        self._handles[path] = (handle, time.time())
+        return handle
+
+    def _maybe_rotate(self, path: str):
+        today = datetime.now().date()
+        try:
+            modified = datetime.fromtimestamp(os.stat(path).st_mtime).date()
+        except FileNotFoundError:
+            return
+        if modified >= today:
+            return
+
+        lock_file = open(path + ".lock", "a")
+        try:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            # Otro worker pudo rotarlo mientras se esperaba el bloqueo
+            try:
+                modified = datetime.fromtimestamp(os.stat(path).st_mtime).date()
+            except FileNotFoundError:
+                return
+            if modified >= today:
+                return
+            base, ext = os.path.splitext(path)
+            target = f"{base}_{modified.strftime('%Y%m%d')}{ext}"
+            if os.path.exists(target):
+                target = f"{base}_{modified.strftime('%Y%m%d')}_{os.getpid()}{ext}"
+            os.rename(path, target)
+            self._stats["rotations"] += 1
+        finally:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def _close_idle(self):
+        now = time.time()
+        with self._lock:
+            for path, (handle, last_used) in list(self._handles.items()):
+                if now - last_used > self.idle_close_s:
+                    handle.close()
+                    del self._handles[path]
+
+    def _close_handles(self):
+        with self._lock:
+            for handle, _ in self._handles.values():
+                handle.close()
+            self._handles.clear()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Espera a que todo lo encolado hasta ahora esté escrito en disco."""
+        if not self.enabled or self._thread is None or not self._thread.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        return done.wait(timeout)
+
+    def close(self, timeout: float = 5.0):
+        """Escribe lo pendiente y detiene el hilo (se llama al apagar el servidor)."""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+        self._close_handles()
+
+    def stats(self) -> dict:
+        stats = dict(self._stats)
+        stats["pending"] = self._queue.qsize()
+        stats["open_files"] = len(self._handles)
+        return stats
+
+
+def create_log_writer(settings: dict) -> LogWriter:
+    writer = LogWriter(
+        enabled=settings.get("enabled", True),
+        batch_size=settings.get("batch_size", 256),
+        flush_interval_s=settings.get("flush_interval_s", 0.5),
+        max_queue=settings.get("max_queue", 100000),
+        idle_close_s=settings.get("idle_close_s", 300)
+    )
+    atexit.register(writer.close)
+    return writer
@@ -0,0 +1,211 @@
+# shared/prompt_registry.py
+
+import os
+import time
+import hashlib
+import logging
+import threading
+from string import Formatter
+from pathlib import Path
+
+from shared.app_config import get_config
+
+logger = logging.getLogger("prompt_registry")
+
+PROMPTS_DIR = Path(__file__).resolve().parent.parent / "prompts"
+
+# Placeholders que cada plantilla debe declarar (ni más ni menos)
+EXPECTED_PLACEHOLDERS = {
+    "question_enhancer.txt": {"question"},
+    "flow_generator_prompt.txt": {"question"},
+    "flow_generator_rag.txt": {"question"},
+    "system_context.txt": {"question", "flujo"},
+    "system_context_rag.txt": {"question", "flow", "context"},
+}
+
+
+class PromptTemplateError(ValueError):
+    """La plantilla tiene placeholders inválidos o faltantes."""
+    pass
+
+
+def extract_placeholders(text: str) -> set:
+    """
+    Placeholders de `str.format` presentes en la plantilla.
+
+    Raises:
+        PromptTemplateError: Si hay llaves sin cerrar o campos posicionales.
+    """
+    try:
+        fields = {field for _, field, _, _ in Formatter().parse(text) if field is not None}
+    except ValueError as e:
+        raise PromptTemplateError(f"Llaves mal formadas: {e}")
+
+    names = set()
+    for field in fields:
+        name = field.split(".")[0].split("[")[0]
+        if not name or name.isdigit():
+            raise PromptTemplateError("Los placeholders deben tener nombre, p. ej. {question}.")
+        names.add(name)
+    return names
+
+
+def validate_template(name: str, text: str) -> set:
+    """
+    Valida los placeholders de una plantilla contra los esperados para su nombre.
+
+    Returns:
+        set: Placeholders encontrados.
+
+    Raises:
+        PromptTemplateError: Si sobran o faltan placeholders.
+    """
+    placeholders = extract_placeholders(text)
+    expected = EXPECTED_PLACEHOLDERS.get(name)
+    if expected is not None:
+        unknown = placeholders - expected
+        missing = expected - placeholders
+        if unknown or missing:
+            raise PromptTemplateError(
+                f"Placeholders inválidos en '{name}': desconocidos {sorted(unknown)}, faltantes {sorted(missing)}. "
+                f"Usa {{{{ }}}} para llaves literales."
+            )
+    return placeholders
+
+
+class PromptRegistry:
+    """
+    Registro en memoria de `prompts/<dominio>/*.txt`.
+
+    Cada plantilla se lee una sola vez y se vuelve a cargar cuando cambia su mtime/tamaño,
+    así las ediciones hechas desde el editor de prompts aplican sin reiniciar. Una edición
+    con placeholders inválidos se rechaza y se conserva la última versión válida.
+    El mtime de cada plantilla y la versión de cada dominio se revisan como máximo una vez
+    cada `check_interval_s` segundos, para no tocar el disco en cada petición.
+
+    Args:
+        base_path (Path): Carpeta raíz de las plantillas.
+        check_interval_s (float): Segundos entre revisiones del disco (0 revisa siempre).
+    """
+
+    def __init__(self, base_path: Path = PROMPTS_DIR, check_interval_s: float = 2.0):
+        self.base_path = Path(base_path)
+        self.check_interval_s = check_interval_s
+        self._templates = {}
+        self._domain_versions = {}
+        self._lock = threading.Lock()
+        self._stats = {"loads": 0, "reloads": 0, "rejected": 0, "disk_checks": 0}
+
+    def _path(self, domain: str, name: str) -> Path:
+        return self.base_path / domain / name
+
+    def _load(self, domain: str, name: str, path: Path, signature: tuple) -> dict:
+        text = path.read_text(encoding="utf-8")
+        placeholders = validate_template(name, text)
+        return {
+            "text": text,
+            "version": hashlib.sha256(text.encode("utf-8")).hexdigest()[:16],
+            "placeholders": sorted(placeholders),
+            "signature": signature,
+            "checked_at": time.monotonic(),
+        }
+
+    def _entry(self, domain: str, name: str, force: bool = False) -> dict:
+        key = (domain, name)
+        cached = self._templates.get(key)
+        now = time.monotonic()
+        if cached and not force and now - cached["checked_at"] < self.check_interval_s:
+            return cached
+
+        path = self._path(domain, name)
+        self._stats["disk_checks"] += 1
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"⚠️ No se encontró la plantilla de prompt: {path}")
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        if cached and cached["signature"] == signature:
+            cached["checked_at"] = now
+            return cached
+
+        with self._lock:
+            cached = self._templates.get(key)
+            if cached and cached["signature"] == signature:
+                return cached
+            try:
+                entry = self._load(domain, name, path, signature)
+            except PromptTemplateError as e:
+                if cached is None:
+                    raise
+                # Se conserva la versión válida anterior hasta que se corrija el archivo
+                self._stats["rejected"] += 1
+                cached["signature"] = signature
+                cached["checked_at"] = now
+                logger.error(f"❌ Plantilla '{domain}/{name}' rechazada, se conserva la versión {cached['version']}: {e}")
+                return cached
+
+            if cached is None:
+                self._stats["loads"] += 1
+            else:
+                self._stats["reloads"] += 1
+                logger.info(f"🔄 Plantilla '{domain}/{name}' recargada: {cached['version']} → {entry['version']}")
+            self._templates[key] = entry
+            return entry
+
+    def get(self, domain: str, name: str) -> str:
+        """Texto vigente de la plantilla `prompts/<domain>/<name>`."""
+        return self._entry(domain, name)["text"]
+
+    def version(self, domain: str, name: str) -> str:
+        """Hash corto del contenido vigente de la plantilla."""
+        return self._entry(domain, name)["version"]
+
+    def list_templates(self, domain: str) -> list:
+        return sorted(p.name for p in (self.base_path / domain).glob("*.txt"))
+
+    def domain_version(self, domain: str) -> str:
+        """Hash combinado de todas las plantillas del dominio; cambia al editar cualquiera."""
+        cached = self._domain_versions.get(domain)
+        now = time.monotonic()
+        if cached and now - cached[1] < self.check_interval_s:
+            return cached[0]
+
+        digest = hashlib.sha256()
+        for name in self.list_templates(domain):
+            digest.update(name.encode("utf-8"))
+            digest.update(self.version(domain, name).encode("utf-8"))
+        version = digest.hexdigest()[:16]
+        self._domain_versions[domain] = (version, now)
+        return version
+
+    def save(self, domain: str, name: str, text: str) -> str:
+        """
+        Valida y guarda una plantilla; la siguiente lectura ya usa la nueva versión.
+
+        Returns:
+            str: Versión de la plantilla guardada.
+
+        Raises:
+            PromptTemplateError: Si los placeholders no son válidos (el archivo no se modifica).
+        """
+        validate_template(name, text)
+        path = self._path(domain, name)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+        # Las lecturas de este proceso ven la nueva versión sin esperar a la siguiente revisión
+        self._domain_versions.pop(domain, None)
+        return self._entry(domain, name, force=True)["version"]
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["templates"] = {f"{d}/{n}": e["version"] for (d, n), e in self._templates.items()}
+        return stats
+
+
+prompt_registry = PromptRegistry(
+    check_interval_s=get_config().section("prompt_registry").get("check_interval_s", 2.0)
+)
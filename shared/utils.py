@@ -9,19 +9,20 @@ import json
 import re
 from pathlib import Path
 from datetime import datetime
+from shared.prompt_registry import prompt_registry
+from shared.app_config import get_config
+from shared.log_writer import create_log_writer
+from shared.event_store import create_event_store
 
 
 
-# Archivo de configuración
-CONFIG_FILE = "shared/config_dev.json"
-
+# Archivo de configuración: se lee una sola vez por proceso (ver shared/app_config.py)
 def load_config():
-    if os.path.exists(CONFIG_FILE):
-        with open(CONFIG_FILE, "r", encoding="utf-8") as f:
-            config = json.load(f)
-        return config
-    else:
-        raise "No existe un archivo de configuración <<config.json>>"
+    """
+    Configuración compartida del proyecto como diccionario.
+    No toca el disco después de la primera llamada; usar `reload_config()` para releerla.
+    """
+    return get_config().data
 
 
 def init_config():
@@ -51,18 +52,33 @@ class Timer:
         self.end = time.perf_counter()
         self.interval = self.end - self.start
 
+# Escritor de logs en segundo plano (se crea al primer uso)
+_log_writer = None
+
+def get_log_writer():
+    global _log_writer
+    if _log_writer is None:
+        _log_writer = create_log_writer(get_config().section("log_writer"))
+    return _log_writer
+
+# Almacén indexado de eventos (se crea al primer uso)
+_event_store = None
+
+def get_event_store():
+    global _event_store
+    if _event_store is None:
+        _event_store = create_event_store(get_config().section("event_store"))
+    return _event_store
+
 # Logging general
 def log_to_file(message: str, api: bool = False):
     log_file = API_LOG_FILE if api else LOG_FILE
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(log_file, "a", encoding="utf-8") as f:
-        f.write(f"[{timestamp}] {message}\n")
+    get_log_writer().write(log_file, f"[{timestamp}] {message}\n", rotate=True)
 
 # Exportación JSONL
 def export_jsonl(entry: dict):
-    with open(JSONL_OUTPUT, "a", encoding="utf-8") as f:
-        json.dump(entry, f, ensure_ascii=False)
-        f.write("\n")
+    get_log_writer().write(JSONL_OUTPUT, json.dumps(entry, ensure_ascii=False) + "\n")
 
 # Formatear respuesta para logs o terminal
 def format_log_entry(entry: dict) -> str:
@@ -77,6 +93,7 @@ def format_log_entry(entry: dict) -> str:
 def load_prompt_template( domain: str, template_name: str) -> str:
     """
     Carga una plantilla de prompt desde el directorio /prompts.
+    El contenido se sirve desde `prompt_registry` y solo se relee cuando cambia el archivo.
 
     Args:
         domian (str): Path del dominio a utilizar.
@@ -85,18 +102,21 @@ def load_prompt_template( domain: str, template_name: str) -> str:
     Returns:
         str: Contenido de la plantilla.
     """    
-    base_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'prompts'))
-    template_path = os.path.join(base_path, domain, template_name)
+    return prompt_registry.get(domain, template_name)
 
-    # print(f"\nBase Path: {base_path}")
-    # print(f"Template Path: {template_path}\n")
 
-    try:
-        with open(template_path, "r", encoding="utf-8") as file:
-            return file.read()
-    except FileNotFoundError:
-        raise FileNotFoundError(f"⚠️ No se encontró la plantilla de prompt: {template_path}")
-    
+def get_prompt_version(domain: str) -> str:
+    """
+    Hash del contenido de las plantillas de prompt de un dominio.
+
+    Args:
+        domain (str): Dominio cuyas plantillas se versionan.
+
+    Returns:
+        str: Hash corto que cambia cuando se edita cualquier plantilla del dominio.
+    """
+    return prompt_registry.domain_version(domain)
+
 
 def clean_sql_output(raw_sql: str) -> str:
     # Limpieza básica: remueve comentarios, espacios extras, etc.
@@ -137,7 +157,9 @@ def log_event(
     model: str = "",
     domain: str = "",
     duration: float = 0.0,
-    tags: list = None
+    tags: list = None,
+    path: str = "",
+    prompt_version: str = ""
 ):
     message = "OK"
     log_day = datetime.now().strftime("%Y%m%d")
@@ -151,10 +173,10 @@ def log_event(
     if type_result not in {"success", "fails"}:
         type_result = "fails"
 
-    log_dir = root_path / "outputs" / type_result
-    log_dir.mkdir(parents=True, exist_ok=True)
-
-    log_file = log_dir / f"ptuning_{type_result}_cases_{log_day}.jsonl"
+    # El archivo ya es diario; el escritor crea la carpeta al abrirlo.
+    # `output_folder` es relativo a la raíz del proyecto salvo que sea absoluto
+    output_folder = root_path / load_config().get("output_folder", "outputs")
+    log_file = output_folder / type_result / f"ptuning_{type_result}_cases_{log_day}.jsonl"
 
     event = {
         "request_id": request_id,
@@ -169,13 +191,15 @@ def log_event(
         "model": model,
         "domain": domain,
         "duration": round(duration, 2),
-        "tags": tags or []
+        "tags": tags or [],
+        "path": path,
+        "prompt_version": prompt_version
     }
 
     try:
-        with open(log_file, "a", encoding="utf-8") as f:
-            json.dump(event, f, ensure_ascii=False, default=str)
-            f.write("\n")
+        # Se serializa aquí para fijar el contenido; la escritura ocurre en segundo plano
+        get_log_writer().write(log_file, json.dumps(event, ensure_ascii=False, default=str) + "\n")
+        get_event_store().add(event)
     except Exception as e:
         message = f"{e}"
 